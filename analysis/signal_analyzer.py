@@ -7,6 +7,8 @@ from dataclasses import dataclass
 
 from api.bybit_api import BybitAPI
 from core.logger import log_error, log_debug
+from websocket.candle_aggregator import candle_aggregator
+from core.kline_store import kline_store
 
 
 @dataclass
@@ -52,12 +54,13 @@ class SignalAnalyzer:
         try:
             timeframe = self.config.get("analysis_timeframe", "5m")
 
-            # 1. Получение свечей
-            candles = await self.api.get_klines(
-                symbol=symbol,
-                interval=timeframe,
-                limit=self.HISTORY_LIMIT
-            )
+            # 1. Получение свечей: из агрегатора публичного потока, при неполной истории -
+            # из хранилища свечей REST (догружает только новые свечи)
+            candles = candle_aggregator.get_candles(symbol, timeframe, self.HISTORY_LIMIT, include_forming=True)
+            if not candles:
+                candles = await kline_store.get_candles(self.api, symbol, timeframe, self.HISTORY_LIMIT)
+                if candles:
+                    candle_aggregator.seed(symbol, timeframe, candles)
 
             if not candles or len(candles) < self.HISTORY_LIMIT:
                 log_debug(self.user_id, f"Недостаточно исторических данных для {symbol}, накопление...",
@@ -106,4 +109,4 @@ class SignalAnalyzer:
 
         except Exception as e:
             log_error(self.user_id, f"Ошибка в SignalAnalyzer для {symbol}: {e}", "SignalAnalyzer")
-            return None
\ No newline at end of file
+            return None
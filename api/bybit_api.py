@@ -10,6 +10,11 @@ from core.logger import log_info, log_error, log_warning, log_debug
 from core.functions import to_decimal
 from urllib.parse import urlencode
 from core.functions import format_number
+from core.market_state import market_state
+from api.http_transport import http_transport
+from api.instruments_catalog import instruments_catalog
+from api.rate_limiter import rate_limiter, request_priority, RATE_LIMIT_RET_CODE
+from api.request_coalescer import public_coalescer
 # Настройка точности для Decimal
 getcontext().prec = 28
 
@@ -45,36 +50,34 @@ class BybitAPI:
 
         log_info(self.user_id, f"BybitAPI использует базовый URL: {self.base_url}", module_name="bybit_api")
             
-        # Rate limiting
-        self.rate_limit_delay = 0.1  # 100ms между запросами
-        self.last_request_time = 0
-        
+        # Rate limiting - общий rate_limiter процесса (лимиты ключа и IP, приоритет ордеров)
+
         # Retry settings
         self.max_retries = 3
         self.retry_delay = 1.0
         
-        # Session для переиспользования соединений
+        # Сессия общего пула соединений для base_url (http_transport), не принадлежит экземпляру;
+        # взята через acquire() в loop _session_loop и отдается в close()
         self.session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
         
-        # Кэш для инструментов
-        self.instruments_cache: Dict[str, Dict] = {}
-        self.cache_expiry = 300  # 5 минут
-        self.cache_timestamp = 0
-        self._cache_lock = asyncio.Lock()
+        # Инструменты - общий каталог процесса (instruments_catalog), не кэш экземпляра
 
-
-        
     async def _ensure_session(self):
         """
         Обеспечение активной HTTP сессии.
-        Создает сессию при первом вызове и переиспользует ее.
+        Берет сессию общего пула для base_url: keep-alive соединения делятся всеми экземплярами.
+        Пул берется один раз на экземпляр и event loop.
         """
-        if self.session is None or self.session.closed:
-            timeout = aiohttp.ClientTimeout(total=60, connect=20 )
-            self.session = aiohttp.ClientSession(
-                timeout=timeout,
-                headers={"User-Agent": "Manus-Trading-Bot/1.0"}
-             )
+        loop = asyncio.get_running_loop()
+        if self.session is not None and self._session_loop is loop:
+            if not self.session.closed:
+                return
+            # Пул закрыт владельцем - отдаем прежнюю ссылку и берем новый
+            await http_transport.release(self.base_url)
+        # Ссылка из другого (завершенного) loop отбрасывается транспортом вместе с пулом
+        self.session = http_transport.acquire(self.base_url)
+        self._session_loop = loop
 
     async def __aenter__(self):
         """Async context manager entry"""
@@ -83,17 +86,19 @@ class BybitAPI:
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        # ИСПРАВЛЕНИЕ: Закрываем сессию при выходе из контекста для временных API клиентов
         await self.close()
 
     async def close(self):
         """
-        Закрытие HTTP сессии. Этот метод теперь будет вызываться только при полной
-        остановке сессии пользователя, а не для временных API клиентов.
+        Освобождение HTTP сессии экземпляра. Сессия принадлежит общему пулу (http_transport):
+        в приложении пул остается открытым для других клиентов до остановки, без приложения
+        (скрипты) закрывается с последним клиентом.
         """
-        if self.session and not self.session.closed:
-            await self.session.close()
-            self.session = None # Явно обнуляем сессию
+        if self.session is None:
+            return
+        session_loop, self.session, self._session_loop = self._session_loop, None, None
+        if session_loop is asyncio.get_running_loop():
+            await http_transport.release(self.base_url)
             
     def _generate_signature(self, params: str, timestamp: str) -> str:
         """Генерация подписи для запроса"""
@@ -109,15 +114,12 @@ class BybitAPI:
             log_error(self.user_id, f"Ошибка генерации подписи: {e}", module_name="bybit_api")
             return ""
     
-    async def _rate_limit(self):
-        """Управление rate limits"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.rate_limit_delay:
-            await asyncio.sleep(self.rate_limit_delay - time_since_last)
-            
-        self.last_request_time = time.time()
+    def _track_limits(self, response: aiohttp.ClientResponse, endpoint: str, private: bool):
+        """Передача остатка лимитов из ответа в rate_limiter"""
+        if response.status == 403:
+            rate_limiter.on_ip_banned()
+            return
+        rate_limiter.update_from_headers(self.api_key if private else None, endpoint, response.headers)
 
     async def _make_request(self, method: str, endpoint: str, params: Dict[str, Any] = None, private: bool = True,
                                         return_full_response: bool = False) -> Optional[Dict[str, Any]]:
@@ -127,10 +129,13 @@ class BybitAPI:
 
         # сессия создается здесь, при первом реальном запросе
         await self._ensure_session()
+        # Закрывающие ордера и стоп-лосс - вперед остальных ордеров, ордера - вперед чтений
+        priority = request_priority(endpoint, params)
+        limit_key = self.api_key if private else None
 
         for attempt in range(self.max_retries + 1):
             try:
-                await self._rate_limit()
+                await rate_limiter.acquire(limit_key, endpoint, priority)
 
                 timestamp = str(int(time.time() * 1000))
                 url = f"{self.base_url}{endpoint}"
@@ -153,6 +158,7 @@ class BybitAPI:
                         request_params = sorted_params_list
 
                     async with self.session.get(url, headers=headers, params=request_params) as response:
+                        self._track_limits(response, endpoint, private)
                         response_result = await response.json(content_type=None) if response.content else None
 
                 elif method == "POST":
@@ -168,6 +174,7 @@ class BybitAPI:
                     headers["Content-Type"] = "application/json"
 
                     async with self.session.post(url, headers=headers, json=params) as response:
+                        self._track_limits(response, endpoint, private)
                         response_result = await response.json(content_type=None) if response.content else None
                 else:
                     log_error(self.user_id, f"Неподдерживаемый HTTP метод: {method}", module_name="bybit_api")
@@ -194,6 +201,8 @@ class BybitAPI:
                 else:
                     error_msg = response_result.get("retMsg", "получен пустой ответ от сервера") if response_result else "получен пустой ответ от сервера"
                     log_error(self.user_id, f"API ошибка: {error_msg} (код: {ret_code})", module_name="bybit_api")
+                    if ret_code == RATE_LIMIT_RET_CODE:
+                        rate_limiter.on_rate_limited(limit_key, endpoint)
                     if ret_code in [10003, 10004]:
                         log_error(self.user_id,f"КРИТИЧЕСКАЯ ОШИБКА АУТЕНТИФИКАЦИИ (код: {ret_code}): {error_msg}. Проверьте правильность API ключей и их права доступа!",
                                   module_name="bybit_api")
@@ -224,7 +233,13 @@ class BybitAPI:
     # =============================================================================
     
     async def get_ticker(self, symbol: str) -> Optional[Dict[str, Any]]:
-        """Получение тикера инструмента"""
+        """Получение тикера инструмента (одинаковые запросы процесса объединяются)"""
+        ticker = await public_coalescer.get(("get_ticker", self.base_url, symbol),
+                                            lambda: self._load_ticker(symbol))
+        # Копия: результат общий для всех вызывающих
+        return dict(ticker) if ticker else ticker
+
+    async def _load_ticker(self, symbol: str) -> Optional[Dict[str, Any]]:
         try:
             params = {
                 "category": "linear",
@@ -307,9 +322,13 @@ class BybitAPI:
     async def get_current_price(self, symbol: str) -> Optional[Decimal]:
         """
         Получает последнюю цену для указанного символа.
-        Является удобной оберткой над get_ticker.
+        Сначала из доски рынка (публичный WebSocket), если цена устарела или символ
+        не слушается - через get_ticker.
         """
         try:
+            price = market_state.get_price(symbol)
+            if price is not None:
+                return price
             ticker_data = await self.get_ticker(symbol)
             if ticker_data and "lastPrice" in ticker_data:
                 return ticker_data["lastPrice"]
@@ -687,7 +706,22 @@ class BybitAPI:
         start_time: Optional[int] = None,
         end_time: Optional[int] = None
     ) -> Optional[List[Dict[str, Any]]]:
-        """Получение исторических свечей"""
+        """Получение исторических свечей (одинаковые запросы процесса объединяются)"""
+        candles = await public_coalescer.get(
+            ("get_klines", self.base_url, symbol, interval, limit, start_time, end_time),
+            lambda: self._load_klines(symbol, interval, limit, start_time, end_time)
+        )
+        # Копия списка: результат общий для всех вызывающих (словари свечей не изменяются)
+        return list(candles) if candles else candles
+
+    async def _load_klines(
+        self,
+        symbol: str,
+        interval: str,
+        limit: int,
+        start_time: Optional[int],
+        end_time: Optional[int]
+    ) -> Optional[List[Dict[str, Any]]]:
         try:
             # Конвертер таймфреймов в формат, требуемый Bybit V5 API
             interval_map = {
@@ -735,68 +769,61 @@ class BybitAPI:
 
     async def get_instruments_info(self, symbol: str = None) -> Optional[Dict[str, Any]]:
         """
-        Атомарное и потокобезопасное получение ВСЕЙ информации об инструментах с пагинацией и кэшированием.
+        Правила инструмента (или весь каталог без symbol) из общего каталога процесса.
+        Загрузка с пагинацией - _fetch_instruments, один раз на процесс.
         """
-        current_time = time.time()
-        # Быстрая проверка кэша без блокировки для максимальной производительности
-        if self.instruments_cache and (current_time - self.cache_timestamp < self.cache_expiry):
-            if symbol:
-                return self.instruments_cache.get(symbol)
-            return self.instruments_cache
-
-        # Основная логика с блокировкой для обеспечения целостности данных
-        async with self._cache_lock:
-            # Повторная проверка внутри блокировки на случай, если другой поток уже обновил кэш
-            if self.instruments_cache and (current_time - self.cache_timestamp < self.cache_expiry):
-                if symbol:
-                    return self.instruments_cache.get(symbol)
-                return self.instruments_cache
-
-            log_info(self.user_id, "Кэш инструментов пуст или устарел. Запрашиваю ПОЛНЫЙ список с пагинацией...",
-                     module_name="bybit_api")
+        if symbol:
+            return await instruments_catalog.get(symbol, self._fetch_instruments)
+        return await instruments_catalog.get_all(self._fetch_instruments)
 
-            new_cache = {}
-            cursor = ""
+    async def _fetch_instruments(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Загрузка для каталога отдельным публичным клиентом: фоновое обновление может пережить
+        вызывающий экземпляр, и его ссылка на пул http_transport освобождается здесь же.
+        """
+        async with BybitAPI("", "", self.user_id, demo=self.demo) as client:
+            return await client._load_instruments()
 
-            # --- НАЧАЛО ЛОГИКИ ПАГИНАЦИИ ---
-            while True:
-                params = {"category": "linear", "limit": 1000}  # Запрашиваем по 1000 за раз (максимум)
-                if cursor:
-                    params["cursor"] = cursor
+    async def _load_instruments(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Полный список инструментов с пагинацией"""
+        log_info(self.user_id, "Запрашиваю ПОЛНЫЙ список инструментов с пагинацией...", module_name="bybit_api")
 
-                result = await self._make_request("GET", "/v5/market/instruments-info", params, private=False)
+        new_cache = {}
+        cursor = ""
 
-                if not (result and "list" in result):
-                    log_error(self.user_id,
-                              f"Не удалось обновить кэш инструментов: получен некорректный ответ от API на странице с курсором '{cursor}'.",
-                              module_name="bybit_api")
-                    if new_cache: break
-                    return None
+        # --- НАЧАЛО ЛОГИКИ ПАГИНАЦИИ ---
+        while True:
+            params = {"category": "linear", "limit": 1000}  # Запрашиваем по 1000 за раз (максимум)
+            if cursor:
+                params["cursor"] = cursor
 
-                for instrument in result["list"]:
-                    symbol_name = instrument.get("symbol")
-                    if symbol_name:
-                        new_cache[symbol_name] = {
-                            "symbol": symbol_name,
-                            "minOrderQty": to_decimal(instrument.get("lotSizeFilter", {}).get("minOrderQty", "0")),
-                            "qtyStep": to_decimal(instrument.get("lotSizeFilter", {}).get("qtyStep", "0")),
-                            "tickSize": to_decimal(instrument.get("priceFilter", {}).get("tickSize", "0")),
-                            "status": instrument.get("status")
-                        }
-
-                cursor = result.get("nextPageCursor", "")
-                if not cursor:
-                    break  # Выходим из цикла, если больше страниц нет
-            # --- КОНЕЦ ЛОГИКИ ПАГИНАЦИИ ---
-
-            self.instruments_cache = new_cache
-            self.cache_timestamp = current_time
-            log_info(self.user_id, f"Кэш инструментов обновлен. Загружено {len(new_cache)} символов.",
-                     module_name="bybit_api")
+            result = await self._make_request("GET", "/v5/market/instruments-info", params, private=False)
 
-            if symbol:
-                return new_cache.get(symbol)
-            return new_cache
+            if not (result and "list" in result):
+                log_error(self.user_id,
+                          f"Не удалось обновить кэш инструментов: получен некорректный ответ от API на странице с курсором '{cursor}'.",
+                          module_name="bybit_api")
+                if new_cache: break
+                return None
+
+            for instrument in result["list"]:
+                symbol_name = instrument.get("symbol")
+                if symbol_name:
+                    new_cache[symbol_name] = {
+                        "symbol": symbol_name,
+                        "minOrderQty": to_decimal(instrument.get("lotSizeFilter", {}).get("minOrderQty", "0")),
+                        "qtyStep": to_decimal(instrument.get("lotSizeFilter", {}).get("qtyStep", "0")),
+                        "tickSize": to_decimal(instrument.get("priceFilter", {}).get("tickSize", "0")),
+                        "status": instrument.get("status")
+                    }
+
+            cursor = result.get("nextPageCursor", "")
+            if not cursor:
+                break  # Выходим из цикла, если больше страниц нет
+        # --- КОНЕЦ ЛОГИКИ ПАГИНАЦИИ ---
+
+        log_info(self.user_id, f"Список инструментов загружен: {len(new_cache)} символов.", module_name="bybit_api")
+        return new_cache
 
     # =============================================================================
     # ПРИВАТНЫЕ МЕТОДЫ API (ТОРГОВЛЯ)
@@ -857,12 +884,14 @@ class BybitAPI:
         stop_loss: Optional[Decimal] = None,
         take_profit: Optional[Decimal] = None,
         max_retries: int = 3,
-        retry_delay: float = 1.0
+        retry_delay: float = 1.0,
+        order_link_id: Optional[str] = None
     ) -> Optional[str]:
         """
         Размещение ордера. Доверяет полученному qty и просто форматирует его в строку.
 
         ВАЖНО: Использует retry механизм с несколькими попытками для надежности!
+        order_link_id - клиентский ID (orderLinkId, до 36 символов), приходит в событиях WebSocket.
         """
         # ИСПРАВЛЕНИЕ: Используем normalize() + str() вместо to_eng_string()
         # to_eng_string() может создавать представление с большим количеством trailing zeros (например, 15510.20000000)
@@ -901,6 +930,8 @@ class BybitAPI:
             params["stopLoss"] = str(stop_loss)
         if take_profit is not None:
             params["takeProfit"] = str(take_profit)
+        if order_link_id:
+            params["orderLinkId"] = order_link_id
 
         for attempt in range(max_retries):
             try:
@@ -1137,6 +1168,8 @@ class BybitAPI:
         log_info(self.user_id, f"[QTY_CALC] Расчет для {symbol} | Сумма: {usdt_amount} USDT | Плечо: {leverage}x",
                  "bybit_api")
         try:
+            if price is None:
+                price = market_state.get_price(symbol)
             if price is None:
                 ticker = await self.get_ticker(symbol)
                 if not ticker or ticker["lastPrice"] <= 0:
@@ -0,0 +1,155 @@
+# api/http_transport.py
+"""
+Общий HTTP-транспорт процесса для REST API бирж.
+
+Один пул соединений (aiohttp.ClientSession + TCPConnector) на базовый URL вместо сессии
+на каждый экземпляр BybitAPI: временные клиенты (async with BybitAPI(...) в хэндлерах
+Telegram, восстановление, публичный клиент менеджера WebSocket) используют уже открытые
+keep-alive соединения и не платят TCP+TLS рукопожатие к api.bybit.com на каждый вызов.
+Учетные данные остаются у экземпляров BybitAPI: подпись и ключ передаются заголовками запроса.
+
+Сессия aiohttp привязана к event loop, поэтому пул - на пару (loop, базовый URL): повторный
+asyncio.run() в скрипте получает новый пул, пулы закрытых loop отбрасываются. Клиенты берут пул
+через acquire() и отдают через release(). Без владельца (скрипты, бенчмарки) пул закрывается
+с уходом последнего клиента; приложение вызывает retain() и закрывает пулы само (close()).
+"""
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from core.logger import log_info
+
+USER_AGENT = "Manus-Trading-Bot/1.0"
+
+
+PoolKey = Tuple[asyncio.AbstractEventLoop, str]
+
+
+class HttpTransport:
+    """Пулы соединений по (loop, базовый URL): создаются лениво, закрываются последним клиентом или владельцем"""
+
+    def __init__(self, pool_limit: int = 100, pool_limit_per_host: int = 0, keepalive_timeout: float = 30.0,
+                 dns_cache_ttl: int = 300, connect_timeout: float = 20.0, total_timeout: float = 60.0):
+        self.configure(pool_limit, pool_limit_per_host, keepalive_timeout, dns_cache_ttl,
+                       connect_timeout, total_timeout)
+        self._sessions: Dict[PoolKey, aiohttp.ClientSession] = {}
+        # Клиенты (экземпляры BybitAPI), взявшие пул через acquire()
+        self._refs: Dict[PoolKey, int] = {}
+        # Пулами владеет приложение: release() последнего клиента их не закрывает
+        self._retained = False
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def configure(self, pool_limit: int, pool_limit_per_host: int, keepalive_timeout: float,
+                  dns_cache_ttl: int, connect_timeout: float, total_timeout: float):
+        """Применяется к пулам, созданным после вызова"""
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.connect_timeout = connect_timeout
+        self.total_timeout = total_timeout
+
+    def retain(self):
+        """Пулы живут до close(), а не до ухода последнего клиента (вызывает BotApplication)"""
+        self._retained = True
+
+    def session(self, base_url: str) -> aiohttp.ClientSession:
+        """Сессия пула для базового URL в текущем event loop (вызывается из работающего loop)"""
+        key = (asyncio.get_running_loop(), base_url)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            self._prune()
+            session = self._sessions[key] = self._create_session(base_url)
+        return session
+
+    def acquire(self, base_url: str) -> aiohttp.ClientSession:
+        """Сессия пула для клиента; каждому acquire() соответствует release() в том же loop"""
+        session = self.session(base_url)
+        key = (asyncio.get_running_loop(), base_url)
+        self._refs[key] = self._refs.get(key, 0) + 1
+        return session
+
+    async def release(self, base_url: str):
+        """Клиент больше не использует пул; без владельца последний клиент закрывает пул"""
+        key = (asyncio.get_running_loop(), base_url)
+        refs = self._refs.get(key, 0) - 1
+        if refs > 0:
+            self._refs[key] = refs
+            return
+        self._refs.pop(key, None)
+        if not self._retained:
+            session = self._sessions.pop(key, None)
+            if session is not None and not session.closed:
+                await session.close()
+
+    async def close(self):
+        """Закрывает пулы текущего loop и отбрасывает пулы закрытых; владелец больше не удерживает пулы"""
+        loop = asyncio.get_running_loop()
+        for (session_loop, _), session in self._sessions.items():
+            if session_loop is loop and not session.closed:
+                await session.close()
+        self._sessions.clear()
+        self._refs.clear()
+        self._retained = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        pools = {}
+        for key, session in self._sessions.items():
+            base_url = key[1]
+            connector: Optional[aiohttp.BaseConnector] = session.connector
+            stats = self._stats.get(base_url, {})
+            pools[base_url] = {
+                **stats,
+                "limit": self.pool_limit,
+                "closed": session.closed,
+                "clients": self._refs.get(key, 0),
+                # Соединения, занятые запросами прямо сейчас
+                "in_use": len(getattr(connector, "_acquired", ())) if connector else 0,
+            }
+        return pools
+
+    def _prune(self):
+        """Пулы закрытых event loop (предыдущий asyncio.run) не закрыть - только отбросить"""
+        for key in [key for key in self._sessions if key[0].is_closed()]:
+            del self._sessions[key]
+            self._refs.pop(key, None)
+
+    def _create_session(self, base_url: str) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_limit,
+            limit_per_host=self.pool_limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        stats = self._stats.setdefault(base_url, {"requests": 0, "connections_created": 0, "connections_reused": 0})
+
+        # Счетчики пула: новые соединения (рукопожатия) против переиспользованных keep-alive
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(_session, _context, _params):
+            stats["requests"] += 1
+
+        async def on_connection_create_end(_session, _context, _params):
+            stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(_session, _context, _params):
+            stats["connections_reused"] += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+
+        log_info(0, f"HTTP пул для {base_url}: до {self.pool_limit} соединений, keep-alive "
+                    f"{self.keepalive_timeout:.0f}с, DNS кэш {self.dns_cache_ttl}с", module_name=__name__)
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.total_timeout, connect=self.connect_timeout),
+            headers={"User-Agent": USER_AGENT},
+            trace_configs=[trace],
+        )
+
+
+# Общий транспорт (настраивается BotApplication)
+http_transport = HttpTransport()
@@ -0,0 +1,210 @@
+# api/instruments_catalog.py
+"""
+Каталог инструментов Bybit (linear) на весь процесс.
+
+Раньше каждый экземпляр BybitAPI (сессии пользователей, клиенты мульти-аккаунта, временные
+клиенты хэндлеров) постранично скачивал весь список инструментов и держал свой кэш на 5 минут.
+Теперь список один:
+- single-flight: одновременные промахи ждут одну загрузку, а не запускают свою;
+- stale-while-revalidate: устаревший каталог отдается сразу, обновление идет в фоне;
+- снимок в Redis и на диске: после рестарта каталог доступен до первого запроса к бирже;
+- правила инструмента (qtyStep, tickSize, minOrderQty) - поиск в словаре по символу.
+
+Загрузку выполняет fetcher вызывающего BybitAPI (своим клиентом, не сессией вызывающего),
+каталог решает только, когда ее запускать.
+"""
+import asyncio
+import json
+import os
+import time
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from core.logger import log_info, log_error, log_warning
+
+# Поля правил инструмента, которые хранятся в Decimal
+DECIMAL_FIELDS = ("minOrderQty", "qtyStep", "tickSize")
+REDIS_SNAPSHOT_KEY = "instruments_catalog"
+# Неизвестный символ запускает внеочередную загрузку (новый листинг) не чаще раза в интервал
+MISSING_SYMBOL_REFRESH_SECONDS = 60.0
+
+Fetcher = Callable[[], Awaitable[Optional[Dict[str, Dict[str, Any]]]]]
+
+
+class InstrumentsCatalog:
+    """Общий каталог инструментов с фоновым обновлением и снимком"""
+
+    def __init__(self, ttl: float = 300.0, snapshot_path: str = "", redis_snapshot: bool = True):
+        self.configure(ttl, snapshot_path, redis_snapshot)
+        self._instruments: Dict[str, Dict[str, Any]] = {}
+        # Время (unix) загрузки текущих данных; у снимка - время его создания
+        self.loaded_at = 0.0
+        self._attempted_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # Метрики
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.snapshot_source: Optional[str] = None
+
+    def configure(self, ttl: float, snapshot_path: str, redis_snapshot: bool):
+        """Пустой snapshot_path - снимок на диск не пишется"""
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.redis_snapshot = redis_snapshot
+
+    @property
+    def fresh(self) -> bool:
+        return bool(self._instruments) and time.time() - self.loaded_at < self.ttl
+
+    async def get(self, symbol: str, fetcher: Fetcher) -> Optional[Dict[str, Any]]:
+        """Правила инструмента; ждет загрузку только при пустом каталоге"""
+        instrument = self._instruments.get(symbol)
+        if instrument is not None:
+            self._revalidate(fetcher)
+            return instrument
+        if not self._instruments or time.time() - self._attempted_at >= MISSING_SYMBOL_REFRESH_SECONDS:
+            await self.refresh(fetcher)
+        return self._instruments.get(symbol)
+
+    async def get_all(self, fetcher: Fetcher) -> Optional[Dict[str, Dict[str, Any]]]:
+        if self._instruments:
+            self._revalidate(fetcher)
+            return self._instruments
+        await self.refresh(fetcher)
+        return self._instruments or None
+
+    async def refresh(self, fetcher: Fetcher):
+        """Загрузка каталога; одновременные вызовы ждут одну и ту же загрузку"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh(fetcher))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего не прерывает загрузку для остальных
+        await asyncio.shield(self._refresh_task)
+
+    async def load_snapshot(self):
+        """Теплый старт: снимок из Redis, иначе с диска. Данные снимка считаются устаревшими
+        по времени создания и обновляются в фоне при первом обращении."""
+        snapshot = await self._read_redis_snapshot() if self.redis_snapshot else None
+        source = "redis"
+        if not snapshot and self.snapshot_path and os.path.exists(self.snapshot_path):
+            snapshot = await asyncio.to_thread(self._read_file_snapshot)
+            source = "disk"
+        if not snapshot or self._instruments:
+            return
+        try:
+            self._instruments = {symbol: self._from_snapshot(info) for symbol, info in snapshot["instruments"].items()}
+            self.loaded_at = float(snapshot["saved_at"])
+            self.snapshot_source = source
+            log_info(0, f"Каталог инструментов из снимка ({source}): {len(self._instruments)} символов, "
+                        f"возраст {time.time() - self.loaded_at:.0f}с", module_name=__name__)
+        except (KeyError, TypeError, ValueError) as e:
+            log_warning(0, f"Снимок каталога инструментов ({source}) поврежден: {e}", module_name=__name__)
+
+    async def stop(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+        self._refresh_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self._instruments),
+            "age_sec": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "fresh": self.fresh,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "snapshot_source": self.snapshot_source,
+        }
+
+    def _revalidate(self, fetcher: Fetcher):
+        """Устаревший каталог отдается как есть, обновление - в фоне"""
+        if self.fresh:
+            return
+        self.stale_served += 1
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh(fetcher))
+
+    async def _refresh(self, fetcher: Fetcher):
+        self._attempted_at = time.time()
+        try:
+            instruments = await fetcher()
+        except Exception as e:
+            instruments = None
+            log_error(0, f"Ошибка загрузки каталога инструментов: {e}", module_name=__name__)
+        if not instruments:
+            # Старые данные остаются в работе до следующей попытки
+            self.refresh_errors += 1
+            return
+        self._instruments = instruments
+        self.loaded_at = time.time()
+        self.refreshes += 1
+        log_info(0, f"Каталог инструментов обновлен: {len(instruments)} символов", module_name=__name__)
+        await self._save_snapshot()
+
+    async def _save_snapshot(self):
+        snapshot = {
+            "saved_at": self.loaded_at,
+            "instruments": {symbol: {key: str(value) if isinstance(value, Decimal) else value
+                                     for key, value in info.items()}
+                            for symbol, info in self._instruments.items()},
+        }
+        if self.redis_snapshot:
+            redis_manager = self._redis()
+            if redis_manager:
+                await redis_manager.cache_data(REDIS_SNAPSHOT_KEY, snapshot, ttl=None)
+        if self.snapshot_path:
+            try:
+                await asyncio.to_thread(self._write_file_snapshot, snapshot)
+            except OSError as e:
+                log_error(0, f"Ошибка записи снимка каталога инструментов: {e}", module_name=__name__)
+
+    async def _read_redis_snapshot(self) -> Optional[Dict[str, Any]]:
+        redis_manager = self._redis()
+        if not redis_manager:
+            return None
+        snapshot = await redis_manager.get_cached_data(REDIS_SNAPSHOT_KEY)
+        return snapshot if isinstance(snapshot, dict) else None
+
+    def _read_file_snapshot(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            log_warning(0, f"Не удалось прочитать снимок каталога инструментов: {e}", module_name=__name__)
+            return None
+
+    def _write_file_snapshot(self, snapshot: Dict[str, Any]):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Запись через временный файл: прерванная запись не портит предыдущий снимок
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file, separators=(",", ":"))
+        os.replace(temp_path, self.snapshot_path)
+
+    @staticmethod
+    def _from_snapshot(info: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: Decimal(value) if key in DECIMAL_FIELDS else value for key, value in info.items()}
+
+    @staticmethod
+    def _redis():
+        # Ленивый импорт: API клиент используется и без Redis (бенчмарки, скрипты)
+        try:
+            from cache.redis_manager import redis_manager
+        except ImportError:
+            return None
+        return redis_manager if redis_manager.is_connected else None
+
+
+# Общий каталог процесса (настраивается BotApplication)
+instruments_catalog = InstrumentsCatalog()
@@ -0,0 +1,252 @@
+# api/rate_limiter.py
+"""
+Ограничение частоты REST запросов к Bybit на весь процесс.
+
+- Token bucket на (API ключ, группа эндпоинтов) - лимиты Bybit по UID, и общий bucket на IP
+  (все экземпляры BybitAPI процесса выходят в сеть с одного адреса).
+- Заголовки ответа X-Bapi-Limit / X-Bapi-Limit-Status / X-Bapi-Limit-Reset-Timestamp
+  подстраивают bucket ключа под реальный остаток на бирже (он учитывает и другие
+  процессы с тем же ключом); retCode 10006 и HTTP 403 блокируют bucket до сброса.
+- Приоритеты: CRITICAL (закрывающие reduceOnly ордера, стоп-лосс) > ORDER (создание и отмена
+  ордеров) > READ (все остальное). Ожидающие обслуживаются по приоритету, а чтения не берут
+  последние read_reserve токенов IP bucket - закрытие позиции не ждет запроса баланса.
+"""
+import asyncio
+import heapq
+import time
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.logger import log_warning
+
+# Приоритеты запросов (меньше - важнее)
+CRITICAL = 0
+ORDER = 1
+READ = 2
+
+# Группы эндпоинтов с лимитами Bybit по UID (запросов в секунду); заголовки ответа уточняют лимит
+ENDPOINT_GROUPS: Dict[str, Tuple[str, float]] = {
+    "/v5/order/create": ("order_create", 10.0),
+    "/v5/order/amend": ("order_amend", 10.0),
+    "/v5/order/cancel": ("order_cancel", 10.0),
+    "/v5/order/cancel-all": ("order_cancel", 10.0),
+    "/v5/position/trading-stop": ("position_write", 10.0),
+    "/v5/position/set-leverage": ("position_write", 10.0),
+}
+# Остальные приватные эндпоинты - по префиксу
+PREFIX_GROUPS: Tuple[Tuple[str, str, float], ...] = (
+    ("/v5/order/", "order_read", 50.0),
+    ("/v5/execution/", "execution", 50.0),
+    ("/v5/position/", "position_read", 50.0),
+    ("/v5/account/", "account", 50.0),
+)
+DEFAULT_GROUP = ("other", 10.0)
+ORDER_ENDPOINTS = frozenset({"/v5/order/create", "/v5/order/amend", "/v5/order/cancel", "/v5/order/cancel-all"})
+
+# retCode Bybit "слишком частые запросы" и пауза, если заголовок сброса не пришел
+RATE_LIMIT_RET_CODE = 10006
+RATE_LIMIT_BACKOFF_SECONDS = 1.0
+# HTTP 403 - превышен лимит IP, биржа временно блокирует адрес
+IP_BAN_BACKOFF_SECONDS = 10.0
+
+
+def request_priority(endpoint: str, params: Optional[Dict[str, Any]] = None) -> int:
+    """Приоритет запроса: закрывающие ордера и стоп-лосс, затем ордера, затем чтения"""
+    if endpoint == "/v5/position/trading-stop":
+        return CRITICAL
+    if endpoint == "/v5/order/create":
+        return CRITICAL if params and params.get("reduceOnly") else ORDER
+    if endpoint in ORDER_ENDPOINTS:
+        return ORDER
+    return READ
+
+
+def endpoint_group(endpoint: str) -> Tuple[str, float]:
+    group = ENDPOINT_GROUPS.get(endpoint)
+    if group:
+        return group
+    for prefix, name, rate in PREFIX_GROUPS:
+        if endpoint.startswith(prefix):
+            return name, rate
+    return DEFAULT_GROUP
+
+
+class TokenBucket:
+    """Token bucket с очередью ожидающих по приоритету"""
+
+    def __init__(self, name: str, rate: float, capacity: float, read_reserve: float = 0.0):
+        self.name = name
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1.0)
+        # Токены, которые не отдаются чтениям (READ)
+        self.read_reserve = read_reserve
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Лимит исчерпан по данным биржи: до этого момента токены не выдаются
+        self.blocked_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # Метрики
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0
+
+    async def acquire(self, priority: int = READ):
+        # Сразу - если никто с таким же или более высоким приоритетом не ждет
+        if (not self._waiters or self._waiters[0][0] > priority) and self._take(priority, time.monotonic()):
+            self.acquired += 1
+            return
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._schedule(0.0)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Токен уже выдан, но запрос не состоится - отдаем его следующему в очереди
+                self._release()
+            raise
+        self.acquired += 1
+        self.waited += 1
+        self.wait_seconds += time.monotonic() - started
+
+    def update_from_headers(self, limit: Optional[int], remaining: Optional[int], reset_ms: Optional[int]):
+        """Остаток лимита по ответу биржи"""
+        now = time.monotonic()
+        self._refill(now)
+        if limit and limit != self.capacity:
+            # Лимиты Bybit по UID - запросов в секунду
+            self.capacity = float(limit)
+            self.rate = float(limit)
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining <= 0:
+                self.block(max(reset_ms / 1000 - time.time(), 0.0) if reset_ms else RATE_LIMIT_BACKOFF_SECONDS)
+
+    def block(self, seconds: float):
+        """Биржа сообщила об исчерпании лимита: токены не выдаются seconds секунд"""
+        now = time.monotonic()
+        if now + seconds > self.blocked_until:
+            self.blocked_until = now + seconds
+            self.tokens = 0.0
+            self.throttled += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            "rate": self.rate,
+            "tokens": round(self.tokens, 1),
+            "waiting": len(self._waiters),
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "avg_wait_ms": round(self.wait_seconds / self.waited * 1000, 1) if self.waited else 0.0,
+            "throttled": self.throttled,
+        }
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _take(self, priority: int, now: float) -> bool:
+        if now < self.blocked_until:
+            return False
+        self._refill(now)
+        needed = 1.0 + (self.read_reserve if priority >= READ else 0.0)
+        if self.tokens >= needed:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def _release(self):
+        self.tokens = min(self.capacity, self.tokens + 1.0)
+        if self._waiters:
+            self._schedule(0.0)
+
+    def _schedule(self, delay: float):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+
+    def _pump(self):
+        self._timer = None
+        now = time.monotonic()
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():  # Ожидание отменено
+                heapq.heappop(self._waiters)
+                continue
+            if not self._take(priority, now):
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+        if self._waiters:
+            priority = self._waiters[0][0]
+            needed = 1.0 + (self.read_reserve if priority >= READ else 0.0)
+            delay = max(self.blocked_until - now, (needed - self.tokens) / self.rate, 0.001)
+            self._schedule(delay)
+
+
+class RateLimitManager:
+    """Buckets процесса: по (API ключ, группа эндпоинтов) и общий на IP"""
+
+    def __init__(self, ip_rate: float = 100.0, ip_burst: int = 100, read_reserve: float = 0.2):
+        self.configure(ip_rate, ip_burst, read_reserve)
+        self._key_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def configure(self, ip_rate: float, ip_burst: int, read_reserve: float):
+        """read_reserve - доля IP bucket, недоступная чтениям"""
+        self.ip_bucket = TokenBucket("ip", ip_rate, ip_burst, read_reserve=ip_burst * read_reserve)
+
+    async def acquire(self, api_key: Optional[str], endpoint: str, priority: int = READ):
+        """Разрешение на запрос: лимит ключа (для приватных запросов), затем лимит IP"""
+        if api_key:
+            await self._bucket(api_key, endpoint).acquire(priority)
+        await self.ip_bucket.acquire(priority)
+
+    def update_from_headers(self, api_key: Optional[str], endpoint: str, headers):
+        """Подстройка по заголовкам ответа (приходят только на приватные запросы)"""
+        if not api_key:
+            return
+        remaining = headers.get("X-Bapi-Limit-Status")
+        if remaining is None:
+            return
+        limit = headers.get("X-Bapi-Limit")
+        reset_ms = headers.get("X-Bapi-Limit-Reset-Timestamp")
+        self._bucket(api_key, endpoint).update_from_headers(
+            int(limit) if limit else None, int(remaining), int(reset_ms) if reset_ms else None
+        )
+
+    def on_rate_limited(self, api_key: Optional[str], endpoint: str):
+        """retCode 10006: лимит ключа исчерпан, не дожидаясь заголовков"""
+        bucket = self._bucket(api_key, endpoint) if api_key else self.ip_bucket
+        bucket.block(RATE_LIMIT_BACKOFF_SECONDS)
+
+    def on_ip_banned(self):
+        log_warning(0, f"Биржа ограничила IP (HTTP 403), REST запросы приостановлены на "
+                       f"{IP_BAN_BACKOFF_SECONDS:.0f}с", module_name=__name__)
+        self.ip_bucket.block(IP_BAN_BACKOFF_SECONDS)
+
+    def get_stats(self) -> Dict[str, Any]:
+        groups: Dict[str, Dict[str, int]] = {}
+        for (_, group), bucket in self._key_buckets.items():
+            totals = groups.setdefault(group, {"keys": 0, "waiting": 0, "waited": 0, "throttled": 0})
+            totals["keys"] += 1
+            totals["waiting"] += len(bucket._waiters)
+            totals["waited"] += bucket.waited
+            totals["throttled"] += bucket.throttled
+        return {"ip": self.ip_bucket.get_stats(), "groups": groups}
+
+    def _bucket(self, api_key: str, endpoint: str) -> TokenBucket:
+        group, rate = endpoint_group(endpoint)
+        key = (api_key, group)
+        bucket = self._key_buckets.get(key)
+        if bucket is None:
+            bucket = self._key_buckets[key] = TokenBucket(group, rate, rate)
+        return bucket
+
+
+# Общий ограничитель процесса (настраивается BotApplication)
+rate_limiter = RateLimitManager()
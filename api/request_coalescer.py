@@ -0,0 +1,81 @@
+# api/request_coalescer.py
+"""
+Объединение одинаковых публичных REST запросов процесса (get_klines, get_ticker).
+
+На закрытии свечи SignalAnalyzer каждого пользователя и каждого приоритета бота запрашивает
+одни и те же свечи почти одновременно. Одинаковые запросы (ключ - метод и параметры)
+разделяют один HTTP вызов и один разобранный результат:
+- single-flight: запрос, пришедший во время выполнения такого же, ждет его результат;
+- короткая TTL-память: запросы сразу после ответа получают тот же результат без вызова.
+Пустые результаты (ошибки) не запоминаются. Счетчики попаданий, промахов и объединений
+ведутся по методам (первый элемент ключа).
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+Key = Tuple[Hashable, ...]
+
+
+class RequestCoalescer:
+    """Single-flight + TTL-память результатов по ключу запроса"""
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 2048):
+        self.configure(ttls or {}, max_entries)
+        self._memo: Dict[Key, Tuple[float, Any]] = {}
+        self._inflight: Dict[Key, asyncio.Task] = {}
+        self._stats: Dict[Hashable, Dict[str, int]] = {}
+
+    def configure(self, ttls: Dict[str, float], max_entries: int):
+        """ttls - время жизни результата по методу, сек; метод без ttl только объединяется"""
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+
+    async def get(self, key: Key, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Результат loader() для ключа (первый элемент ключа - имя метода)"""
+        stats = self._stats.get(key[0])
+        if stats is None:
+            stats = self._stats[key[0]] = {"hits": 0, "misses": 0, "coalesced": 0}
+
+        entry = self._memo.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                stats["hits"] += 1
+                return entry[1]
+            del self._memo[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            stats["coalesced"] += 1
+        else:
+            stats["misses"] += 1
+            task = self._inflight[key] = asyncio.create_task(self._load(key, loader, self.ttls.get(key[0], 0.0)))
+        # shield: отмена одного ожидающего не прерывает запрос для остальных
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._memo), "inflight": len(self._inflight),
+                "methods": {str(method): dict(stats) for method, stats in self._stats.items()}}
+
+    async def _load(self, key: Key, loader: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        try:
+            result = await loader()
+            if result and ttl > 0:
+                if len(self._memo) >= self.max_entries:
+                    self._evict()
+                self._memo[key] = (time.monotonic() + ttl, result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self._memo.items() if expires <= now]:
+            del self._memo[key]
+        # Все записи живые - удаляются самые старые (порядок вставки)
+        while len(self._memo) >= self.max_entries:
+            del self._memo[next(iter(self._memo))]
+
+
+# Общий объединитель публичных запросов (настраивается BotApplication)
+public_coalescer = RequestCoalescer({"get_klines": 2.0, "get_ticker": 1.0})
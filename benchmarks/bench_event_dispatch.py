@@ -0,0 +1,112 @@
+# benchmarks/bench_event_dispatch.py
+"""
+Микро-бенчмарк доставки событий в EventBus.
+Сравнивает старую схему (линейный проход по всем подпискам) с индексированной
+таблицей маршрутизации при росте количества подписок, а также публикацию
+per-user копий тика с одним broadcast-событием на символ.
+
+Запуск: python -m benchmarks.bench_event_dispatch
+"""
+import asyncio
+import sys
+import os
+import time
+from decimal import Decimal
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.enums import EventType
+from core.events import EventBus, PriceUpdateEvent, SymbolPriceBroadcastEvent
+
+EVENT_TYPES_PER_USER = (
+    EventType.PRICE_UPDATE, EventType.NEW_CANDLE, EventType.ORDER_FILLED,
+    EventType.POSITION_UPDATE, EventType.ORDER_UPDATE,
+)
+EVENTS_PER_RUN = 20000
+
+
+def _make_handler():
+    async def handler(event):
+        return None
+    return handler
+
+
+async def _build_bus(users: int) -> EventBus:
+    bus = EventBus()
+    for user_id in range(1, users + 1):
+        for event_type in EVENT_TYPES_PER_USER:
+            await bus.subscribe(event_type, _make_handler(), user_id=user_id)
+    return bus
+
+
+async def _legacy_dispatch(bus: EventBus, event):
+    """Воспроизводит прежний алгоритм: копия списка и полный проход"""
+    handlers = []
+    for sub in bus._subscriptions[:]:
+        if sub.event_type == event.event_type:
+            if sub.user_id is None or sub.user_id == event.user_id:
+                handlers.append(sub.handler)
+    for handler in handlers:
+        await handler(event)
+
+
+async def _measure(dispatch, bus: EventBus, events) -> float:
+    started = time.perf_counter()
+    for event in events:
+        await dispatch(event)
+    return (time.perf_counter() - started) / len(events) * 1e6
+
+
+async def _measure_fanout(users: int, ticks: int = 2000):
+    """Публикация тика всем подписчикам символа: N per-user событий против одного broadcast"""
+    recipients = frozenset(range(1, users + 1))
+    results = {}
+    for mode in ("per-user", "broadcast"):
+        bus = EventBus(max_queue_size=0)
+        for user_id in recipients:
+            await bus.subscribe(EventType.PRICE_UPDATE, _make_handler(), user_id=user_id)
+        await bus.start()
+        puts = 0
+        started = time.perf_counter()
+        for _ in range(ticks):
+            if mode == "per-user":
+                for user_id in recipients:
+                    await bus.publish(PriceUpdateEvent(user_id=user_id, symbol="BTCUSDT", price=Decimal("100")))
+                    puts += 1
+            else:
+                await bus.publish(SymbolPriceBroadcastEvent(user_id=0, symbol="BTCUSDT", user_ids=recipients,
+                                                            price=Decimal("100")))
+                puts += 1
+        await bus.stop()
+        results[mode] = ((time.perf_counter() - started) / ticks * 1e6, puts)
+    return results
+
+
+async def main():
+    # Логи подписок в бенчмарке не нужны
+    import logging
+    logging.getLogger("TradingBot").setLevel(logging.ERROR)
+
+    print(f"{'users':>6} {'subs':>7} {'legacy, us/event':>18} {'indexed, us/event':>18} {'speedup':>8}")
+    for users in (10, 100, 500, 1000):
+        bus = await _build_bus(users)
+        events = [
+            PriceUpdateEvent(user_id=(i % users) + 1, symbol="BTCUSDT", price=Decimal("100"))
+            for i in range(EVENTS_PER_RUN)
+        ]
+        legacy = await _measure(lambda e: _legacy_dispatch(bus, e), bus, events)
+        indexed = await _measure(bus._dispatch, bus, events)
+        print(f"{users:>6} {bus.subscription_count:>7} {legacy:>18.2f} {indexed:>18.2f} {legacy / indexed:>7.1f}x")
+
+    print()
+    print(f"{'users':>6} {'per-user, us/tick':>18} {'queue puts':>11} {'broadcast, us/tick':>19} {'queue puts':>11}")
+    for users in (10, 50, 200):
+        results = await _measure_fanout(users)
+        (per_user, per_user_puts), (broadcast, broadcast_puts) = results["per-user"], results["broadcast"]
+        print(f"{users:>6} {per_user:>18.2f} {per_user_puts:>11} {broadcast:>19.2f} {broadcast_puts:>11}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+# benchmarks/bench_event_objects.py
+"""
+Микро-бенчмарк объектов событий горячего пути.
+Сравнивает прежние dataclass-события (__dict__, __post_init__ с datetime.now())
+с компактными slots событиями: скорость создания и память на событие.
+
+Запуск: python -m benchmarks.bench_event_objects
+"""
+import sys
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.enums import EventType
+from core.events import PriceUpdateEvent, NewCandleEvent, OrderUpdateEvent
+
+EVENTS_PER_RUN = 200000
+
+
+# --- Прежние определения событий (для сравнения) ---
+
+@dataclass
+class _LegacyBaseEvent:
+    user_id: int
+    timestamp: datetime = field(init=False)
+
+    def __post_init__(self):
+        self.timestamp = datetime.now()
+
+
+@dataclass
+class _LegacyPriceUpdateEvent(_LegacyBaseEvent):
+    symbol: str
+    price: Decimal
+    event_type: EventType = field(default=EventType.PRICE_UPDATE, init=False)
+
+
+@dataclass
+class _LegacyNewCandleEvent(_LegacyBaseEvent):
+    symbol: str
+    interval: str
+    candle_data: Dict[str, Decimal]
+    event_type: EventType = field(default=EventType.NEW_CANDLE, init=False)
+
+
+@dataclass
+class _LegacyOrderUpdateEvent(_LegacyBaseEvent):
+    order_data: Dict[str, Any]
+    event_type: EventType = field(default=EventType.ORDER_UPDATE, init=False)
+
+
+CANDLE = {"open": Decimal("1"), "high": Decimal("2"), "low": Decimal("0.5"), "close": Decimal("1.5")}
+ORDER = {"orderId": "1", "orderStatus": "New"}
+PRICE = Decimal("100.5")
+
+FACTORIES = {
+    "PriceUpdateEvent": (
+        lambda: _LegacyPriceUpdateEvent(user_id=1, symbol="BTCUSDT", price=PRICE),
+        lambda: PriceUpdateEvent(user_id=1, symbol="BTCUSDT", price=PRICE),
+    ),
+    "NewCandleEvent": (
+        lambda: _LegacyNewCandleEvent(user_id=1, symbol="BTCUSDT", interval="5m", candle_data=CANDLE),
+        lambda: NewCandleEvent(user_id=1, symbol="BTCUSDT", interval="5m", candle_data=CANDLE),
+    ),
+    "OrderUpdateEvent": (
+        lambda: _LegacyOrderUpdateEvent(user_id=1, order_data=ORDER),
+        lambda: OrderUpdateEvent(user_id=1, order_data=ORDER),
+    ),
+}
+
+
+def _events_per_second(factory) -> float:
+    started = time.perf_counter()
+    for _ in range(EVENTS_PER_RUN):
+        factory()
+    return EVENTS_PER_RUN / (time.perf_counter() - started)
+
+
+def _bytes_per_event(factory) -> float:
+    """Память, удерживаемая живыми событиями (общие поля - символ, цена, словари - не считаются)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    events = [factory() for _ in range(EVENTS_PER_RUN // 10)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # Сам список событий - не часть события
+    total -= sys.getsizeof(events)
+    return total / len(events)
+
+
+def main():
+    print(f"{'событие':<18} {'до, соб/с':>12} {'после, соб/с':>13} {'до, Б/соб':>10} {'после, Б/соб':>13}")
+    for name, (legacy, compact) in FACTORIES.items():
+        print(
+            f"{name:<18} {_events_per_second(legacy):>12,.0f} {_events_per_second(compact):>13,.0f} "
+            f"{_bytes_per_event(legacy):>10.0f} {_bytes_per_event(compact):>13.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
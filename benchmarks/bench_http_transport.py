@@ -0,0 +1,160 @@
+# benchmarks/bench_http_transport.py
+"""
+Бенчмарк HTTP-транспорта REST API на локальной заглушке биржи (без сети и Bybit).
+
+Запуск:
+    python -m benchmarks.bench_http_transport [пользователи,через,запятую] [рукопожатие_мс]
+Заглушка - HTTP/1.1 сервер с keep-alive: новое соединение стоит handshake_ms (эмуляция
+TCP+TLS до api.bybit.com), запрос - SERVICE_MS. Каждый пользователь делает REQUESTS_PER_USER
+запросов с паузами. Сравниваются три схемы:
+- сессия на экземпляр: своя aiohttp.ClientSession у каждого BybitAPI (прежняя схема);
+- сессия на вызов: async with BybitAPI(...) на каждый вызов (хэндлеры Telegram);
+- общий транспорт: http_transport, один пул на базовый URL.
+Отчет: p50/p99 задержки запроса, открыто соединений (рукопожатий) и пик одновременных сокетов.
+"""
+import asyncio
+import json
+import logging
+import random
+import sys
+import os
+import time
+
+import aiohttp
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from api.http_transport import HttpTransport
+
+SERVICE_MS = 2.0
+REQUESTS_PER_USER = 20
+THINK_MS = (0, 50)
+BODY = json.dumps({
+    "retCode": 0, "retMsg": "OK",
+    "result": {"category": "linear", "list": [{"symbol": "BTCUSDT", "lastPrice": "65000.10",
+                                               "bid1Price": "65000.00", "ask1Price": "65000.20"}]},
+}).encode()
+
+
+class _ExchangeStandIn:
+    """Минимальный HTTP/1.1 сервер с keep-alive и счетчиками соединений"""
+
+    def __init__(self, handshake_ms: float):
+        self.handshake = handshake_ms / 1000
+        self.open = self.peak = self.accepted = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def reset(self):
+        self.peak = self.open
+        self.accepted = 0
+
+    async def _serve(self, reader, writer):
+        self.open += 1
+        self.accepted += 1
+        self.peak = max(self.peak, self.open)
+        try:
+            await asyncio.sleep(self.handshake)
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                await asyncio.sleep(SERVICE_MS / 1000)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: keep-alive\r\n"
+                             b"Content-Length: %d\r\n\r\n%s" % (len(BODY), BODY))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.open -= 1
+            writer.close()
+
+
+async def _request(session: aiohttp.ClientSession, url: str, latencies: list, started: float = None):
+    started = started or time.perf_counter()
+    async with session.get(f"{url}/v5/market/tickers", params={"category": "linear", "symbol": "BTCUSDT"}) as response:
+        await response.json(content_type=None)
+    latencies.append(time.perf_counter() - started)
+
+
+async def _think(rng):
+    await asyncio.sleep(rng.uniform(*THINK_MS) / 1000)
+
+
+async def _per_instance(url, users, latencies, rng):
+    async def user():
+        async with aiohttp.ClientSession() as session:
+            for _ in range(REQUESTS_PER_USER):
+                await _think(rng)
+                await _request(session, url, latencies)
+    await asyncio.gather(*(user() for _ in range(users)))
+
+
+async def _per_call(url, users, latencies, rng):
+    async def user():
+        for _ in range(REQUESTS_PER_USER):
+            await _think(rng)
+            started = time.perf_counter()
+            async with aiohttp.ClientSession() as session:
+                await _request(session, url, latencies, started)
+    await asyncio.gather(*(user() for _ in range(users)))
+
+
+async def _shared(url, users, latencies, rng):
+    transport = HttpTransport()
+
+    async def user():
+        for _ in range(REQUESTS_PER_USER):
+            await _think(rng)
+            await _request(transport.session(url), url, latencies)
+    try:
+        await asyncio.gather(*(user() for _ in range(users)))
+    finally:
+        await transport.close()
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+
+async def main(args):
+    user_counts = [int(value) for value in args[0].split(",")] if args else [10, 50, 200]
+    handshake_ms = float(args[1]) if len(args) > 1 else 30.0
+
+    stand_in = _ExchangeStandIn(handshake_ms)
+    url = await stand_in.start()
+    print(f"заглушка биржи: {url}, рукопожатие {handshake_ms:.0f} мс, обработка {SERVICE_MS:.0f} мс, "
+          f"{REQUESTS_PER_USER} запросов на пользователя")
+    print(f"{'схема':<22}{'польз.':>7}{'p50, мс':>10}{'p99, мс':>10}{'соединений':>12}{'пик сокетов':>13}")
+    try:
+        for users in user_counts:
+            for name, scenario in (("сессия на экземпляр", _per_instance), ("сессия на вызов", _per_call),
+                                   ("общий транспорт", _shared)):
+                await asyncio.sleep(0.1)  # Закрытые клиентом сокеты досчитываются сервером
+                stand_in.reset()
+                latencies = []
+                await scenario(url, users, latencies, random.Random(users))
+                print(f"{name:<22}{users:>7}{_percentile(latencies, 0.5):>10.1f}{_percentile(latencies, 0.99):>10.1f}"
+                      f"{stand_in.accepted:>12}{stand_in.peak:>13}")
+    finally:
+        await stand_in.stop()
+
+
+if __name__ == "__main__":
+    logging.getLogger("TradingBot").setLevel(logging.WARNING)
+    asyncio.run(main(sys.argv[1:]))
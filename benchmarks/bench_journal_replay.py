@@ -0,0 +1,87 @@
+# benchmarks/bench_journal_replay.py
+"""
+Прогон журнала событий через свежий EventBus (без обращения к Bybit).
+
+Запуск:
+    python -m benchmarks.bench_journal_replay <каталог или файлы .journal>
+Без аргументов генерирует синтетический журнал (тики + обновления ордеров) во временном каталоге.
+Обработчики - пустые подписчики по всем типам событий для каждого пользователя из журнала,
+так что результат - пропускная способность чтения журнала и доставки через EventBus.
+Для прогона стратегий передайте в JournalReplayer.run() свой setup(event_bus).
+"""
+import asyncio
+import logging
+import sys
+import os
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.enums import EventType
+from core.events import EventBus, SymbolPriceBroadcastEvent, OrderUpdateEvent
+from core.event_journal import EventJournal, JournalReplayer, list_journals, iter_journal
+
+SYNTHETIC_TICKS = 100000
+SYNTHETIC_USERS = frozenset(range(1, 21))
+
+
+async def _write_synthetic_journal(directory: str):
+    bus = EventBus(max_queue_size=0)
+    journal = EventJournal(directory)
+    await journal.start()
+    journal.attach(bus)
+    await bus.start()
+    for i in range(SYNTHETIC_TICKS):
+        await bus.publish(SymbolPriceBroadcastEvent(0, "BTCUSDT", SYNTHETIC_USERS, Decimal(100000 + i % 500)))
+        if i % 100 == 0:
+            await bus.publish(OrderUpdateEvent(user_id=1, order_data={"orderId": str(i), "orderStatus": "New"}))
+    await bus.stop()
+    await journal.close()
+
+
+def _collect_user_ids(paths) -> set:
+    user_ids = set()
+    for path in paths:
+        for _, event in iter_journal(path):
+            user_ids.update(getattr(event, 'user_ids', ()) or (getattr(event, 'user_id', 0),))
+    return user_ids
+
+
+async def main(args):
+    if args:
+        paths = []
+        for arg in args:
+            path = Path(arg)
+            paths.extend(list_journals(path) if path.is_dir() else [path])
+    else:
+        directory = tempfile.mkdtemp(prefix="journal-")
+        await _write_synthetic_journal(directory)
+        paths = list_journals(directory)
+
+    user_ids = _collect_user_ids(paths)
+    delivered = 0
+
+    async def handler(_event):
+        nonlocal delivered
+        delivered += 1
+
+    async def setup(event_bus: EventBus):
+        for user_id in user_ids:
+            for event_type in EventType:
+                await event_bus.subscribe(event_type, handler, user_id=user_id)
+
+    size = sum(path.stat().st_size for path in paths)
+    result = await JournalReplayer(paths).run(setup)
+    print(f"журналов: {len(paths)}, размер: {size / 1024 / 1024:.1f} МБ, пользователей: {len(user_ids)}")
+    print(f"событий: {result['events']}, доставок обработчикам: {delivered}")
+    print(f"время: {result['elapsed_sec']} с, {result['events_per_sec']:,} соб/с "
+          f"(исходный интервал журнала: {result['journal_span_sec']} с)")
+
+
+if __name__ == "__main__":
+    logging.getLogger("TradingBot").setLevel(logging.WARNING)
+    asyncio.run(main(sys.argv[1:]))
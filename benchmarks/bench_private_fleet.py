@@ -0,0 +1,113 @@
+# benchmarks/bench_private_fleet.py
+"""
+Моделирование перезапуска флота приватных WebSocket (без сети и Bybit).
+
+Запуск:
+    python -m benchmarks.bench_private_fleet [число_аккаунтов] [connect_rate] [sync_concurrency]
+Каждое соединение: подключение (~50 мс), аутентификация (~30 мс), синхронизация ордеров
+(~200 мс нагрузки на REST/Postgres). Сравнивается старт без ограничений (все разом)
+и через PrivateFleetSupervisor: время до готовности всех соединений и пиковые нагрузки.
+"""
+import asyncio
+import logging
+import random
+import sys
+import os
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from websocket.private_fleet import PrivateFleetSupervisor, ConnectionHealth
+
+CONNECT_SEC = 0.05
+AUTH_SEC = 0.03
+SYNC_SEC = 0.2
+
+
+class _Load:
+    """Одновременные подключения и синхронизации (пиковая нагрузка на биржу и БД)"""
+
+    def __init__(self):
+        self.connects = self.peak_connects = 0
+        self.syncs = self.peak_syncs = 0
+
+    async def connect(self):
+        self.connects += 1
+        self.peak_connects = max(self.peak_connects, self.connects)
+        await asyncio.sleep(CONNECT_SEC * random.uniform(0.5, 1.5))
+        self.connects -= 1
+
+    async def sync(self):
+        self.syncs += 1
+        self.peak_syncs = max(self.peak_syncs, self.syncs)
+        await asyncio.sleep(SYNC_SEC * random.uniform(0.5, 1.5))
+        self.syncs -= 1
+
+
+class _Handler:
+    def __init__(self, index):
+        self.health = ConnectionHealth(f"private-{index}")
+
+    async def recycle(self):
+        pass
+
+
+async def _unbounded(accounts: int):
+    load = _Load()
+
+    async def account():
+        await load.connect()
+        await asyncio.sleep(AUTH_SEC)
+        await load.sync()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(account() for _ in range(accounts)))
+    return time.perf_counter() - started, load
+
+
+async def _supervised(accounts: int, connect_rate: float, sync_concurrency: int):
+    load = _Load()
+    fleet = PrivateFleetSupervisor(connect_rate=connect_rate, auth_rate=connect_rate, burst=5,
+                                   sync_concurrency=sync_concurrency)
+    handlers = [_Handler(index) for index in range(accounts)]
+    for handler in handlers:
+        fleet.register(handler)
+
+    async def account(handler):
+        await fleet.admit_connect()
+        await load.connect()
+        handler.health.on_connected()
+        await fleet.admit_auth()
+        await asyncio.sleep(AUTH_SEC)
+        fleet.on_ready(handler.health)
+        async with fleet.sync_slot():
+            await load.sync()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(account(handler) for handler in handlers))
+    return time.perf_counter() - started, load, fleet.get_fleet_health()
+
+
+async def main(args):
+    accounts = int(args[0]) if args else 150
+    connect_rate = float(args[1]) if len(args) > 1 else 20.0
+    sync_concurrency = int(args[2]) if len(args) > 2 else 4
+
+    elapsed, load = await _unbounded(accounts)
+    print(f"аккаунтов: {accounts}")
+    print(f"без ограничений: {elapsed:6.2f} с | пик подключений {load.peak_connects:4d} | "
+          f"пик синхронизаций {load.peak_syncs:4d}")
+
+    elapsed, load, health = await _supervised(accounts, connect_rate, sync_concurrency)
+    startup = health["startup"]
+    print(f"супервизор:      {elapsed:6.2f} с | пик подключений {load.peak_connects:4d} | "
+          f"пик синхронизаций {load.peak_syncs:4d} | "
+          f"все готовы за {startup['elapsed_sec']} с (оценка сверху {accounts / connect_rate:.1f} с), "
+          f"connect->ready p99 {startup['connect_to_ready']['p99_ms']} мс")
+
+
+if __name__ == "__main__":
+    logging.getLogger("TradingBot").setLevel(logging.WARNING)
+    asyncio.run(main(sys.argv[1:]))
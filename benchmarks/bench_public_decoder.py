@@ -0,0 +1,160 @@
+# benchmarks/bench_public_decoder.py
+"""
+Бенчмарк декодирования кадров публичного WebSocket.
+Сравнивает прежний разбор (json.loads + startswith/split + Decimal(str(...)))
+с PublicMessageDecoder (orjson при наличии, таблица топиков, to_decimal_fast).
+
+Запуск:
+    python -m benchmarks.bench_public_decoder [файл_кадров]
+Файл кадров - по одному сырому JSON-кадру на строку (.gz поддерживается).
+Без аргумента используется синтетическая запись: поток publicTrade по 20 символам
+с закрытием свечей kline.1/kline.5 и системными сообщениями.
+"""
+import asyncio
+import gzip
+import json
+import random
+import sys
+import os
+import time
+from decimal import Decimal
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from websocket.public_decoder import (
+    PublicMessageDecoder, TRADE_CHANNEL, TICKER_CHANNEL, KLINE_CHANNEL, loads, json_backend_name, to_decimal_fast
+)
+
+SYMBOLS = [f"SYM{i}USDT" for i in range(20)]
+SYNTHETIC_FRAMES = 200000
+
+
+def _synthetic_frames():
+    rng = random.Random(42)
+    frames = []
+    ts = 1_700_000_000_000
+    for i in range(SYNTHETIC_FRAMES):
+        symbol = rng.choice(SYMBOLS)
+        ts += 3
+        if i % 500 == 0:
+            interval = rng.choice(("1", "5"))
+            frames.append(json.dumps({
+                "topic": f"kline.{interval}.{symbol}", "type": "snapshot", "ts": ts,
+                "data": [{"start": ts - 60000, "end": ts, "interval": interval, "open": "100.1", "close": "100.4",
+                          "high": "100.9", "low": "99.8", "volume": "1234.5", "turnover": "123456.7",
+                          "confirm": i % 1000 == 0, "timestamp": ts}],
+            }))
+        elif i % 5000 == 1:
+            frames.append(json.dumps({"success": True, "ret_msg": "pong", "conn_id": "x", "op": "ping"}))
+        else:
+            trades = [{"T": ts, "s": symbol, "S": rng.choice(("Buy", "Sell")), "v": "0.01",
+                       "p": f"{100 + rng.random():.4f}", "L": "PlusTick", "i": str(i), "BT": False}
+                      for _ in range(rng.randint(1, 3))]
+            frames.append(json.dumps({"topic": f"publicTrade.{symbol}", "type": "snapshot", "ts": ts, "data": trades}))
+    return frames
+
+
+def _load_frames(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        return [line.rstrip("\n") for line in file if line.strip()]
+
+
+class _Sink:
+    """Заменяет публикацию в EventBus: только считает события"""
+
+    def __init__(self):
+        self.events = 0
+        self.recipients = {symbol: frozenset({1}) for symbol in SYMBOLS}
+
+    # --- Прежний путь ---
+
+    async def legacy_handle(self, message):
+        data = json.loads(message)
+        if "op" in data:
+            pass
+        if "topic" not in data:
+            return
+        topic = data["topic"]
+        if topic.startswith("publicTrade."):
+            symbol = topic.split(".")[1]
+            await self.legacy_trade(symbol, data["data"])
+        elif topic.startswith("tickers."):
+            symbol = topic.split(".")[1]
+        elif topic.startswith("kline."):
+            parts = topic.split(".")
+            await self.legacy_candle(parts[2], parts[1], data["data"])
+
+    async def legacy_trade(self, symbol, trade_data):
+        price = Decimal(str(trade_data[-1].get("p", "0")))
+        if price <= 0 or not self.recipients.get(symbol):
+            return
+        self.events += 1
+
+    async def legacy_candle(self, symbol, interval, candle_data):
+        candle = candle_data[0]
+        if not candle.get("confirm", False):
+            return
+        {key: Decimal(str(candle[key])) for key in ("open", "high", "low", "close", "volume")}
+        if self.recipients.get(symbol):
+            self.events += 1
+
+    # --- Новый путь ---
+
+    async def trade(self, symbol, trade_data):
+        if not trade_data or not self.recipients.get(symbol):
+            return
+        if to_decimal_fast(trade_data[-1].get("p", "0")) <= 0:
+            return
+        self.events += 1
+
+    async def ticker(self, symbol, ticker_data):
+        return None
+
+    async def candle(self, symbol, interval, candle_data):
+        candle = candle_data[0]
+        if not candle.get("confirm", False) or not self.recipients.get(symbol):
+            return
+        {key: to_decimal_fast(candle[key]) for key in ("open", "high", "low", "close", "volume")}
+        self.events += 1
+
+
+async def _run(frames, handle):
+    started = time.perf_counter()
+    for frame in frames:
+        await handle(frame)
+    return len(frames) / (time.perf_counter() - started)
+
+
+async def main(args):
+    frames = _load_frames(args[0]) if args else _synthetic_frames()
+
+    legacy = _Sink()
+    legacy_rate = await _run(frames, legacy.legacy_handle)
+
+    sink = _Sink()
+    decoder = PublicMessageDecoder({TRADE_CHANNEL: sink.trade, TICKER_CHANNEL: sink.ticker, KLINE_CHANNEL: sink.candle})
+    for symbol in SYMBOLS:
+        decoder.register_topics(decoder.topics_for_symbol(symbol, ("5", "1"), ticker=True))
+
+    async def handle(message):
+        data = loads(message)
+        topic = data.get("topic")
+        if topic is None:
+            return
+        route = decoder.route(topic)
+        if route is not None:
+            await route.handler(*route.args, data["data"])
+
+    fast_rate = await _run(frames, handle)
+
+    assert legacy.events == sink.events, (legacy.events, sink.events)
+    print(f"кадров: {len(frames)}, событий: {sink.events}, JSON бэкенд: {json_backend_name()}")
+    print(f"прежний разбор: {legacy_rate:>12,.0f} сообщ/с")
+    print(f"декодер:        {fast_rate:>12,.0f} сообщ/с  ({fast_rate / legacy_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
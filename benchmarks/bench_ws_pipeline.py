@@ -0,0 +1,142 @@
+# benchmarks/bench_ws_pipeline.py
+"""
+Бенчмарк полного конвейера публичного потока на записи трафика:
+кадр -> GlobalWebSocketManager (декодер, доска рынка, агрегатор свечей) -> EventBus -> стратегии.
+
+Запуск:
+    python -m benchmarks.bench_ws_pipeline [запись.tsv.gz] [--users 50] [--symbols-per-user 5] [--speed 0]
+Запись - файл websocket.capture (WS_CAPTURE_DIR); без аргумента - синтетический поток
+из bench_public_decoder. --speed 0 - кадры подаются без пауз (пропускная способность под
+насыщением), --speed N - с темпом записи, ускоренным в N раз (задержка при штатной нагрузке).
+
+Стратегии заменены пробниками с тем же горячим путем, что у BaseStrategy на тике:
+подписка на PRICE_UPDATE пользователя, блокировка стратегии, расчет PnL позиции и
+сравнение с уровнями выхода. Отчет: кадров/с, p50/p99 времени от подачи кадра до решения
+стратегии, CPU на кадр. EventBus настраивается так же, как в main.py (system_config.event_bus).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import os
+import time
+from bisect import bisect_right
+from decimal import Decimal
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.enums import EventType
+from core.events import EventBus
+from core.settings_config import system_config
+from websocket.capture import read_capture, frame_topic
+from websocket.websocket_manager import GlobalWebSocketManager
+from benchmarks.bench_public_decoder import _synthetic_frames
+
+
+class _DecisionProbe:
+    """Заменяет стратегию пользователя: решение по каждому тику его символов"""
+
+    def __init__(self, user_id: int, feed_ns: list, latencies: list):
+        self.user_id = user_id
+        self.lock = asyncio.Lock()
+        self.entry_prices = {}
+        self.quantity = Decimal("0.01")
+        self.decisions = 0
+        self._feed_ns = feed_ns
+        self._latencies = latencies
+
+    async def on_price(self, event):
+        async with self.lock:
+            entry = self.entry_prices.setdefault(event.symbol, event.price)
+            pnl = (event.price - entry) * self.quantity
+            if pnl > entry * Decimal("0.001") or pnl < -entry * Decimal("0.002"):
+                self.entry_prices[event.symbol] = event.price
+            self.decisions += 1
+        # Кадр, породивший событие: последний поданный до создания события
+        fed_ns = self._feed_ns[bisect_right(self._feed_ns, event.ts_ns) - 1]
+        self._latencies.append(time.monotonic_ns() - fed_ns)
+
+
+def _load(path):
+    if path:
+        return [(received_at, frame) for received_at, _source, frame in read_capture(path, "public")]
+    # Компактный JSON, как в потоке Bybit; ~2000 кадров/с записи
+    return [(index * 0.0005, json.dumps(json.loads(frame), separators=(",", ":")))
+            for index, frame in enumerate(_synthetic_frames())]
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] / 1e6 if values else 0.0
+
+
+async def main(args):
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера публичного WebSocket")
+    parser.add_argument("capture", nargs="?")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--symbols-per-user", type=int, default=5)
+    parser.add_argument("--speed", type=float, default=0.0)
+    options = parser.parse_args(args)
+
+    frames = _load(options.capture)
+    symbols = sorted({topic.rsplit(".", 1)[-1] for topic in map(frame_topic, (f for _, f in frames)) if topic})
+
+    bus_config = system_config.event_bus
+    event_bus = EventBus(
+        max_queue_size=bus_config.max_queue_size,
+        partitions=bus_config.partitions,
+        partition_by_symbol=bus_config.partition_by_symbol,
+        conflate_price_updates=bus_config.conflate_price_updates,
+        priority_lanes=bus_config.priority_lanes,
+        starvation_limit=bus_config.starvation_limit,
+        overflow_policies=bus_config.overflow_policies,
+        slow_handler_ms=bus_config.slow_handler_ms
+    )
+    # running=False: шарды не подключаются, кадры подаются напрямую в обработчик менеджера
+    manager = GlobalWebSocketManager(event_bus)
+
+    async def no_backfill(symbol, interval, until_start=None):
+        return None  # Пропуски свечей в записи не догружаются через REST: прогон офлайн
+
+    manager._backfill_candles = no_backfill
+
+    feed_ns, latencies = [], []
+    probes = []
+    for user_id in range(1, options.users + 1):
+        probe = _DecisionProbe(user_id, feed_ns, latencies)
+        probes.append(probe)
+        await event_bus.subscribe(EventType.PRICE_UPDATE, probe.on_price, user_id=user_id)
+        for offset in range(min(options.symbols_per_user, len(symbols))):
+            await manager.subscribe_symbol(user_id, symbols[(user_id + offset) % len(symbols)])
+    await event_bus.start()
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    first_at = frames[0][0] if frames else 0.0
+    for received_at, frame in frames:
+        if options.speed > 0:
+            delay = (received_at - first_at) / options.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        feed_ns.append(time.monotonic_ns())
+        await manager._handle_public_message(frame)
+    bus_metrics = event_bus.get_metrics()
+    await event_bus.stop()  # Дожидается доставки всех событий
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    latencies.sort()
+    print(f"кадров: {len(frames)}, символов: {len(symbols)}, пользователей: {options.users}, "
+          f"решений: {sum(probe.decisions for probe in probes)}, скорость x{options.speed or 'max'}")
+    print(f"пропускная способность: {len(frames) / elapsed:>10,.0f} кадров/с")
+    print(f"кадр -> решение:        p50 {_percentile(latencies, 0.5):.3f} мс | "
+          f"p99 {_percentile(latencies, 0.99):.3f} мс | max {_percentile(latencies, 1.0):.3f} мс")
+    print(f"CPU на кадр:            {cpu / len(frames) * 1e6:.1f} мкс")
+    print(f"EventBus: отброшено {bus_metrics['dropped_total']}, схлопнуто тиков {bus_metrics['conflated_ticks']}")
+
+
+if __name__ == "__main__":
+    logging.getLogger("TradingBot").setLevel(logging.WARNING)
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,119 @@
+# benchmarks/replay_server.py
+"""
+Локальный replay-сервер WebSocket: воспроизводит запись websocket.capture вместо Bybit.
+
+Запуск:
+    python -m benchmarks.replay_server <запись.tsv.gz> [--port 8765] [--speed 1] [--source public] [--loop]
+--speed N - ускорение относительно записи (0 - без пауз, с максимальной скоростью).
+Бот подключается к серверу через PUBLIC_WS_URL=ws://127.0.0.1:8765
+(или PRIVATE_WS_URL с --source private-<user_id>).
+
+Сервер ведет себя как поток Bybit настолько, насколько это нужно клиентам бота:
+подтверждает subscribe/auth, отвечает на ping, отдает только кадры подписанных топиков
+(приватные кадры - после auth). Время кадров берется из записи: пауза между кадрами -
+разница времени приема, деленная на speed.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import os
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import websockets
+
+from websocket.capture import read_capture, frame_topic
+
+
+class ReplaySession:
+    """Одно клиентское соединение: подписки клиента и воспроизведение записи"""
+
+    def __init__(self, websocket, frames, speed: float, loop: bool):
+        self.websocket = websocket
+        self.frames = frames
+        self.speed = speed
+        self.loop = loop
+        self.topics = set()
+        self.ready = asyncio.Event()
+        self.sent = 0
+
+    async def run(self):
+        player = asyncio.create_task(self._play())
+        try:
+            async for message in self.websocket:
+                await self._handle_request(json.loads(message))
+        finally:
+            player.cancel()
+
+    async def _handle_request(self, request):
+        op = request.get("op")
+        reply = {"success": True, "ret_msg": "", "conn_id": "replay", "req_id": request.get("req_id"), "op": op}
+        if op == "ping":
+            reply["ret_msg"] = "pong"
+        elif op == "subscribe":
+            if self.topics is not None:
+                self.topics.update(request.get("args", []))
+            self.ready.set()
+        elif op == "unsubscribe" and self.topics is not None:
+            self.topics.difference_update(request.get("args", []))
+        elif op == "auth":
+            # Приватный поток: отправка начинается после аутентификации, топики не фильтруются
+            self.topics = None
+            self.ready.set()
+        await self.websocket.send(json.dumps(reply))
+
+    async def _play(self):
+        await self.ready.wait()
+        while True:
+            started = time.monotonic()
+            first_at = None
+            for received_at, _source, frame in self.frames:
+                if first_at is None:
+                    first_at = received_at
+                if self.speed > 0:
+                    delay = (received_at - first_at) / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if self.topics is not None and frame_topic(frame) not in self.topics:
+                    continue
+                await self.websocket.send(frame)
+                self.sent += 1
+            if not self.loop:
+                return
+
+
+async def main(args):
+    parser = argparse.ArgumentParser(description="Replay-сервер записи WebSocket")
+    parser.add_argument("capture")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--source", default="public")
+    parser.add_argument("--loop", action="store_true")
+    options = parser.parse_args(args)
+
+    frames = list(read_capture(options.capture, options.source))
+    print(f"кадров: {len(frames)} ({options.source}), длительность записи "
+          f"{frames[-1][0] - frames[0][0] if frames else 0:.1f} с, скорость x{options.speed or 'max'}")
+
+    async def handler(websocket, _path=None):
+        session = ReplaySession(websocket, frames, options.speed, options.loop)
+        try:
+            await session.run()
+        except websockets.ConnectionClosed:
+            pass
+        print(f"клиент отключился, отправлено кадров: {session.sent}")
+
+    async with websockets.serve(handler, options.host, options.port):
+        print(f"replay-сервер: ws://{options.host}:{options.port}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    logging.getLogger("TradingBot").setLevel(logging.WARNING)
+    asyncio.run(main(sys.argv[1:]))
@@ -19,11 +19,18 @@ from core.events import (
 from cache.redis_manager import redis_manager
 from core.user_session import UserSession
 from websocket.websocket_manager import GlobalWebSocketManager
+from websocket.private_fleet import private_fleet
+from api.http_transport import http_transport
+from api.rate_limiter import rate_limiter
+from api.instruments_catalog import instruments_catalog
+from api.request_coalescer import public_coalescer
+from core.kline_store import kline_store
 from core.default_configs import DefaultConfigs
 from core.enums import ConfigType
 from core.settings_config import system_config
 from database.db_trades import db_manager
 from core.concurrency_manager import start_cleanup_task
+from core.metrics_server import MetricsServer
 
 
 
@@ -42,6 +49,7 @@ class BotApplication:
         
         # Глобальные компоненты
         self.global_websocket_manager: Optional[GlobalWebSocketManager] = None
+        self.metrics_server: Optional[MetricsServer] = None
 
         # Статистика приложения
         self.app_stats = {
@@ -273,8 +281,19 @@ class BotApplication:
                     "websocket_manager_running": (
                         self.global_websocket_manager.running 
                         if self.global_websocket_manager else False
-                    )
+                    ),
+                    "public_websocket": (
+                        self.global_websocket_manager.get_public_stats()
+                        if self.global_websocket_manager else None
+                    ),
+                    "private_websocket": private_fleet.get_fleet_health(),
+                    "http_pools": http_transport.get_stats(),
+                    "rate_limits": rate_limiter.get_stats(),
+                    "instruments": instruments_catalog.get_stats(),
+                    "public_requests": public_coalescer.get_stats(),
+                    "kline_store": kline_store.get_stats()
                 },
+                "event_bus": self.event_bus.get_metrics(),
                 "user_sessions": sessions_stats
             }
             
@@ -282,16 +301,86 @@ class BotApplication:
             log_error(0, f"Ошибка получения статуса приложения: {e}", module_name=__name__)
             return {"running": self._running, "error": str(e)}
 
+    def _export_prometheus(self) -> str:
+        """Метрики EventBus и публичного WebSocket в формате Prometheus"""
+        metrics = self.event_bus.export_prometheus()
+        if self.global_websocket_manager:
+            metrics += self.global_websocket_manager.export_prometheus()
+        return metrics
+
     async def _initialize_global_components(self):
         """Инициализация глобальных компонентов"""
         try:
             exchange_config = system_config.get_exchange_config("bybit")
             use_demo = exchange_config.demo if exchange_config else False
 
+            # Общий HTTP-транспорт REST API (пулы создаются при первых запросах и живут до остановки)
+            http_transport.retain()
+            http_config = system_config.http
+            http_transport.configure(
+                pool_limit=http_config.pool_limit,
+                pool_limit_per_host=http_config.pool_limit_per_host,
+                keepalive_timeout=http_config.keepalive_timeout,
+                dns_cache_ttl=http_config.dns_cache_ttl,
+                connect_timeout=http_config.connect_timeout,
+                total_timeout=http_config.total_timeout
+            )
+            rate_config = system_config.rate_limit
+            rate_limiter.configure(
+                ip_rate=rate_config.ip_rate,
+                ip_burst=rate_config.ip_burst,
+                read_reserve=rate_config.read_reserve
+            )
+
+            # Каталог инструментов: теплый старт из снимка, обновление - при первом обращении
+            instruments_config = system_config.instruments
+            instruments_catalog.configure(
+                ttl=instruments_config.ttl,
+                snapshot_path=instruments_config.snapshot_path,
+                redis_snapshot=instruments_config.redis_snapshot
+            )
+            await instruments_catalog.load_snapshot()
+
+            # Объединение одинаковых публичных запросов (свечи и тикеры) всех пользователей
+            public_config = system_config.public_requests
+            public_coalescer.configure(
+                ttls={"get_klines": public_config.klines_ttl, "get_ticker": public_config.ticker_ttl},
+                max_entries=public_config.max_entries
+            )
+            kline_config = system_config.kline_store
+            kline_store.configure(
+                history_size=kline_config.history_size,
+                forming_ttl=kline_config.forming_ttl
+            )
+
             # Инициализация глобального WebSocket менеджера
             self.global_websocket_manager = GlobalWebSocketManager(self.event_bus, demo=use_demo)
             await self.global_websocket_manager.start()
 
+            # Супервизор приватных WebSocket: допуск подключений и контроль здоровья
+            private_config = system_config.private_websocket
+            private_fleet.configure(
+                connect_rate=private_config.connect_rate,
+                auth_rate=private_config.auth_rate,
+                burst=private_config.burst,
+                sync_concurrency=private_config.sync_concurrency,
+                ping_interval=private_config.ping_interval,
+                rtt_budget_ms=private_config.rtt_budget_ms,
+                degraded_score=private_config.degraded_score,
+                check_interval=private_config.check_interval
+            )
+            await private_fleet.start()
+
+            # Эндпоинт метрик (EventBus и WebSocket в формате Prometheus + JSON статуса приложения)
+            metrics_config = system_config.metrics
+            if metrics_config.enabled:
+                self.metrics_server = MetricsServer(
+                    metrics_config.host, metrics_config.port,
+                    prometheus_provider=self._export_prometheus,
+                    status_provider=self.get_app_status
+                )
+                await self.metrics_server.start()
+
             log_info(0, "Глобальные компоненты инициализированы", module_name=__name__)
 
         except Exception as e:
@@ -304,6 +393,16 @@ class BotApplication:
             if self.global_websocket_manager:
                 await self.global_websocket_manager.stop()
 
+            await private_fleet.stop()
+            await instruments_catalog.stop()
+
+            if self.metrics_server:
+                await self.metrics_server.stop()
+                self.metrics_server = None
+
+            # Последним: остановленные выше компоненты еще могли выполнять REST запросы
+            await http_transport.close()
+
             log_info(0, "Глобальные компоненты остановлены", module_name=__name__)
 
         except Exception as e:
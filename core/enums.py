@@ -165,6 +165,14 @@ class WebSocketChannel(Enum):
     WALLET = "wallet"
 
 
+class OverflowPolicy(Enum):
+    """Политика EventBus при переполнении очереди"""
+    BLOCK = "block"              # Ждать свободного места (событие не теряется)
+    DROP_OLDEST = "drop_oldest"  # Вытеснить самое старое событие лейна
+    DROP_NEWEST = "drop_newest"  # Отбросить новое событие
+    CONFLATE = "conflate"        # Схлопывать с ожидающим событием того же ключа, иначе drop_oldest
+
+
 class ExchangeType(Enum):
     """Типы бирж"""
     BYBIT = "bybit"
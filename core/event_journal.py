@@ -0,0 +1,202 @@
+# core/event_journal.py
+"""
+Журнал событий EventBus: append-only бинарный файл с ротацией по дням и детерминированный replay.
+
+Формат записи (little-endian):
+    uint32 длина payload | uint64 время публикации (time.time_ns) | payload (pickle события)
+Файлы: <dir>/events-YYYYMMDD.journal (день по UTC). Недописанная последняя запись
+(падение процесса) при чтении игнорируется.
+"""
+import asyncio
+import mmap
+import os
+import pickle
+import struct
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple, Callable, Awaitable, Union
+
+from core.enums import EventType, OverflowPolicy
+from core.events import EventBus
+from core.logger import log_info, log_error, log_warning
+
+RECORD_HEADER = struct.Struct("<IQ")
+JOURNAL_SUFFIX = ".journal"
+NS_PER_DAY = 86400 * 1_000_000_000
+
+
+class EventJournal:
+    """
+    Тап EventBus, записывающий каждое опубликованное событие в журнал.
+    write() синхронный и только дописывает в буфер файла, сброс на диск -
+    фоновой задачей раз в flush_interval секунд и при ротации/закрытии.
+    """
+
+    def __init__(self, directory: Union[str, Path], flush_interval: float = 1.0, buffer_size: int = 1 << 20):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self._file = None
+        self._day: Optional[int] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+        # Метрики
+        self.events_written = 0
+        self.bytes_written = 0
+        self.encode_errors = 0
+
+    @property
+    def current_path(self) -> Optional[Path]:
+        return Path(self._file.name) if self._file else None
+
+    async def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        log_info(0, f"Журнал событий включен: {self.directory}", "EventJournal")
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._file:
+            self._file.close()
+            self._file = None
+            self._day = None
+
+    def attach(self, event_bus: EventBus):
+        event_bus.add_tap(self.write)
+
+    def detach(self, event_bus: EventBus):
+        event_bus.remove_tap(self.write)
+
+    def write(self, event: Any):
+        """Дописывает событие в журнал текущего дня"""
+        try:
+            payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self.encode_errors += 1
+            if self.encode_errors == 1:
+                log_error(0, f"Событие {type(event).__name__} не сериализуется в журнал: {e}", "EventJournal")
+            return
+
+        now_ns = time.time_ns()
+        day = now_ns // NS_PER_DAY
+        if day != self._day:
+            self._rotate(day)
+        self._file.write(RECORD_HEADER.pack(len(payload), now_ns))
+        self._file.write(payload)
+        self.events_written += 1
+        self.bytes_written += RECORD_HEADER.size + len(payload)
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def _rotate(self, day: int):
+        if self._file:
+            self._file.close()
+        date = datetime.fromtimestamp(day * 86400, tz=timezone.utc)
+        path = self.directory / f"events-{date:%Y%m%d}{JOURNAL_SUFFIX}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "ab", buffering=self.buffer_size)
+        self._day = day
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log_error(0, f"Ошибка сброса журнала событий: {e}", "EventJournal")
+
+
+def iter_journal(path: Union[str, Path]) -> Iterator[Tuple[int, Any]]:
+    """Читает журнал через mmap, возвращая (время публикации в нс, событие)"""
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                offset = 0
+                header_size = RECORD_HEADER.size
+                while offset + header_size <= size:
+                    length, published_ns = RECORD_HEADER.unpack_from(data, offset)
+                    start = offset + header_size
+                    end = start + length
+                    if end > size:
+                        log_warning(0, f"Журнал {path}: недописанная запись на смещении {offset}, чтение остановлено",
+                                    "EventJournal")
+                        break
+                    yield published_ns, pickle.loads(view[start:end])
+                    offset = end
+            finally:
+                view.release()
+
+
+def list_journals(directory: Union[str, Path]) -> List[Path]:
+    """Файлы журнала в хронологическом порядке"""
+    return sorted(Path(directory).glob(f"events-*{JOURNAL_SUFFIX}"))
+
+
+def create_replay_event_bus() -> EventBus:
+    """
+    EventBus для детерминированного replay: одна партиция, без лейнов приоритета
+    и с политикой BLOCK для всех типов - порядок доставки равен порядку журнала, ничего не теряется.
+    """
+    return EventBus(
+        partitions=1,
+        priority_lanes=False,
+        overflow_policies={event_type: OverflowPolicy.BLOCK for event_type in EventType},
+    )
+
+
+class JournalReplayer:
+    """
+    Прогоняет журнал через свежий EventBus с максимальной скоростью.
+    setup(event_bus) подписывает стратегии/обработчики до начала прогона.
+    """
+
+    def __init__(self, paths: List[Union[str, Path]],
+                 event_filter: Optional[Callable[[Any], bool]] = None):
+        self.paths = [Path(path) for path in paths]
+        self.event_filter = event_filter
+
+    async def run(self, setup: Optional[Callable[[EventBus], Awaitable[None]]] = None,
+                  event_bus: Optional[EventBus] = None) -> dict:
+        event_bus = event_bus or create_replay_event_bus()
+        if setup:
+            await setup(event_bus)
+        await event_bus.start()
+
+        published = 0
+        started = time.perf_counter()
+        first_ns = last_ns = None
+        try:
+            for path in self.paths:
+                for published_ns, event in iter_journal(path):
+                    if self.event_filter and not self.event_filter(event):
+                        continue
+                    await event_bus.publish(event)
+                    published += 1
+                    first_ns = first_ns or published_ns
+                    last_ns = published_ns
+        finally:
+            # stop() дожидается доставки всех поставленных событий
+            await event_bus.stop()
+        elapsed = time.perf_counter() - started
+
+        return {
+            "events": published,
+            "elapsed_sec": round(elapsed, 3),
+            "events_per_sec": round(published / elapsed) if elapsed > 0 else 0,
+            "journal_span_sec": round((last_ns - first_ns) / 1e9, 3) if published else 0.0,
+            "event_bus": event_bus.get_metrics(),
+        }
@@ -1,10 +1,12 @@
 import asyncio
-from dataclasses import dataclass, field
+import time
+from dataclasses import dataclass, field, replace
 from decimal import Decimal
-from typing import Dict, Any, Optional, List, Callable, Awaitable
-from datetime import datetime
-from core.logger import log_debug, log_error, log_info
-from core.enums import EventType
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Tuple, FrozenSet, ClassVar, Set
+from datetime import datetime, timedelta
+from core.logger import log_debug, log_error, log_info, log_warning
+from core.enums import EventType, OverflowPolicy
+from core.metrics import LatencyHistogram
 
 @dataclass
 class BaseEvent:
@@ -18,28 +20,93 @@ class BaseEvent:
         self.timestamp = datetime.now()
 
 
-@dataclass
-class NewCandleEvent(BaseEvent):
+class CompactEvent:
+    """
+    Основа для событий горячего пути (тики, свечи, обновления ордеров).
+    Наследники - dataclass со __slots__, без __dict__. frozen не используется: его __init__
+    присваивает поля через object.__setattr__ и заметно замедляет создание событий.
+    Один объект раздается всем обработчикам, поэтому обработчики не изменяют событие.
+    Время создания хранится как time.monotonic_ns() (ts_ns), datetime строится
+    при первом обращении к timestamp и запоминается.
+    """
+    __slots__ = ("_timestamp",)
+
+    @property
+    def timestamp(self) -> datetime:
+        """Время создания события (настенные часы, вычисляется из ts_ns один раз)"""
+        try:
+            return self._timestamp
+        except AttributeError:
+            self._timestamp = datetime.now() - timedelta(microseconds=(time.monotonic_ns() - self.ts_ns) / 1000)
+            return self._timestamp
+
+
+@dataclass(slots=True)
+class NewCandleEvent(CompactEvent):
     """Событие о закрытии новой свечи"""
+    user_id: int
     symbol: str
     interval: str
     candle_data: Dict[str, Decimal]
-    event_type: EventType = field(default=EventType.NEW_CANDLE, init=False)
+    ts_ns: int = field(default_factory=time.monotonic_ns, kw_only=True)
+    event_type: ClassVar[EventType] = EventType.NEW_CANDLE
 
 
-@dataclass
-class PriceUpdateEvent(BaseEvent):
+@dataclass(slots=True)
+class PriceUpdateEvent(CompactEvent):
     """Событие об обновлении цены тикера"""
+    user_id: int
     symbol: str
     price: Decimal
-    event_type: EventType = field(default=EventType.PRICE_UPDATE, init=False)
+    ts_ns: int = field(default_factory=time.monotonic_ns, kw_only=True)
+    event_type: ClassVar[EventType] = EventType.PRICE_UPDATE
 
 
-@dataclass
-class OrderUpdateEvent(BaseEvent):
+@dataclass(slots=True)
+class SymbolBroadcastEvent(CompactEvent):
+    """
+    Рыночное событие, публикуемое ОДИН раз на символ вместо копии на каждого пользователя.
+
+    EventBus доставляет его подпискам на символ (subscribe(..., symbol=...)) как есть,
+    а для пользовательских и глобальных подписок разворачивает в обычное per-user событие
+    через to_user_event(user_id) - существующие обработчики продолжают работать без изменений.
+    user_id всегда 0, получатели перечислены в user_ids.
+    Базовый класс не публикуется: каждый подкласс задает event_type и to_user_event.
+    """
+    user_id: int
+    symbol: str
+    user_ids: FrozenSet[int]
+    ts_ns: int = field(default_factory=time.monotonic_ns, kw_only=True)
+
+
+@dataclass(slots=True)
+class SymbolPriceBroadcastEvent(SymbolBroadcastEvent):
+    """Обновление цены символа для всех его подписчиков"""
+    price: Decimal
+    event_type: ClassVar[EventType] = EventType.PRICE_UPDATE
+
+    def to_user_event(self, user_id: int) -> PriceUpdateEvent:
+        return PriceUpdateEvent(user_id, self.symbol, self.price, ts_ns=self.ts_ns)
+
+
+@dataclass(slots=True)
+class SymbolCandleBroadcastEvent(SymbolBroadcastEvent):
+    """Закрытие свечи символа для всех его подписчиков"""
+    interval: str
+    candle_data: Dict[str, Decimal]
+    event_type: ClassVar[EventType] = EventType.NEW_CANDLE
+
+    def to_user_event(self, user_id: int) -> NewCandleEvent:
+        return NewCandleEvent(user_id, self.symbol, self.interval, self.candle_data, ts_ns=self.ts_ns)
+
+
+@dataclass(slots=True)
+class OrderUpdateEvent(CompactEvent):
     """Событие об обновлении статуса ордера"""
+    user_id: int
     order_data: Dict[str, Any]
-    event_type: EventType = field(default=EventType.ORDER_UPDATE, init=False)
+    ts_ns: int = field(default_factory=time.monotonic_ns, kw_only=True)
+    event_type: ClassVar[EventType] = EventType.ORDER_UPDATE
 
 
 @dataclass
@@ -184,6 +251,83 @@ class DrawdownWarningEvent(BaseEvent):
 
 # Типизация для обработчиков
 Handler = Callable[[Any], Awaitable[None]]
+BatchHandler = Callable[[List[Any]], Awaitable[None]]
+
+
+class EventBatcher:
+    """
+    Адаптер пакетной доставки: копит события и вызывает обработчик списком.
+    Пакет отдается, когда набрано max_batch событий (сразу, в воркере шины)
+    или когда с первого события пакета прошло max_wait_ms (по таймеру).
+    Пакеты одного батчера доставляются строго по очереди.
+    """
+
+    def __init__(self, handler: BatchHandler, max_batch: int, max_wait_ms: float):
+        self.handler = handler
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        # Имя для логов и метрик EventBus
+        self.__name__ = getattr(handler, '__name__', type(handler).__name__)
+        self.__qualname__ = getattr(handler, '__qualname__', self.__name__)
+        self._buffer: List[Any] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+        # Доставки по таймеру: ждем их в flush() и отменяем в close()
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._closed = False
+
+    async def __call__(self, event: Any):
+        if self._closed:
+            return
+        self._buffer.append(event)
+        if len(self._buffer) >= self.max_batch:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        if self._buffer:
+            task = asyncio.create_task(self._flush_safely())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_safely(self):
+        try:
+            await self._deliver()
+        except Exception as e:
+            log_error(0, f"Ошибка в пакетном обработчике {self.__name__}: {e}", "EventBus")
+
+    async def flush(self):
+        """Отдает накопленный пакет обработчику после уже запущенных доставок по таймеру"""
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self._deliver()
+
+    async def _deliver(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            await self.handler(batch)
+
+    def close(self):
+        """Отключает батчер: накопленные события отбрасываются, новые не принимаются"""
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for task in self._flush_tasks:
+            task.cancel()
+        self._buffer = []
+
+
+def _unwrap_handler(route_handler: Handler) -> Handler:
+    """Исходный обработчик подписки (батчер разворачивается в обработчик пакетов)"""
+    return route_handler.handler if isinstance(route_handler, EventBatcher) else route_handler
 
 
 @dataclass
@@ -192,22 +336,219 @@ class Subscription:
     handler: Handler
     event_type: EventType
     user_id: Optional[int] = None
+    symbol: Optional[str] = None  # Подписка на broadcast-события символа
+    batcher: Optional[EventBatcher] = None  # Пакетная доставка: в таблице маршрутов лежит батчер
+
+    @property
+    def route_handler(self) -> Handler:
+        """Объект, который хранится в таблице маршрутизации"""
+        return self.batcher or self.handler
+
+
+RouteKey = Tuple[EventType, Optional[int]]
+SymbolRouteKey = Tuple[EventType, str, int]
+
+# Рыночные данные идут в low-лейн, всё остальное (ордера, позиции, системные события) - в high
+MARKET_DATA_EVENT_TYPES = frozenset({EventType.PRICE_UPDATE, EventType.NEW_CANDLE})
+
+# Политики переполнения по умолчанию. Тики цены публикуются из цикла чтения вебсокета,
+# поэтому публикация тика никогда не ждет места в очереди: следующий тик заменит потерянный.
+# Закрытая свеча не повторяется и запускает анализ стратегии - NEW_CANDLE, как и остальные типы, BLOCK.
+DEFAULT_OVERFLOW_POLICIES: Dict[EventType, OverflowPolicy] = {
+    EventType.PRICE_UPDATE: OverflowPolicy.DROP_OLDEST,
+}
+
+# Как часто (в отброшенных событиях одного типа) повторять предупреждение о переполнении
+DROP_LOG_EVERY = 1000
+# Предел кэша разбиения broadcast-событий по партициям (ключ - тип, символ и набор получателей)
+BROADCAST_SPLIT_CACHE_SIZE = 1024
+
+# Ключ conflation-слота: (event_type, user_id, symbol)
+ConflationKey = Tuple[EventType, Optional[int], Optional[str]]
+
+
+class LaneQueue(asyncio.Queue):
+    """asyncio.Queue с доступом к голове очереди без извлечения"""
+
+    def peek(self) -> Any:
+        return self._queue[0]
+
+
+class EventLane:
+    """Очередь одного класса приоритета внутри партиции"""
+
+    def __init__(self, name: str, max_queue_size: int):
+        self.name = name
+        # Элементы очереди: (время постановки по time.monotonic(), событие, ключ conflation-слота).
+        # Для схлопываемых тиков в очереди лежит только ключ, само событие - в pending_ticks партиции.
+        self.queue: LaneQueue = LaneQueue(maxsize=max_queue_size)
+
+        # Метрики
+        self.processed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def record_lag(self, lag: float):
+        """Учитывает задержку между постановкой события в очередь и началом его обработки"""
+        self.processed += 1
+        self.last_lag = lag
+        self.total_lag += lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Глубина очереди и лаг лейна (в миллисекундах)"""
+        return {
+            "depth": self.queue.qsize(),
+            "processed": self.processed,
+            "lag_ms_last": round(self.last_lag * 1000, 3),
+            "lag_ms_max": round(self.max_lag * 1000, 3),
+            "lag_ms_avg": round(self.total_lag / self.processed * 1000, 3) if self.processed else 0.0,
+        }
+
+
+class EventPartition:
+    """
+    Партиция EventBus: собственные очереди и воркер.
+    Внутри партиции два лейна приоритета:
+    - high: приватные/аккаунтные и системные события (ордера, позиции, сессии);
+    - low: рыночные данные (тики, свечи).
+    Внутри лейна порядок строгий (FIFO), разные партиции работают параллельно.
+    """
+
+    def __init__(self, index: int, max_queue_size: int):
+        self.index = index
+        self.high = EventLane("high", max_queue_size)
+        self.low = EventLane("low", max_queue_size)
+        self.task: Optional[asyncio.Task] = None
+        # Сигнал воркеру о появлении событий в любом из лейнов
+        self.has_items = asyncio.Event()
+        # Сколько high-событий подряд обработано при ожидающих low (защита от голодания)
+        self.high_streak = 0
+
+        # Conflation-слоты: (event_type, user_id, symbol) -> самое свежее еще не доставленное событие
+        self.pending_ticks: Dict[ConflationKey, Any] = {}
+        self.conflated = 0
+
+    @property
+    def lanes(self) -> Tuple[EventLane, EventLane]:
+        return self.high, self.low
+
+    def is_empty(self) -> bool:
+        return self.high.queue.empty() and self.low.queue.empty()
+
+    def next_lane(self, starvation_limit: int) -> Optional[EventLane]:
+        """
+        Выбирает лейн для следующего события: high всегда впереди low,
+        но после starvation_limit high-событий подряд low получает один слот.
+        """
+        high_pending = not self.high.queue.empty()
+        low_pending = not self.low.queue.empty()
+        if high_pending and (not low_pending or self.high_streak < starvation_limit):
+            self.high_streak = self.high_streak + 1 if low_pending else 0
+            return self.high
+        if low_pending:
+            self.high_streak = 0
+            return self.low
+        return None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Глубина очередей и лаг партиции по лейнам (в миллисекундах)"""
+        lanes = {lane.name: lane.get_metrics() for lane in self.lanes}
+        processed = sum(lane.processed for lane in self.lanes)
+        total_lag = sum(lane.total_lag for lane in self.lanes)
+        return {
+            "index": self.index,
+            "depth": sum(lane["depth"] for lane in lanes.values()),
+            "processed": processed,
+            "lag_ms_max": max(lane["lag_ms_max"] for lane in lanes.values()),
+            "lag_ms_avg": round(total_lag / processed * 1000, 3) if processed else 0.0,
+            "lanes": lanes,
+            "pending_ticks": len(self.pending_ticks),
+            "conflated": self.conflated,
+        }
 
 
-# Замените ваш старый класс EventBus на этот
 class EventBus:
     """
     Улучшенная, унифицированная шина событий.
     - Единый список подписчиков.
     - Поддержка как глобальных, так и пользовательских подписок через один метод.
     - Гарантированная и логичная доставка событий.
+    - Индексированная таблица маршрутизации: (event_type, user_id) -> кортеж обработчиков.
+      Глобальные подписки хранятся в корзине (event_type, None) и дополнительно вливаются
+      в корзины пользователей: корзина пользователя - готовый список обработчиков в порядке
+      подписки, как при переборе единого списка подписок.
+      Доставка стоит O(число подходящих обработчиков), а не O(всех подписок).
+    - Партиционирование: события распределяются по N воркерам по ключу user_id
+      (или user_id:symbol), чтобы медленный обработчик одного пользователя
+      не задерживал события остальных. partitions=1 - прежний режим с одним воркером.
+    - Broadcast-события символа (SymbolBroadcastEvent): одна постановка в очередь на символ
+      и партицию получателей, раздача подпискам на символ через индекс (event_type, symbol, партиция)
+      и адаптер для per-user подписок. Каждый получатель видит broadcast в своей партиции -
+      в одном порядке со своими per-user событиями.
+    - Conflation-лейн для тиков цены (опционально): пока тик по (user_id, symbol) ждет
+      в очереди, новый тик заменяет его на месте. Остальные события - строгий FIFO.
+    - Лейны приоритета (опционально): ордера и позиции обгоняют рыночные данные,
+      low-лейн защищен от голодания (starvation_limit).
+    - Политики переполнения по типу события (OverflowPolicy): block, drop_oldest,
+      drop_newest, conflate. Отброшенные события считаются по типу и по пользователю.
+    - Тапы: синхронные наблюдатели всех опубликованных событий (журнал событий и т.п.).
+    - Инструментирование: гистограммы лага очереди (по типу события) и времени выполнения
+      обработчиков (по handler.__qualname__ и типу события), лог медленных обработчиков.
     """
 
-    def __init__(self, max_queue_size: int = 10000):
-        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+    def __init__(self, max_queue_size: int = 10000, partitions: int = 1, partition_by_symbol: bool = False,
+                 conflate_price_updates: bool = False, priority_lanes: bool = False,
+                 starvation_limit: int = 32,
+                 overflow_policies: Optional[Dict[EventType, OverflowPolicy]] = None,
+                 slow_handler_ms: float = 100.0):
+        """
+        Args:
+            max_queue_size: Размер очереди КАЖДОЙ партиции
+            partitions: Количество партиций (воркеров)
+            partition_by_symbol: Ключ партиции user_id:symbol вместо user_id.
+                Порядок гарантируется в рамках пары (user_id, symbol); события без symbol
+                распределяются по user_id.
+            conflate_price_updates: Схлопывать ожидающие PriceUpdateEvent по (user_id, symbol).
+                Обработчик получает только самую свежую цену, позиция в очереди
+                остается за первым тиком. Сокращение для overflow_policies={PRICE_UPDATE: CONFLATE}.
+            priority_lanes: Разделять события на high (приватные/аккаунтные) и low (рыночные данные).
+                Выключено - все события идут одним FIFO, как раньше.
+            starvation_limit: Сколько high-событий подряд может быть обработано, пока low ждет.
+            overflow_policies: Политики переполнения по типам событий поверх DEFAULT_OVERFLOW_POLICIES.
+                Типы без политики - BLOCK.
+            slow_handler_ms: Порог, выше которого вызов обработчика логируется как медленный.
+        """
+        self._partitions: List[EventPartition] = [
+            EventPartition(index, max_queue_size) for index in range(max(1, partitions))
+        ]
+        self._partition_by_symbol = partition_by_symbol
+        self._overflow_policies: Dict[EventType, OverflowPolicy] = dict(DEFAULT_OVERFLOW_POLICIES)
+        if conflate_price_updates:
+            self._overflow_policies[EventType.PRICE_UPDATE] = OverflowPolicy.CONFLATE
+        self._overflow_policies.update(overflow_policies or {})
+        # Учет отброшенных событий
+        self._dropped_by_type: Dict[str, int] = {}
+        self._dropped_by_user: Dict[int, int] = {}
+        # Инструментирование
+        self._slow_handler_seconds = slow_handler_ms / 1000
+        self._queue_lag: Dict[EventType, LatencyHistogram] = {}
+        self._handler_latency: Dict[Tuple[str, EventType], LatencyHistogram] = {}
+        self._slow_handler_calls: Dict[Tuple[str, EventType], int] = {}
+        # Тапы публикации
+        self._taps: Tuple[Callable[[Any], None], ...] = ()
+        self._priority_lanes = priority_lanes
+        self._starvation_limit = max(1, starvation_limit)
         self._subscriptions: List[Subscription] = []
+        # Таблица маршрутизации. Copy-on-write: subscribe/unsubscribe подменяют
+        # и словарь, и кортежи целиком, поэтому процессор читает консистентный снимок без блокировки.
+        self._routes: Dict[RouteKey, Tuple[Handler, ...]] = {}
+        self._symbol_routes: Dict[SymbolRouteKey, Tuple[Handler, ...]] = {}
+        # Разбиение broadcast-событий на срезы по партициям; сбрасывается при изменении подписок
+        self._broadcast_splits: Dict[Tuple[EventType, str, FrozenSet[int]], Tuple[Tuple[int, FrozenSet[int]], ...]] = {}
         self._running = False
-        self._processor_task: Optional[asyncio.Task] = None
         self._lock = asyncio.Lock()
 
     @property
@@ -215,91 +556,444 @@ class EventBus:
         """Public property to check if EventBus is running"""
         return self._running
 
+    @property
+    def subscription_count(self) -> int:
+        """Общее количество активных подписок"""
+        return len(self._subscriptions)
+
+    @property
+    def partition_count(self) -> int:
+        """Количество партиций (воркеров)"""
+        return len(self._partitions)
+
     async def start(self):
         if self._running: return
         self._running = True
-        self._processor_task = asyncio.create_task(self._process_events())
+        for partition in self._partitions:
+            partition.task = asyncio.create_task(self._process_events(partition))
 
     async def stop(self):
         if not self._running: return
         self._running = False
-        if self._processor_task:
-            if not self._queue.empty():
-                await self._queue.join()
-            self._processor_task.cancel()
+        for partition in self._partitions:
+            if not partition.task:
+                continue
+            # join, а не проверка empty(): последнее событие может еще обрабатываться
+            for lane in partition.lanes:
+                await lane.queue.join()
+            partition.task.cancel()
             try:
-                await self._processor_task
+                await partition.task
             except asyncio.CancelledError:
                 pass
+            partition.task = None
+
+        # Доотдаем накопленные пакеты, чтобы остановка не теряла уже доставленные в шину события
+        for sub in self._subscriptions:
+            if sub.batcher:
+                try:
+                    await sub.batcher.flush()
+                except Exception as e:
+                    log_error(0, f"Ошибка в пакетном обработчике {sub.batcher.__name__}: {e}", "EventBus")
+
+    def _partition_index(self, user_id: Optional[int], symbol: Optional[str] = None) -> int:
+        """Индекс партиции по ключу user_id или user_id:symbol"""
+        count = len(self._partitions)
+        if count == 1:
+            return 0
+        user_id = user_id or 0
+        if self._partition_by_symbol and symbol:
+            return hash((user_id, symbol)) % count
+        return hash(user_id) % count
+
+    def _partition_for(self, event: Any) -> EventPartition:
+        """Выбирает партицию для per-user события"""
+        return self._partitions[self._partition_index(getattr(event, 'user_id', None), getattr(event, 'symbol', None))]
+
+    def _split_broadcast(self, event: SymbolBroadcastEvent) -> List[Tuple[int, SymbolBroadcastEvent]]:
+        """
+        Делит broadcast на срезы по партициям получателей: срез несет только user_ids своей партиции.
+        Партиции с подписками на символ получают срез, даже если получателей в них нет.
+        """
+        event_type, symbol = event.event_type, event.symbol
+        cache_key = (event_type, symbol, event.user_ids)
+        split = self._broadcast_splits.get(cache_key)
+        if split is None:
+            groups: Dict[int, set] = {}
+            for user_id in event.user_ids:
+                groups.setdefault(self._partition_index(user_id, symbol), set()).add(user_id)
+            for index in range(len(self._partitions)):
+                if index not in groups and (event_type, symbol, index) in self._symbol_routes:
+                    groups[index] = set()
+            split = tuple((index, frozenset(user_ids)) for index, user_ids in groups.items())
+            if len(self._broadcast_splits) >= BROADCAST_SPLIT_CACHE_SIZE:
+                self._broadcast_splits.clear()
+            self._broadcast_splits[cache_key] = split
+        if len(split) == 1 and split[0][1] == event.user_ids:
+            return [(split[0][0], event)]
+        return [(index, replace(event, user_ids=user_ids)) for index, user_ids in split]
+
+    def add_tap(self, tap: Callable[[Any], None]):
+        """
+        Добавляет тап: синхронный вызов для каждого опубликованного события до постановки в очередь.
+        Тап не должен блокировать - он выполняется в контексте публикующего (например, цикла вебсокета).
+        """
+        if tap not in self._taps:
+            self._taps = self._taps + (tap,)
+
+    def remove_tap(self, tap: Callable[[Any], None]):
+        self._taps = tuple(t for t in self._taps if t != tap)
+
+    def get_overflow_policy(self, event_type: Optional[EventType]) -> OverflowPolicy:
+        """Политика переполнения для типа события"""
+        return self._overflow_policies.get(event_type, OverflowPolicy.BLOCK)
 
     async def publish(self, event: Any):
+        """
+        Ставит событие в очередь его партиции.
+        Ожидание свободного места возможно только для типов с политикой BLOCK,
+        для остальных публикация завершается без await на очереди.
+        """
         if not self._running:
             # Более мягкое логирование - не каждое событие в остановленную шину является ошибкой
             log_debug(0, f"Попытка публикации в остановленную EventBus: {type(event).__name__}", "EventBus")
             return
-        try:
-            await self._queue.put(event)
-        except asyncio.QueueFull:
-            user_id_attr = getattr(event, 'user_id', 0)
-            log_error(user_id_attr, f"EventBus переполнен, событие {type(event).__name__} отброшено", "EventBus")
-
-    async def subscribe(self, event_type: EventType, handler: Handler, user_id: Optional[int] = None):
-        """Единый метод подписки. Укажите user_id для пользовательской подписки."""
+        for tap in self._taps:
+            try:
+                tap(event)
+            except Exception as e:
+                log_error(0, f"Ошибка в тапе EventBus {getattr(tap, '__qualname__', tap)}: {e}", "EventBus")
+        if isinstance(event, SymbolBroadcastEvent) and len(self._partitions) > 1:
+            for index, part in self._split_broadcast(event):
+                await self._enqueue(self._partitions[index], part)
+            return
+        await self._enqueue(self._partition_for(event), event)
+
+    async def _enqueue(self, partition: EventPartition, event: Any):
+        """Постановка события в лейн партиции по политике переполнения его типа"""
+        event_type = getattr(event, 'event_type', None)
+        lane = partition.low if self._priority_lanes and event_type in MARKET_DATA_EVENT_TYPES else partition.high
+        policy = self.get_overflow_policy(event_type)
+
+        if policy is OverflowPolicy.CONFLATE:
+            conflation_key = (event_type, getattr(event, 'user_id', None), getattr(event, 'symbol', None))
+            pending = partition.pending_ticks
+            if conflation_key in pending:
+                # Событие еще ждет доставки - заменяем его на более свежее, не занимая место в очереди
+                pending[conflation_key] = event
+                partition.conflated += 1
+                return
+            if not self._offer(partition, lane, (time.monotonic(), None, conflation_key), event, evict_oldest=True):
+                return
+            pending[conflation_key] = event
+        elif policy is OverflowPolicy.BLOCK:
+            await lane.queue.put((time.monotonic(), event, None))
+        elif not self._offer(partition, lane, (time.monotonic(), event, None), event,
+                             evict_oldest=policy is OverflowPolicy.DROP_OLDEST):
+            return
+        partition.has_items.set()
+
+    def _offer(self, partition: EventPartition, lane: EventLane, item: Tuple, event: Any,
+               evict_oldest: bool) -> bool:
+        """
+        Неблокирующая постановка в лейн. При переполнении вытесняет голову лейна (drop_oldest)
+        или отбрасывает новое событие (drop_newest). Голова с политикой BLOCK не вытесняется -
+        тогда отбрасывается новое событие. Возвращает True, если событие поставлено.
+        """
+        queue = lane.queue
+        if queue.full():
+            if not evict_oldest or not self._evict_head(partition, lane):
+                self._record_drop(event)
+                return False
+        queue.put_nowait(item)
+        return True
+
+    def _evict_head(self, partition: EventPartition, lane: EventLane) -> bool:
+        """Удаляет самое старое событие лейна, если его политика это допускает"""
+        queue = lane.queue
+        _, head_event, head_key = queue.peek()
+        if head_key is not None:
+            head_event = partition.pending_ticks.get(head_key)
+        if head_event is not None and \
+                self.get_overflow_policy(getattr(head_event, 'event_type', None)) is OverflowPolicy.BLOCK:
+            return False
+
+        queue.get_nowait()
+        queue.task_done()
+        if head_key is not None:
+            partition.pending_ticks.pop(head_key, None)
+        if head_event is not None:
+            self._record_drop(head_event)
+        return True
+
+    def _record_drop(self, event: Any):
+        """Учитывает отброшенное событие по типу и по пользователям-получателям"""
+        event_type = getattr(event, 'event_type', None)
+        type_key = event_type.value if event_type else type(event).__name__
+        dropped = self._dropped_by_type.get(type_key, 0) + 1
+        self._dropped_by_type[type_key] = dropped
+
+        if isinstance(event, SymbolBroadcastEvent):
+            user_ids = event.user_ids
+        else:
+            user_ids = (getattr(event, 'user_id', 0) or 0,)
+        for user_id in user_ids:
+            self._dropped_by_user[user_id] = self._dropped_by_user.get(user_id, 0) + 1
+
+        if dropped == 1 or dropped % DROP_LOG_EVERY == 0:
+            log_warning(0, f"EventBus переполнен: отброшено {dropped} событий {type_key} "
+                           f"(политика {self.get_overflow_policy(event_type).value})", "EventBus")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Метрики шины: подписки, состояние партиций и отброшенные события"""
+        partitions = [partition.get_metrics() for partition in self._partitions]
+        return {
+            "running": self._running,
+            "subscriptions": len(self._subscriptions),
+            "partitions": partitions,
+            "total_depth": sum(p["depth"] for p in partitions),
+            "conflated_ticks": sum(p["conflated"] for p in partitions),
+            "dropped_total": sum(self._dropped_by_type.values()),
+            "dropped_by_type": dict(self._dropped_by_type),
+            "dropped_by_user": dict(self._dropped_by_user),
+            "queue_lag": {
+                event_type.value: histogram.to_dict() for event_type, histogram in self._queue_lag.items()
+            },
+            "handlers": self.get_handler_metrics(),
+        }
+
+    def get_handler_metrics(self) -> List[Dict[str, Any]]:
+        """Время выполнения обработчиков, отсортированное по суммарному времени (самые дорогие первыми)"""
+        handlers = []
+        for (qualname, event_type), histogram in self._handler_latency.items():
+            handlers.append({
+                "handler": qualname,
+                "event_type": event_type.value,
+                "total_ms": round(histogram.total, 3),
+                "slow_calls": self._slow_handler_calls.get((qualname, event_type), 0),
+                **histogram.to_dict(),
+            })
+        handlers.sort(key=lambda item: item["total_ms"], reverse=True)
+        return handlers
+
+    def export_prometheus(self) -> str:
+        """Метрики шины в текстовом формате Prometheus"""
+        lines = [
+            "# TYPE event_bus_queue_depth gauge",
+            *(f'event_bus_queue_depth{{partition="{p.index}",lane="{lane.name}"}} {lane.queue.qsize()}'
+              for p in self._partitions for lane in p.lanes),
+            "# TYPE event_bus_dropped_total counter",
+            *(f'event_bus_dropped_total{{event_type="{event_type}"}} {count}'
+              for event_type, count in self._dropped_by_type.items()),
+            "# TYPE event_bus_queue_lag_seconds histogram",
+        ]
+        for event_type, histogram in self._queue_lag.items():
+            lines.extend(histogram.to_prometheus("event_bus_queue_lag_seconds", {"event_type": event_type.value}))
+        lines.append("# TYPE event_bus_handler_seconds histogram")
+        for (qualname, event_type), histogram in self._handler_latency.items():
+            lines.extend(histogram.to_prometheus(
+                "event_bus_handler_seconds", {"handler": qualname, "event_type": event_type.value}
+            ))
+        return "\n".join(lines) + "\n"
+
+    async def subscribe(self, event_type: EventType, handler: Handler, user_id: Optional[int] = None,
+                        symbol: Optional[str] = None, max_batch: Optional[int] = None,
+                        max_wait_ms: float = 50.0):
+        """
+        Единый метод подписки. Укажите user_id для пользовательской подписки.
+        Укажите symbol, чтобы получать broadcast-события символа (SymbolBroadcastEvent)
+        одним вызовом на событие, без разворачивания по пользователям. Такая подписка обслуживается
+        в партиции своего user_id (без user_id - в партиции пользователя 0), поэтому обработчику
+        стратегии нужно передавать и user_id.
+        Укажите max_batch, чтобы обработчик получал список событий (пакетная доставка):
+        пакет отдается при max_batch событиях или через max_wait_ms после первого события пакета.
+        """
         async with self._lock:
             # Предотвращаем дублирование подписок
             for sub in self._subscriptions:
-                if sub.handler == handler and sub.event_type == event_type and sub.user_id == user_id:
+                if sub.handler == handler and sub.event_type == event_type and sub.user_id == user_id \
+                        and sub.symbol == symbol:
                     return
-            sub = Subscription(handler=handler, event_type=event_type, user_id=user_id)
+            batcher = EventBatcher(handler, max_batch, max_wait_ms) if max_batch else None
+            sub = Subscription(handler=handler, event_type=event_type, user_id=user_id, symbol=symbol,
+                               batcher=batcher)
             self._subscriptions.append(sub)
-            log_info(user_id or 0,
-                     f"Новая подписка: {handler.__name__} на {event_type.value} (User: {user_id or 'Global'})",
-                     "EventBus")
+
+            route_handler = sub.route_handler
+            if symbol is not None:
+                routes = dict(self._symbol_routes)
+                key = (event_type, symbol, self._partition_index(user_id, symbol))
+                routes[key] = routes.get(key, ()) + (route_handler,)
+                self._symbol_routes = routes
+                self._broadcast_splits = {}
+            else:
+                # Новая подписка - последняя по порядку, поэтому дописывается в конец корзин
+                routes = dict(self._routes)
+                if user_id is None:
+                    # Глобальная: во все корзины типа, включая пользовательские
+                    for key, bucket in routes.items():
+                        if key[0] == event_type:
+                            routes[key] = bucket + (route_handler,)
+                    routes.setdefault((event_type, None), (route_handler,))
+                else:
+                    # Первая подписка пользователя: корзина начинается с глобальных обработчиков
+                    bucket = routes.get((event_type, user_id))
+                    if bucket is None:
+                        bucket = routes.get((event_type, None), ())
+                    routes[(event_type, user_id)] = bucket + (route_handler,)
+                self._routes = routes
+
+            scope = f"Symbol: {symbol}" if symbol is not None else f"User: {user_id or 'Global'}"
+            mode = f", пакеты до {max_batch}" if batcher else ""
+            log_info(user_id or 0, f"Новая подписка: {handler.__name__} на {event_type.value} ({scope}{mode})", "EventBus")
 
     async def unsubscribe(self, handler: Handler):
-        """Отписка по обработчику. Удаляет ВСЕ подписки, связанные с этим обработчиком."""
+        """
+        Отписка по обработчику. Удаляет ВСЕ подписки, связанные с этим обработчиком.
+        Накопленные, но еще не отданные пакеты отбрасываются.
+        """
         async with self._lock:
-            initial_count = len(self._subscriptions)
+            removed = [sub for sub in self._subscriptions if sub.handler == handler]
+            if not removed:
+                return
             self._subscriptions = [sub for sub in self._subscriptions if sub.handler != handler]
-            removed_count = initial_count - len(self._subscriptions)
-            if removed_count > 0:
-                log_info(0, f"Удалено {removed_count} подписок для обработчика {handler.__name__}", "EventBus")
 
-    async def _process_events(self):
-        while self._running:
-            try:
-                event = await self._queue.get()
-
-                event_type = getattr(event, 'event_type', None)
-                if not event_type:
-                    self._queue.task_done()
-                    continue
-
-                event_user_id = getattr(event, 'user_id', None)
-
-                # Блокировка не нужна, т.к. мы копируем список. Это безопасно.
-                current_subs = self._subscriptions[:]
+            # Пересобираем только затронутые корзины
+            routes = dict(self._routes)
+            symbol_routes = dict(self._symbol_routes)
+            for sub in removed:
+                if sub.symbol is not None:
+                    table, keys = symbol_routes, [(sub.event_type, sub.symbol,
+                                                   self._partition_index(sub.user_id, sub.symbol))]
+                elif sub.user_id is None:
+                    # Глобальный обработчик влит во все корзины своего типа
+                    table, keys = routes, [key for key in routes if key[0] == sub.event_type]
+                else:
+                    table, keys = routes, [(sub.event_type, sub.user_id)]
+                route_handler = sub.route_handler
+                for key in keys:
+                    bucket = tuple(h for h in table.get(key, ()) if h is not route_handler and h != route_handler)
+                    if bucket:
+                        table[key] = bucket
+                    else:
+                        table.pop(key, None)
+                if sub.batcher:
+                    sub.batcher.close()
+            # Корзины пользователей без собственных подписок (остались только глобальные) не нужны
+            user_keys = {(sub.event_type, sub.user_id) for sub in self._subscriptions
+                         if sub.symbol is None and sub.user_id is not None}
+            for key in [key for key in routes if key[1] is not None and key not in user_keys]:
+                del routes[key]
+            self._routes = routes
+            self._symbol_routes = symbol_routes
+            self._broadcast_splits = {}
+
+            log_info(0, f"Удалено {len(removed)} подписок для обработчика {handler.__name__}", "EventBus")
+
+    def _match_handlers(self, event_type: EventType, user_id: Optional[int]) -> Tuple[Handler, ...]:
+        """
+        Возвращает обработчики для события из таблицы маршрутизации в порядке подписки.
+        Глобальные подписки (user_id is None) получают все события типа,
+        пользовательские - только события своего user_id. Корзина пользователя уже содержит
+        глобальные обработчики; без нее событие получают только глобальные.
+        """
+        routes = self._routes
+        if user_id is not None:
+            handlers = routes.get((event_type, user_id))
+            if handlers is not None:
+                return handlers
+        return routes.get((event_type, None), ())
+
+    async def _dispatch(self, event: Any, partition_index: int = 0):
+        """Доставляет событие всем подходящим обработчикам"""
+        event_type = getattr(event, 'event_type', None)
+        if not event_type:
+            return
 
-                handlers_to_run = []
-                for sub in current_subs:
-                    if sub.event_type == event_type:
-                        # Если подписка глобальная (user_id is None), она получает все события этого типа.
-                        # Если подписка пользовательская, она получает событие только если user_id совпадают.
-                        if sub.user_id is None or sub.user_id == event_user_id:
-                            handlers_to_run.append(sub.handler)
+        if isinstance(event, SymbolBroadcastEvent):
+            await self._dispatch_broadcast(event_type, event, partition_index)
+            return
 
-                for handler in handlers_to_run:
-                    try:
-                        await handler(event)
-                    except Exception as e:
-                        log_error(getattr(event, 'user_id', 0), f"Ошибка в обработчике {handler.__name__}: {e}",
-                                  "EventBus")
+        for handler in self._match_handlers(event_type, getattr(event, 'user_id', None)):
+            await self._run_handler(handler, event)
+
+    async def _dispatch_broadcast(self, event_type: EventType, event: SymbolBroadcastEvent, partition_index: int):
+        """
+        Раздача среза broadcast-события символа в партиции partition_index:
+        1. Подписки на символ этой партиции получают само broadcast-событие (один вызов).
+        2. Адаптер: для каждого получателя с пользовательскими/глобальными подписками
+           создается обычное per-user событие - только если у него есть обработчики.
+        """
+        for handler in self._symbol_routes.get((event_type, event.symbol, partition_index), ()):
+            await self._run_handler(handler, event)
+
+        for user_id in event.user_ids:
+            handlers = self._match_handlers(event_type, user_id)
+            if not handlers:
+                continue
+            user_event = event.to_user_event(user_id)
+            for handler in handlers:
+                await self._run_handler(handler, user_event)
+
+    async def _run_handler(self, handler: Handler, event: Any):
+        """Вызывает обработчик, изолируя его ошибки от остальных подписчиков, и замеряет время выполнения"""
+        started = time.perf_counter()
+        try:
+            await handler(event)
+        except Exception as e:
+            log_error(getattr(event, 'user_id', 0), f"Ошибка в обработчике {handler.__name__}: {e}", "EventBus")
+        finally:
+            self._record_handler_time(handler, event, time.perf_counter() - started)
+
+    def _record_handler_time(self, handler: Handler, event: Any, elapsed: float):
+        qualname = getattr(handler, '__qualname__', type(handler).__name__)
+        key = (qualname, event.event_type)
+        histogram = self._handler_latency.get(key)
+        if histogram is None:
+            histogram = self._handler_latency[key] = LatencyHistogram()
+        histogram.observe(elapsed)
+
+        if elapsed >= self._slow_handler_seconds:
+            self._slow_handler_calls[key] = self._slow_handler_calls.get(key, 0) + 1
+            log_warning(getattr(event, 'user_id', 0),
+                        f"Медленный обработчик {qualname} на {event.event_type.value}: {elapsed * 1000:.1f} мс",
+                        "EventBus")
+
+    def _record_queue_lag(self, lane: EventLane, event: Any, lag: float):
+        lane.record_lag(lag)
+        event_type = event.event_type
+        histogram = self._queue_lag.get(event_type)
+        if histogram is None:
+            histogram = self._queue_lag[event_type] = LatencyHistogram()
+        histogram.observe(lag)
+
+    async def _process_events(self, partition: EventPartition):
+        # Воркер работает до отмены: stop() сначала дожидается опустошения очередей (join),
+        # поэтому выход по флагу _running оставил бы join висеть на недоставленных событиях.
+        while True:
+            try:
+                lane = partition.next_lane(self._starvation_limit)
+                if lane is None:
+                    partition.has_items.clear()
+                    await partition.has_items.wait()
+                    continue
 
-                self._queue.task_done()
+                enqueued_at, event, conflation_key = lane.queue.get_nowait()
+                try:
+                    if conflation_key is not None:
+                        event = partition.pending_ticks.pop(conflation_key, None)
+                        if event is None:
+                            continue
+                    if not getattr(event, 'event_type', None):
+                        continue
+                    self._record_queue_lag(lane, event, time.monotonic() - enqueued_at)
+                    await self._dispatch(event, partition.index)
+                finally:
+                    lane.queue.task_done()
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                log_error(0, f"Критическая ошибка в EventBus: {e}", "EventBus")
+                log_error(0, f"Критическая ошибка в EventBus (партиция {partition.index}): {e}", "EventBus")
                 await asyncio.sleep(1)
 
 
@@ -0,0 +1,167 @@
+# core/kline_store.py
+"""
+Инкрементальное хранилище свечей REST по (symbol, interval).
+
+Анализатор раньше на каждом цикле заново скачивал и разбирал 100-200 свечей, хотя с прошлого
+вызова появлялась максимум одна новая. Хранилище держит кольцевой буфер закрытых свечей
+на ряд и отдельно - формирующуюся (последнюю) свечу:
+- первая загрузка - полная (get_klines на емкость буфера);
+- дальше запрашивается только дельта: get_klines со start_time следующей после последней
+  закрытой свечи - приходят новые закрытые свечи и текущая формирующаяся;
+- закрытые свечи публичного WebSocket (GlobalWebSocketManager) дописываются в буфер без REST;
+- формирующаяся свеча не попадает в буфер: она заменяется при каждой дельте и сбрасывается,
+  когда ее окно закрывается; в пределах forming_ttl отдается без запроса.
+
+get_candles возвращает срез как REST get_klines: старые -> новые, формирующаяся последней.
+Свечи - словари формата get_klines (start_time, open, ...); у свечей из WebSocket нет turnover.
+Словари общие для всех читателей и не должны изменяться.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from core.logger import log_debug
+
+MINUTE_MS = 60_000
+INTERVAL_MS = {
+    "1m": MINUTE_MS, "3m": 3 * MINUTE_MS, "5m": 5 * MINUTE_MS, "15m": 15 * MINUTE_MS,
+    "30m": 30 * MINUTE_MS, "1h": 60 * MINUTE_MS, "2h": 120 * MINUTE_MS, "4h": 240 * MINUTE_MS,
+    "6h": 360 * MINUTE_MS, "12h": 720 * MINUTE_MS, "1d": 1440 * MINUTE_MS,
+}
+# Максимум свечей в одном ответе Bybit
+MAX_FETCH_LIMIT = 1000
+
+Candle = Dict[str, Any]
+
+
+class _Series:
+    __slots__ = ("closed", "forming", "synced_at", "lock")
+
+    def __init__(self, size: int):
+        self.closed: Deque[Candle] = deque(maxlen=size)
+        self.forming: Optional[Candle] = None
+        # time.monotonic() последнего запроса к бирже
+        self.synced_at = 0.0
+        self.lock = asyncio.Lock()
+
+
+class KlineStore:
+    """Кольцевые буферы свечей процесса с догрузкой дельты"""
+
+    def __init__(self, history_size: int = 300, forming_ttl: float = 2.0):
+        self.configure(history_size, forming_ttl)
+        self._series: Dict[Tuple[str, str], _Series] = {}
+
+        # Метрики
+        self.full_loads = 0
+        self.delta_fetches = 0
+        self.fresh_served = 0
+        self.ws_appended = 0
+
+    def configure(self, history_size: int, forming_ttl: float):
+        """Применяется к рядам, созданным после вызова"""
+        self.history_size = min(max(1, history_size), MAX_FETCH_LIMIT)
+        self.forming_ttl = forming_ttl
+
+    async def get_candles(self, api, symbol: str, interval: str, limit: int) -> Optional[List[Candle]]:
+        """Последние limit свечей (формирующаяся - последней); None - биржа не ответила"""
+        tf_ms = INTERVAL_MS.get(interval)
+        if tf_ms is None or limit > self.history_size:
+            # Неизвестный таймфрейм или срез больше буфера - напрямую
+            return await api.get_klines(symbol=symbol, interval=interval, limit=limit)
+
+        key = (symbol, interval)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(self.history_size)
+
+        # Один запрос к бирже на ряд: остальные вызывающие ждут и получают его результат
+        async with series.lock:
+            now_ms = int(time.time() * 1000)
+            self._expire_forming(series, tf_ms, now_ms)
+            if (series.forming is not None and len(series.closed) >= limit - 1
+                    and time.monotonic() - series.synced_at < self.forming_ttl):
+                self.fresh_served += 1
+            elif not await self._sync(api, series, symbol, interval, tf_ms, now_ms):
+                return None
+        return self._slice(series, limit)
+
+    def add_closed(self, symbol: str, interval: str, candle: Candle):
+        """Закрытая свеча WebSocket ({"timestamp", ...}); дописывается, только если продолжает буфер"""
+        series = self._series.get((symbol, interval))
+        tf_ms = INTERVAL_MS.get(interval)
+        if series is None or tf_ms is None or not series.closed:
+            return
+        start = candle["timestamp"]
+        if start != series.closed[-1]["start_time"] + tf_ms:
+            return  # Пропуск или повтор - дельту догрузит следующий запрос
+        series.closed.append({"start_time": start, "open": candle["open"], "high": candle["high"],
+                              "low": candle["low"], "close": candle["close"], "volume": candle["volume"]})
+        if series.forming is not None and series.forming["start_time"] <= start:
+            series.forming = None
+        self.ws_appended += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "series": len(self._series),
+            "full_loads": self.full_loads,
+            "delta_fetches": self.delta_fetches,
+            "fresh_served": self.fresh_served,
+            "ws_appended": self.ws_appended,
+        }
+
+    async def _sync(self, api, series: _Series, symbol: str, interval: str, tf_ms: int, now_ms: int) -> bool:
+        """Догрузка дельты, либо полная загрузка, если буфер пуст или отстал больше, чем на буфер"""
+        if series.closed:
+            next_start = series.closed[-1]["start_time"] + tf_ms
+            # Новые закрытые свечи и формирующаяся
+            missing = (now_ms - next_start) // tf_ms + 1
+            if missing <= self.history_size:
+                candles = await api.get_klines(symbol=symbol, interval=interval, limit=missing,
+                                               start_time=next_start)
+                if candles is None:
+                    return False
+                self.delta_fetches += 1
+                self._merge(series, candles, tf_ms, now_ms)
+                return True
+            series.closed.clear()
+
+        candles = await api.get_klines(symbol=symbol, interval=interval, limit=self.history_size)
+        if candles is None:
+            return False
+        self.full_loads += 1
+        self._merge(series, candles, tf_ms, now_ms)
+        log_debug(0, f"Свечи {symbol} {interval}: загружено {len(series.closed)} закрытых", module_name=__name__)
+        return True
+
+    @staticmethod
+    def _merge(series: _Series, candles: List[Candle], tf_ms: int, now_ms: int):
+        """Свечи get_klines (старые -> новые): закрытые - в буфер, незакрытая - формирующаяся"""
+        series.forming = None
+        last_start = series.closed[-1]["start_time"] if series.closed else -1
+        for candle in candles:
+            if candle["start_time"] + tf_ms > now_ms:
+                series.forming = candle
+            elif candle["start_time"] > last_start:
+                series.closed.append(candle)
+                last_start = candle["start_time"]
+        series.synced_at = time.monotonic()
+
+    @staticmethod
+    def _expire_forming(series: _Series, tf_ms: int, now_ms: int):
+        """Окно формирующейся свечи закончилось: она больше не актуальна, нужна дельта"""
+        if series.forming is not None and series.forming["start_time"] + tf_ms <= now_ms:
+            series.forming = None
+
+    @staticmethod
+    def _slice(series: _Series, limit: int) -> List[Candle]:
+        closed_needed = limit - 1 if series.forming is not None else limit
+        candles = list(series.closed)[-closed_needed:] if closed_needed > 0 else []
+        if series.forming is not None:
+            candles.append(series.forming)
+        return candles
+
+
+# Общее хранилище (настраивается BotApplication, дополняется GlobalWebSocketManager)
+kline_store = KlineStore()
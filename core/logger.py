@@ -148,5 +148,10 @@ def log_debug(user_id: int, message: str, module_name: str = "Unknown", extra_da
     trading_logger.log("DEBUG", user_id, message, module_name, extra_data)
 
 
+def is_debug_enabled() -> bool:
+    """Проверка уровня до форматирования дорогих debug-сообщений на горячем пути"""
+    return trading_logger.logger.isEnabledFor(logging.DEBUG)
+
+
 def log_critical(user_id: int, message: str, module_name: str = "Unknown", extra_data: Optional[Dict[str, Any]] = None):
     trading_logger.log("CRITICAL", user_id, message, module_name, extra_data)
\ No newline at end of file
@@ -0,0 +1,219 @@
+# core/market_state.py
+"""
+Доска рыночного состояния: последняя цена, лучшие bid/ask и статистика 24ч по символам,
+которые слушает публичный WebSocket (GlobalWebSocketManager).
+
+Запись идет из обработчиков публичного потока, чтение - синхронное, из любого компонента.
+Стакан, статистика и lastPrice тикера хранятся строками биржи и конвертируются в Decimal только при чтении:
+orderbook.1 приходит десятки раз в секунду, а читается лишь при выставлении ордера.
+Свежесть проверяется по локальному времени получения (time.monotonic); устаревшие
+данные не возвращаются, вызывающий код идет в REST.
+"""
+import time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from core.functions import to_decimal
+
+# Поля тикера Bybit, которые держит доска (дельты тикера содержат только изменившиеся поля)
+TICKER_FIELDS = (
+    "lastPrice", "markPrice", "indexPrice", "highPrice24h", "lowPrice24h",
+    "prevPrice24h", "price24hPcnt", "volume24h", "turnover24h", "fundingRate", "openInterest",
+)
+
+# Максимальный возраст данных по умолчанию, сек
+DEFAULT_MAX_AGE_SECONDS = 5.0
+
+
+class SymbolMarketState:
+    """Состояние одного символа; обновляется на месте"""
+
+    __slots__ = ("symbol", "_last_price", "_last_price_raw", "price_at", "_bid", "_bid_size", "_ask", "_ask_size", "book_at",
+                 "ticker", "ticker_at")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self._last_price: Optional[Decimal] = None
+        # lastPrice тикера строкой биржи: конвертируется при первом чтении
+        self._last_price_raw: Optional[str] = None
+        self.price_at = 0.0
+        self._bid: Optional[str] = None
+        self._bid_size: Optional[str] = None
+        self._ask: Optional[str] = None
+        self._ask_size: Optional[str] = None
+        self.book_at = 0.0
+        self.ticker: Dict[str, str] = {}
+        self.ticker_at = 0.0
+
+    @property
+    def last_price(self) -> Optional[Decimal]:
+        if self._last_price is None and self._last_price_raw:
+            self._last_price = to_decimal(self._last_price_raw)
+        return self._last_price
+
+    @property
+    def bid(self) -> Optional[Decimal]:
+        return Decimal(self._bid) if self._bid else None
+
+    @property
+    def ask(self) -> Optional[Decimal]:
+        return Decimal(self._ask) if self._ask else None
+
+    @property
+    def bid_size(self) -> Optional[Decimal]:
+        return Decimal(self._bid_size) if self._bid_size else None
+
+    @property
+    def ask_size(self) -> Optional[Decimal]:
+        return Decimal(self._ask_size) if self._ask_size else None
+
+    @property
+    def mid(self) -> Optional[Decimal]:
+        bid, ask = self.bid, self.ask
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def stat(self, name: str) -> Optional[Decimal]:
+        """Поле статистики тикера (highPrice24h, volume24h, ...) в Decimal"""
+        value = self.ticker.get(name)
+        return to_decimal(value) if value not in (None, "") else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "symbol": self.symbol,
+            "last_price": self.last_price,
+            "bid": self.bid,
+            "ask": self.ask,
+            "bid_size": self.bid_size,
+            "ask_size": self.ask_size,
+            "stats_24h": {name: self.stat(name) for name in self.ticker},
+            "price_age_sec": round(now - self.price_at, 3) if self.price_at else None,
+            "book_age_sec": round(now - self.book_at, 3) if self.book_at else None,
+            "ticker_age_sec": round(now - self.ticker_at, 3) if self.ticker_at else None,
+        }
+
+
+class MarketStateBoard:
+    """Процессная доска состояния рынка по символам"""
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._states: Dict[str, SymbolMarketState] = {}
+
+        # Метрики чтения: hit - данные свежие, miss - нужен REST
+        self.hits = 0
+        self.misses = 0
+
+    def _state(self, symbol: str) -> SymbolMarketState:
+        state = self._states.get(symbol)
+        if state is None:
+            state = self._states[symbol] = SymbolMarketState(symbol)
+        return state
+
+    # --- Запись (обработчики публичного потока) ---
+
+    def update_trade(self, symbol: str, price: Decimal):
+        state = self._state(symbol)
+        state._last_price = price
+        state._last_price_raw = None
+        state.price_at = time.monotonic()
+
+    def update_book(self, symbol: str, bids: list, asks: list):
+        """Уровень 1 стакана: [[price, size]] строками биржи; пустая сторона оставляет прежнее значение"""
+        state = self._state(symbol)
+        if bids:
+            state._bid, state._bid_size = bids[0][0], bids[0][1]
+        if asks:
+            state._ask, state._ask_size = asks[0][0], asks[0][1]
+        state.book_at = time.monotonic()
+
+    def update_ticker(self, symbol: str, ticker_data: Dict[str, Any]):
+        """Снапшот или дельта тикера: обновляются только пришедшие поля"""
+        state = self._state(symbol)
+        ticker = state.ticker
+        for name in TICKER_FIELDS:
+            value = ticker_data.get(name)
+            if value is not None:
+                ticker[name] = value
+        now = time.monotonic()
+        state.ticker_at = now
+        # lastPrice тикера - та же последняя цена сделки, полезна при редких сделках
+        last_price = ticker_data.get("lastPrice")
+        if last_price:
+            state._last_price = None
+            state._last_price_raw = last_price
+            state.price_at = now
+
+    def forget(self, symbol: str):
+        """Символ больше не слушается - данные перестают обновляться"""
+        self._states.pop(symbol, None)
+
+    def clear(self):
+        self._states.clear()
+
+    # --- Чтение ---
+
+    def get(self, symbol: str) -> Optional[SymbolMarketState]:
+        return self._states.get(symbol)
+
+    def get_price(self, symbol: str, max_age: Optional[float] = None) -> Optional[Decimal]:
+        """Последняя цена, если она не старше max_age секунд; иначе None (нужен REST)"""
+        state = self._states.get(symbol)
+        if state is not None and state.last_price and not self._is_stale(state.price_at, max_age):
+            self.hits += 1
+            return state.last_price
+        self.misses += 1
+        return None
+
+    def get_quote(self, symbol: str, max_age: Optional[float] = None) -> Optional[Dict[str, Decimal]]:
+        """Лучшие bid/ask, если стакан свежий"""
+        state = self._states.get(symbol)
+        if state is not None and state._bid and state._ask and not self._is_stale(state.book_at, max_age):
+            self.hits += 1
+            return {"bid": state.bid, "ask": state.ask, "bid_size": state.bid_size, "ask_size": state.ask_size}
+        self.misses += 1
+        return None
+
+    def get_ticker(self, symbol: str, max_age: Optional[float] = None) -> Optional[Dict[str, Decimal]]:
+        """
+        Тикер в формате BybitAPI.get_ticker() (lastPrice, bid1Price, ask1Price, volume24h,
+        turnover24h, price24hPcnt), если последняя цена свежая.
+        """
+        state = self._states.get(symbol)
+        if state is None or not state.last_price or self._is_stale(state.price_at, max_age):
+            self.misses += 1
+            return None
+        self.hits += 1
+        zero = Decimal("0")
+        return {
+            "symbol": symbol,
+            "lastPrice": state.last_price,
+            "bid1Price": state.bid or zero,
+            "ask1Price": state.ask or zero,
+            "volume24h": state.stat("volume24h") or zero,
+            "turnover24h": state.stat("turnover24h") or zero,
+            "price24hPcnt": state.stat("price24hPcnt") or zero,
+        }
+
+    def is_stale(self, symbol: str, max_age: Optional[float] = None) -> bool:
+        state = self._states.get(symbol)
+        return state is None or self._is_stale(state.price_at, max_age)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        max_age = self.max_age
+        return {
+            "symbols": len(self._states),
+            "stale_symbols": sum(1 for state in self._states.values() if now - state.price_at > max_age),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _is_stale(self, updated_at: float, max_age: Optional[float]) -> bool:
+        return time.monotonic() - updated_at > (self.max_age if max_age is None else max_age)
+
+
+# Глобальный экземпляр доски
+market_state = MarketStateBoard()
@@ -0,0 +1,126 @@
+# core/metrics.py
+"""
+Метрики производительности: гистограммы задержек.
+"""
+import time
+from bisect import bisect_left
+from typing import Dict, Any, List
+
+# Границы корзин гистограммы в миллисекундах (последняя корзина - +Inf)
+DEFAULT_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """
+    Гистограмма задержек с фиксированными корзинами.
+    observe() стоит O(log корзин), память не растет с числом наблюдений.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "total", "max")
+
+    def __init__(self, buckets_ms: tuple = DEFAULT_BUCKETS_MS):
+        self.buckets = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        """Добавляет наблюдение (в секундах)"""
+        ms = seconds * 1000
+        self.counts[bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q: float) -> float:
+        """Оценка перцентиля (верхняя граница корзины, для +Inf - максимум), мс"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Сводка для get_metrics()/get_app_status()"""
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 3),
+        }
+
+    def to_prometheus(self, name: str, labels: Dict[str, str]) -> List[str]:
+        """Строки в текстовом формате Prometheus (значения в секундах)"""
+        label_str = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+        prefix = f"{label_str}," if label_str else ""
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound / 1000:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{label_str}}} {self.total / 1000:.6f}")
+        lines.append(f"{name}_count{{{label_str}}} {self.count}")
+        return lines
+
+
+class RollingLatencyHistogram:
+    """
+    Перцентили за скользящее окно: to_dict() считает по текущему и предыдущему окну
+    (последние window_sec..2*window_sec секунд), to_prometheus() - накопительно за все время
+    (скорость и окна Prometheus считает сам).
+    """
+
+    __slots__ = ("window_sec", "buckets", "lifetime", "_current", "_previous", "_rotate_at")
+
+    def __init__(self, window_sec: float = 60.0, buckets_ms: tuple = DEFAULT_BUCKETS_MS):
+        self.window_sec = window_sec
+        self.buckets = buckets_ms
+        self.lifetime = LatencyHistogram(buckets_ms)
+        self._current = LatencyHistogram(buckets_ms)
+        self._previous = LatencyHistogram(buckets_ms)
+        self._rotate_at = time.monotonic() + window_sec
+
+    def observe(self, seconds: float):
+        now = time.monotonic()
+        if now >= self._rotate_at:
+            self._rotate(now)
+        self._current.observe(seconds)
+        self.lifetime.observe(seconds)
+
+    def window(self) -> LatencyHistogram:
+        """Гистограмма за окно (текущее + предыдущее)"""
+        now = time.monotonic()
+        if now >= self._rotate_at:
+            self._rotate(now)
+        merged = LatencyHistogram(self.buckets)
+        for part in (self._previous, self._current):
+            merged.counts = [a + b for a, b in zip(merged.counts, part.counts)]
+            merged.count += part.count
+            merged.total += part.total
+            merged.max = max(merged.max, part.max)
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.window().to_dict()
+
+    def to_prometheus(self, name: str, labels: Dict[str, str]) -> List[str]:
+        return self.lifetime.to_prometheus(name, labels)
+
+    def _rotate(self, now: float):
+        # Если наблюдений не было дольше окна, предыдущее окно тоже устарело
+        fresh = now < self._rotate_at + self.window_sec
+        self._previous = self._current if fresh else LatencyHistogram(self.buckets)
+        self._current = LatencyHistogram(self.buckets)
+        self._rotate_at = now + self.window_sec
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,57 @@
+# core/metrics_server.py
+"""
+HTTP-эндпоинт для экспорта метрик приложения.
+"""
+import json
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from aiohttp import web
+
+from core.logger import log_info, log_error
+
+
+class MetricsServer:
+    """
+    HTTP-эндпоинт метрик:
+    - GET /metrics - текстовый формат Prometheus;
+    - GET /status - JSON статуса приложения.
+    """
+
+    def __init__(self, host: str, port: int,
+                 prometheus_provider: Callable[[], str],
+                 status_provider: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None):
+        self.host = host
+        self.port = port
+        self._prometheus_provider = prometheus_provider
+        self._status_provider = status_provider
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        if self._runner:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        if self._status_provider:
+            app.router.add_get("/status", self._handle_status)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        log_info(0, f"Эндпоинт метрик запущен: http://{self.host}:{self.port}/metrics", "MetricsServer")
+
+    async def stop(self):
+        if not self._runner:
+            return
+        await self._runner.cleanup()
+        self._runner = None
+
+    async def _handle_metrics(self, _request: web.Request) -> web.Response:
+        try:
+            return web.Response(text=self._prometheus_provider(), content_type="text/plain")
+        except Exception as e:
+            log_error(0, f"Ошибка формирования метрик: {e}", "MetricsServer")
+            return web.Response(status=500, text=str(e))
+
+    async def _handle_status(self, _request: web.Request) -> web.Response:
+        status = await self._status_provider()
+        return web.json_response(status, dumps=lambda data: json.dumps(data, default=str))
@@ -0,0 +1,161 @@
+# core/order_registry.py
+"""
+Реестр ордеров бота в памяти (по пользователю).
+
+Ордер регистрируется в BaseStrategy._place_order ДО REST-запроса по client_order_id
+(он же orderLinkId на бирже), затем привязывается к order_id биржи. DataFeedHandler и
+стратегии ищут ордер сначала здесь, в БД - только если в реестре его нет (ордера,
+созданные до перезапуска). БД остается источником истины: реестр не заменяет записи
+в нее, а каждое изменение статуса пишется и сюда, и в БД (write-through).
+
+Записи имеют ту же форму, что и строки db_manager.get_order_by_exchange_id().
+Завершенные ордера (FILLED/CANCELLED/REJECTED) удаляются через TERMINAL_TTL_SECONDS,
+незавершенные - через MAX_AGE_SECONDS после регистрации (потерянные события статуса):
+дальше такой ордер ищется в БД. Очистка идет при регистрации и обновлении статуса,
+не чаще раза в PURGE_INTERVAL_SECONDS.
+"""
+import time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+# Статус ордера, зарегистрированного до ответа биржи (как в БД)
+PENDING_ORDER_ID = "PENDING"
+TERMINAL_STATUSES = frozenset({"FILLED", "CANCELLED", "REJECTED"})
+# Сколько держать завершенные ордера (повторные/задержанные события WebSocket)
+TERMINAL_TTL_SECONDS = 600.0
+# Сколько держать незавершенный ордер (терминальное событие могло потеряться при переподключении)
+MAX_AGE_SECONDS = 24 * 3600.0
+# Минимальный интервал между проходами очистки
+PURGE_INTERVAL_SECONDS = 60.0
+
+
+class OrderRegistry:
+    """Ордера бота одного пользователя, ключи - order_id биржи и client_order_id"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._by_client: Dict[str, Dict[str, Any]] = {}
+        self._by_exchange: Dict[str, Dict[str, Any]] = {}
+        # client_order_id -> время перехода в терминальный статус
+        self._terminal_at: Dict[str, float] = {}
+        # client_order_id -> время регистрации (в порядке регистрации)
+        self._registered_at: Dict[str, float] = {}
+        self._next_purge_at = 0.0
+
+        # Метрики
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, client_order_id: str, symbol: str, side: str, order_type: str, quantity: Decimal,
+                 price: Decimal, strategy_type: str, order_purpose: str, bot_priority: int = 1,
+                 metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Регистрирует ордер перед отправкой на биржу"""
+        self._purge()
+        order = {
+            "id": None,
+            "user_id": self.user_id,
+            "symbol": symbol,
+            "side": side,
+            "order_type": order_type,
+            "quantity": quantity,
+            "price": price,
+            "filled_quantity": Decimal("0"),
+            "average_price": None,
+            "status": "PENDING",
+            "order_id": PENDING_ORDER_ID,
+            "client_order_id": client_order_id,
+            "strategy_type": strategy_type,
+            "bot_priority": bot_priority,
+            "order_purpose": order_purpose,
+            "metadata": metadata or {},
+            "commission": Decimal("0"),
+        }
+        self._by_client[client_order_id] = order
+        self._registered_at.pop(client_order_id, None)
+        self._registered_at[client_order_id] = time.monotonic()
+        return order
+
+    def bind(self, client_order_id: str, order_id: str) -> Optional[Dict[str, Any]]:
+        """Привязывает order_id биржи к зарегистрированному ордеру"""
+        order = self._by_client.get(client_order_id)
+        if order is None:
+            return None
+        order["order_id"] = order_id
+        self._by_exchange[order_id] = order
+        return order
+
+    def mark_persisted(self, order_id: str, db_id: Optional[int]):
+        order = self._by_exchange.get(order_id)
+        if order is not None:
+            order["id"] = db_id
+
+    def discard(self, client_order_id: str):
+        """Ордер не был создан на бирже"""
+        order = self._by_client.pop(client_order_id, None)
+        if order is not None:
+            self._by_exchange.pop(order["order_id"], None)
+        self._terminal_at.pop(client_order_id, None)
+        self._registered_at.pop(client_order_id, None)
+
+    def get(self, order_id: Optional[str] = None, client_order_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Ордер по order_id биржи или orderLinkId. Событие WebSocket может прийти раньше
+        ответа REST - тогда ордер находится по orderLinkId и сразу привязывается к order_id.
+        """
+        order = self._by_exchange.get(order_id) if order_id else None
+        if order is None and client_order_id:
+            order = self._by_client.get(client_order_id)
+            if order is not None and order_id and order["order_id"] == PENDING_ORDER_ID:
+                self.bind(client_order_id, order_id)
+        if order is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return order
+
+    def update_status(self, order_id: str, status: str, filled_quantity: Optional[Decimal] = None,
+                      average_price: Optional[Decimal] = None, commission: Optional[Decimal] = None):
+        """Обновление статуса (вызывается вместе с записью в БД)"""
+        order = self._by_exchange.get(order_id)
+        if order is None:
+            return
+        order["status"] = status
+        if filled_quantity is not None:
+            order["filled_quantity"] = filled_quantity
+        if average_price is not None:
+            order["average_price"] = average_price
+        if commission is not None:
+            order["commission"] = commission
+        if status in TERMINAL_STATUSES:
+            self._terminal_at.setdefault(order["client_order_id"], time.monotonic())
+        self._purge()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"orders": len(self._by_client), "hits": self.hits, "misses": self.misses}
+
+    def _purge(self):
+        now = time.monotonic()
+        if now < self._next_purge_at:
+            return
+        self._next_purge_at = now + PURGE_INTERVAL_SECONDS
+        deadline = now - TERMINAL_TTL_SECONDS
+        expired = [cid for cid, closed_at in self._terminal_at.items() if closed_at < deadline]
+        # Незавершенные: _registered_at упорядочен по времени регистрации
+        deadline = now - MAX_AGE_SECONDS
+        for client_order_id, registered_at in self._registered_at.items():
+            if registered_at >= deadline:
+                break
+            expired.append(client_order_id)
+        for client_order_id in expired:
+            self.discard(client_order_id)
+
+
+# Реестры по пользователям (общие для всех стратегий и DataFeedHandler пользователя)
+_registries: Dict[int, OrderRegistry] = {}
+
+
+def get_order_registry(user_id: int) -> OrderRegistry:
+    registry = _registries.get(user_id)
+    if registry is None:
+        registry = _registries[user_id] = OrderRegistry(user_id)
+    return registry
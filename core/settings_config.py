@@ -12,7 +12,7 @@ from decimal import Decimal
 from pathlib import Path
 
 from core.logger import log_info, log_error
-from core.enums import ExchangeType
+from core.enums import ExchangeType, EventType, OverflowPolicy
 
 # --- КОНСТАНТЫ, КОТОРЫЕ ИСПОЛЬЗУЮТСЯ ИЛИ БУДУТ ИСПОЛЬЗОВАТЬСЯ ---
 
@@ -82,6 +82,95 @@ class TelegramConfig:
     allowed_updates: List[str] = field(default_factory=lambda: ["message", "callback_query"])
     max_connections: int = 40
 
+@dataclass
+class EventBusConfig:
+    """Конфигурация шины событий"""
+    max_queue_size: int = 10000
+    partitions: int = 1  # 1 = один воркер (прежний режим)
+    partition_by_symbol: bool = False  # Ключ партиции user_id:symbol вместо user_id
+    conflate_price_updates: bool = False  # Схлопывать ожидающие тики цены по (user_id, symbol)
+    priority_lanes: bool = False  # Ордера/позиции обгоняют рыночные данные (False = единая очередь, прежний режим)
+    starvation_limit: int = 32  # Максимум high-событий подряд, пока рыночные данные ждут
+    # Политики переполнения по типам событий поверх значений по умолчанию EventBus
+    overflow_policies: Dict[EventType, OverflowPolicy] = field(default_factory=dict)
+    slow_handler_ms: float = 100.0  # Порог лога медленных обработчиков
+    journal_dir: str = ""  # Каталог журнала событий (пусто = журнал выключен)
+
+@dataclass
+class WebSocketConfig:
+    """Конфигурация публичных WebSocket соединений"""
+    public_max_connections: int = 4  # Максимум параллельных публичных соединений (шардов)
+    public_topics_per_connection: int = 150  # Лимит топиков на одно соединение
+    subscribe_batch_size: int = 10  # Топиков в args одного кадра subscribe/unsubscribe
+    warmup_timeout: float = 10.0  # Ожидание подтверждений подписки новым соединением, сек
+    market_state_max_age: float = 5.0  # Данные доски рынка старше этого возраста (сек) считаются устаревшими
+    # Таймфреймы агрегатора свечей (1m/5m приходят от биржи, остальные собираются из 1m)
+    candle_timeframes: List[str] = field(default_factory=lambda: ["1m", "3m", "5m", "15m", "1h"])
+    candle_history_size: int = 200  # Размер кольцевого буфера истории на (символ, таймфрейм)
+    ping_interval: float = 20.0  # Интервал прикладного ping публичных соединений, сек
+    stale_timeout: float = 60.0  # Нет ни одного кадра (включая pong) дольше - переподключение, сек
+    max_lag_ms: float = 5000.0  # Отставание потока от биржи выше - замена соединения (0 - отключено)
+    latency_window: float = 60.0  # Окно скользящих перцентилей задержек, сек
+    public_url: str = ""  # Переопределение адреса публичного потока (пусто - Bybit)
+    private_url: str = ""  # Переопределение адреса приватного потока (пусто - Bybit по режиму demo)
+    capture_dir: str = ""  # Каталог записи сырых кадров WebSocket (пусто - запись выключена)
+
+@dataclass
+class PrivateWebSocketConfig:
+    """Конфигурация супервизора приватных WebSocket соединений"""
+    connect_rate: float = 5.0  # Подключений в секунду на процесс
+    auth_rate: float = 5.0  # Аутентификаций в секунду на процесс
+    burst: int = 5  # Допустимый всплеск подключений/аутентификаций
+    sync_concurrency: int = 4  # Параллельных синхронизаций ордеров после переподключения
+    ping_interval: float = 20.0  # Интервал прикладного ping, сек
+    rtt_budget_ms: float = 1000.0  # RTT выше бюджета снижает оценку соединения
+    degraded_score: int = 50  # Соединения с оценкой ниже пересоздаются
+    check_interval: float = 10.0  # Период проверки здоровья, сек
+
+@dataclass
+class HttpConfig:
+    """Конфигурация общего HTTP-транспорта REST API"""
+    pool_limit: int = 100  # Максимум соединений пула на базовый URL
+    pool_limit_per_host: int = 0  # Ограничение на хост (0 - без ограничения сверх pool_limit)
+    keepalive_timeout: float = 30.0  # Сколько держать простаивающее keep-alive соединение, сек
+    dns_cache_ttl: int = 300  # Время жизни кэша DNS, сек
+    connect_timeout: float = 20.0
+    total_timeout: float = 60.0
+
+@dataclass
+class RateLimitConfig:
+    """Конфигурация ограничителя частоты REST запросов"""
+    ip_rate: float = 100.0  # Запросов в секунду с IP процесса (лимит Bybit - 600 за 5 секунд)
+    ip_burst: int = 100  # Емкость IP bucket
+    read_reserve: float = 0.2  # Доля IP bucket, недоступная чтениям (только ордера)
+
+@dataclass
+class InstrumentsConfig:
+    """Конфигурация общего каталога инструментов"""
+    ttl: float = 300.0  # Возраст каталога, после которого он обновляется в фоне, сек
+    snapshot_path: str = ""  # Файл снимка для теплого старта (пусто - только Redis)
+    redis_snapshot: bool = True  # Хранить снимок в Redis
+
+@dataclass
+class PublicRequestsConfig:
+    """Конфигурация объединения публичных REST запросов"""
+    klines_ttl: float = 2.0  # Сколько отдавать готовый результат get_klines повторно, сек
+    ticker_ttl: float = 1.0  # То же для get_ticker
+    max_entries: int = 2048  # Максимум запомненных результатов
+
+@dataclass
+class KlineStoreConfig:
+    """Конфигурация хранилища свечей REST"""
+    history_size: int = 300  # Емкость кольцевого буфера ряда (symbol, interval), свечей
+    forming_ttl: float = 2.0  # Сколько отдавать формирующуюся свечу без запроса к бирже, сек
+
+@dataclass
+class MetricsConfig:
+    """Конфигурация HTTP-эндпоинта метрик"""
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9108
+
 @dataclass
 class SystemConfig:
     """Главная, корневая конфигурация системы"""
@@ -89,6 +178,15 @@ class SystemConfig:
     redis: RedisConfig
     telegram: TelegramConfig
     exchanges: Dict[str, ExchangeConfig] = field(default_factory=dict)
+    event_bus: EventBusConfig = field(default_factory=EventBusConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    websocket: WebSocketConfig = field(default_factory=WebSocketConfig)
+    private_websocket: PrivateWebSocketConfig = field(default_factory=PrivateWebSocketConfig)
+    http: HttpConfig = field(default_factory=HttpConfig)
+    rate_limit: RateLimitConfig = field(default_factory=RateLimitConfig)
+    instruments: InstrumentsConfig = field(default_factory=InstrumentsConfig)
+    public_requests: PublicRequestsConfig = field(default_factory=PublicRequestsConfig)
+    kline_store: KlineStoreConfig = field(default_factory=KlineStoreConfig)
     environment: str = "production"
     encryption_key: str = "" # Ключ для шифрования API ключей в БД
 
@@ -131,6 +229,15 @@ class ConfigLoader:
                 database=db_config,
                 redis=redis_config,
                 telegram=telegram_config,
+                event_bus=self._load_event_bus_config(),
+                metrics=self._load_metrics_config(),
+                websocket=self._load_websocket_config(),
+                private_websocket=self._load_private_websocket_config(),
+                http=self._load_http_config(),
+                rate_limit=self._load_rate_limit_config(),
+                instruments=self._load_instruments_config(),
+                public_requests=self._load_public_requests_config(),
+                kline_store=self._load_kline_store_config(),
                 environment=self.env.str("ENVIRONMENT", "production"),
                 encryption_key=self.env.str("ENCRYPTION_KEY", "default-encryption-key-change-in-production")
             )
@@ -171,6 +278,103 @@ class ConfigLoader:
             channel_id=channel_id
         )
 
+    def _load_event_bus_config(self) -> EventBusConfig:
+        return EventBusConfig(
+            max_queue_size=self.env.int("EVENT_BUS_QUEUE_SIZE", 10000),
+            partitions=self.env.int("EVENT_BUS_PARTITIONS", 1),
+            partition_by_symbol=self.env.bool("EVENT_BUS_PARTITION_BY_SYMBOL", False),
+            conflate_price_updates=self.env.bool("EVENT_BUS_CONFLATE_PRICE_UPDATES", False),
+            priority_lanes=self.env.bool("EVENT_BUS_PRIORITY_LANES", False),
+            starvation_limit=self.env.int("EVENT_BUS_STARVATION_LIMIT", 32),
+            overflow_policies=self._load_overflow_policies(),
+            slow_handler_ms=self.env.float("EVENT_BUS_SLOW_HANDLER_MS", 100.0),
+            journal_dir=self.env.str("EVENT_JOURNAL_DIR", "")
+        )
+
+    def _load_websocket_config(self) -> WebSocketConfig:
+        return WebSocketConfig(
+            public_max_connections=self.env.int("PUBLIC_WS_MAX_CONNECTIONS", 4),
+            public_topics_per_connection=self.env.int("PUBLIC_WS_TOPICS_PER_CONNECTION", 150),
+            subscribe_batch_size=self.env.int("PUBLIC_WS_SUBSCRIBE_BATCH_SIZE", 10),
+            warmup_timeout=self.env.float("PUBLIC_WS_WARMUP_TIMEOUT", 10.0),
+            market_state_max_age=self.env.float("MARKET_STATE_MAX_AGE", 5.0),
+            candle_timeframes=self.env.list("CANDLE_TIMEFRAMES", ["1m", "3m", "5m", "15m", "1h"]),
+            candle_history_size=self.env.int("CANDLE_HISTORY_SIZE", 200),
+            ping_interval=self.env.float("PUBLIC_WS_PING_INTERVAL", 20.0),
+            stale_timeout=self.env.float("PUBLIC_WS_STALE_TIMEOUT", 60.0),
+            max_lag_ms=self.env.float("PUBLIC_WS_MAX_LAG_MS", 5000.0),
+            latency_window=self.env.float("WS_LATENCY_WINDOW", 60.0),
+            public_url=self.env.str("PUBLIC_WS_URL", ""),
+            private_url=self.env.str("PRIVATE_WS_URL", ""),
+            capture_dir=self.env.str("WS_CAPTURE_DIR", "")
+        )
+
+    def _load_private_websocket_config(self) -> PrivateWebSocketConfig:
+        return PrivateWebSocketConfig(
+            connect_rate=self.env.float("PRIVATE_WS_CONNECT_RATE", 5.0),
+            auth_rate=self.env.float("PRIVATE_WS_AUTH_RATE", 5.0),
+            burst=self.env.int("PRIVATE_WS_BURST", 5),
+            sync_concurrency=self.env.int("PRIVATE_WS_SYNC_CONCURRENCY", 4),
+            ping_interval=self.env.float("PRIVATE_WS_PING_INTERVAL", 20.0),
+            rtt_budget_ms=self.env.float("PRIVATE_WS_RTT_BUDGET_MS", 1000.0),
+            degraded_score=self.env.int("PRIVATE_WS_DEGRADED_SCORE", 50),
+            check_interval=self.env.float("PRIVATE_WS_CHECK_INTERVAL", 10.0)
+        )
+
+    def _load_http_config(self) -> HttpConfig:
+        return HttpConfig(
+            pool_limit=self.env.int("HTTP_POOL_LIMIT", 100),
+            pool_limit_per_host=self.env.int("HTTP_POOL_LIMIT_PER_HOST", 0),
+            keepalive_timeout=self.env.float("HTTP_KEEPALIVE_TIMEOUT", 30.0),
+            dns_cache_ttl=self.env.int("HTTP_DNS_CACHE_TTL", 300),
+            connect_timeout=self.env.float("HTTP_CONNECT_TIMEOUT", 20.0),
+            total_timeout=self.env.float("HTTP_TOTAL_TIMEOUT", 60.0)
+        )
+
+    def _load_rate_limit_config(self) -> RateLimitConfig:
+        return RateLimitConfig(
+            ip_rate=self.env.float("RATE_LIMIT_IP_RATE", 100.0),
+            ip_burst=self.env.int("RATE_LIMIT_IP_BURST", 100),
+            read_reserve=self.env.float("RATE_LIMIT_READ_RESERVE", 0.2)
+        )
+
+    def _load_instruments_config(self) -> InstrumentsConfig:
+        return InstrumentsConfig(
+            ttl=self.env.float("INSTRUMENTS_TTL", 300.0),
+            snapshot_path=self.env.str("INSTRUMENTS_SNAPSHOT_PATH", ""),
+            redis_snapshot=self.env.bool("INSTRUMENTS_REDIS_SNAPSHOT", True)
+        )
+
+    def _load_public_requests_config(self) -> PublicRequestsConfig:
+        return PublicRequestsConfig(
+            klines_ttl=self.env.float("PUBLIC_CACHE_KLINES_TTL", 2.0),
+            ticker_ttl=self.env.float("PUBLIC_CACHE_TICKER_TTL", 1.0),
+            max_entries=self.env.int("PUBLIC_CACHE_MAX_ENTRIES", 2048)
+        )
+
+    def _load_kline_store_config(self) -> KlineStoreConfig:
+        return KlineStoreConfig(
+            history_size=self.env.int("KLINE_STORE_SIZE", 300),
+            forming_ttl=self.env.float("KLINE_STORE_FORMING_TTL", 2.0)
+        )
+
+    def _load_metrics_config(self) -> MetricsConfig:
+        return MetricsConfig(
+            enabled=self.env.bool("METRICS_ENABLED", False),
+            host=self.env.str("METRICS_HOST", "127.0.0.1"),
+            port=self.env.int("METRICS_PORT", 9108)
+        )
+
+    def _load_overflow_policies(self) -> Dict[EventType, OverflowPolicy]:
+        """EVENT_BUS_OVERFLOW_POLICIES=price_update=conflate,order_update=block"""
+        policies = {}
+        for event_name, policy_name in self.env.dict("EVENT_BUS_OVERFLOW_POLICIES", {}).items():
+            try:
+                policies[EventType(event_name.strip())] = OverflowPolicy(policy_name.strip())
+            except ValueError:
+                log_error(0, f"Неизвестная политика переполнения: {event_name}={policy_name}", 'system_config')
+        return policies
+
     def _load_exchange_configs(self, config: SystemConfig):
         # Bybit (Multi-Account Support)
         if self.env.str("BYBIT_API_KEY", None):
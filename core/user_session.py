@@ -813,7 +813,8 @@ class UserSession:
                 EventType.USER_SETTINGS_CHANGED,
                 EventType.STRATEGY_RESTART_REQUESTED,
                 EventType.ORDER_FILLED,
-                EventType.PRICE_UPDATE,
+                # PRICE_UPDATE не нужен: тики получают напрямую только стратегии с открытой
+                # позицией (BaseStrategy.subscribe_price_ticks)
                 EventType.POSITION_UPDATE,
                 EventType.ORDER_UPDATE,
             ]
@@ -1544,7 +1545,7 @@ class UserSession:
                     log_info(self.user_id, f"🛡️ Восстановлен стоп-лосс: {order_id}", module_name=__name__)
 
             # ШАГ 5: Подписываемся на события цен для мониторинга
-            await strategy.event_bus.subscribe(EventType.PRICE_UPDATE, strategy.handle_price_update, user_id=strategy.user_id)
+            await strategy.subscribe_price_ticks()
 
             # ШАГ 6: Сохраняем состояние для будущего восстановления
             await strategy.save_strategy_state({
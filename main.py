@@ -22,6 +22,7 @@ from core.default_configs import DefaultConfigs
 from core.enums import ConfigType
 from aiogram.exceptions import TelegramRetryAfter
 from core.events import EventBus
+from core.event_journal import EventJournal
 # --- 3. Настройка точности ---
 getcontext().prec = 28
 
@@ -155,13 +156,27 @@ async def main():
     """Главная функция запуска бота"""
     log_info(0, "=== ЗАПУСК FUTURES TRADING BOT v2.2 ===", module_name="main")
     bot_app = None
+    event_journal = None
     try:
         # --- ПОСЛЕДОВАТЕЛЬНАЯ ИНИЦИАЛИЗАЦИЯ ---
         # Каждый шаг может выбросить исключение, которое будет поймано ниже
         await db_manager.initialize()
         await redis_manager.init_redis()
 
-        event_bus = EventBus()
+        event_bus = EventBus(
+            max_queue_size=system_config.event_bus.max_queue_size,
+            partitions=system_config.event_bus.partitions,
+            partition_by_symbol=system_config.event_bus.partition_by_symbol,
+            conflate_price_updates=system_config.event_bus.conflate_price_updates,
+            priority_lanes=system_config.event_bus.priority_lanes,
+            starvation_limit=system_config.event_bus.starvation_limit,
+            overflow_policies=system_config.event_bus.overflow_policies,
+            slow_handler_ms=system_config.event_bus.slow_handler_ms
+        )
+        if system_config.event_bus.journal_dir:
+            event_journal = EventJournal(system_config.event_bus.journal_dir)
+            await event_journal.start()
+            event_journal.attach(event_bus)
         await event_bus.start()
 
         await bot_manager.initialize(event_bus=event_bus)
@@ -201,6 +216,12 @@ async def main():
         except Exception as e:
             log_error(0, f"Ошибка остановки bot_app: {e}", module_name="main")
 
+        try:
+            if event_journal:
+                await event_journal.close()
+        except Exception as e:
+            log_error(0, f"Ошибка закрытия журнала событий: {e}", module_name="main")
+
         try:
             if redis_manager.is_connected:
                 await redis_manager.close()
@@ -21,6 +21,7 @@ from api.bybit_api import BybitAPI
 from aiogram.utils.markdown import hbold, hcode
 from core.settings_config import EXCHANGE_FEES
 from database.db_trades import db_manager
+from core.order_registry import get_order_registry
 
 
 # Настройка точности для Decimal
@@ -110,6 +111,8 @@ class BaseStrategy(ABC):
         # КРИТИЧНО: Последняя известная цена из WebSocket для точного расчета PnL
         # Обновляется дочерними стратегиями в handle_price_update()
         self._last_known_price: Optional[Decimal] = None
+        # Подписка на тики цены есть только пока открыта позиция (subscribe_price_ticks)
+        self.price_ticks_subscribed: bool = False
 
         # Система отложенной остановки
         self.deferred_stop_marked: bool = False
@@ -412,8 +415,8 @@ class BaseStrategy(ABC):
             if symbol != self.symbol:
                 return
 
-            # Проверяем, что это наш ордер (есть в active_orders или в БД)
-            if order_id not in self.active_orders:
+            # Проверяем, что это наш ордер (есть в active_orders, реестре ордеров или в БД)
+            if order_id not in self.active_orders and not get_order_registry(self.user_id).get(order_id):
                 # Проверяем в БД
                 from database.db_trades import db_manager
                 db_order = await db_manager.get_order_by_exchange_id(order_id, self.user_id)
@@ -566,6 +569,7 @@ class BaseStrategy(ABC):
         try:
             async with self.lock:
                 self.is_running = False
+                await self.unsubscribe_price_ticks()
                 
                 # Отмена всех активных ордеров
                 await self._cancel_all_orders()
@@ -688,7 +692,8 @@ class BaseStrategy(ABC):
                 )
             },
             "active_orders_count": len(self.active_orders),
-            "active_positions_count": len(self.active_positions)
+            "active_positions_count": len(self.active_positions),
+            "price_ticks_subscribed": self.price_ticks_subscribed
         }
 
     async def _load_strategy_config(self):
@@ -738,6 +743,22 @@ class BaseStrategy(ABC):
         await self._load_strategy_config()
 
             
+    async def subscribe_price_ticks(self):
+        """
+        Подписка на тики цены символа - вызывается при открытии (восстановлении) позиции.
+        Подписка на символ: обработчик получает broadcast-событие символа одним вызовом,
+        без разворачивания по пользователям, а стратегии без позиции тики не получают вовсе.
+        Подписка на свечи постоянная и от позиции не зависит.
+        """
+        await self.event_bus.subscribe(EventType.PRICE_UPDATE, self.handle_price_update, user_id=self.user_id,
+                                      symbol=self.symbol)
+        self.price_ticks_subscribed = True
+
+    async def unsubscribe_price_ticks(self):
+        """Отписка от тиков цены - при закрытии позиции и остановке стратегии"""
+        await self.event_bus.unsubscribe(self.handle_price_update)
+        self.price_ticks_subscribed = False
+
     async def _handle_price_update_wrapper(self, event: PriceUpdateEvent):
         """Обертка для обработки обновления цены"""
         # Фильтрация событий только для нашего пользователя и символа
@@ -1070,10 +1091,11 @@ class BaseStrategy(ABC):
             import time
             import random
 
-            # Генерируем уникальный client_order_id для отслеживания
+            # Генерируем уникальный client_order_id для отслеживания (он же orderLinkId на бирже).
+            # Bybit ограничивает orderLinkId 36 символами: уникальная часть идет первой, символ обрезается
             timestamp_ms = int(time.time() * 1000)
             random_suffix = random.randint(1000, 9999)
-            client_order_id = f"bot{self.account_priority}_{self.symbol}_{timestamp_ms}_{random_suffix}"
+            client_order_id = f"bot{self.account_priority}_{timestamp_ms}_{random_suffix}_{self.symbol}"[:36]
 
             # Определяем order_purpose
             if reduce_only:
@@ -1102,15 +1124,41 @@ class BaseStrategy(ABC):
             elif order_purpose == 'CLOSE' and not self.data_feed:
                 log_warning(self.user_id, f"⚠️ data_feed не инициализирован! Невозможно зарегистрировать CLOSE операцию для {self.symbol}", module_name=__name__)
 
+            metadata = {
+                "stop_loss": str(stop_loss) if stop_loss else None,
+                "take_profit": str(take_profit) if take_profit else None,
+                "reduce_only": reduce_only,
+                "created_by": "base_strategy_place_order"
+            }
+
+            # ШАГ 0.5: Регистрируем ордер В ПАМЯТИ до запроса - событие WebSocket может прийти
+            # раньше ответа REST, DataFeedHandler найдет ордер по orderLinkId без запроса к БД
+            order_registry = get_order_registry(self.user_id)
+            order_registry.register(
+                client_order_id=client_order_id,
+                symbol=self.symbol,
+                side=side,
+                order_type=order_type,
+                quantity=qty,
+                price=price or Decimal('0'),
+                strategy_type=self.strategy_type.value,
+                order_purpose=order_purpose,
+                bot_priority=getattr(self, 'account_priority', 1),
+                metadata=metadata
+            )
+
             # ШАГ 1: СОЗДАЕМ ОРДЕР ЧЕРЕЗ API - получаем order_id сразу
             order_id = await self.api.place_order(
                 symbol=self.symbol, side=side, order_type=order_type, qty=qty, price=price,
-                stop_loss=stop_loss, take_profit=take_profit, reduce_only=reduce_only
+                stop_loss=stop_loss, take_profit=take_profit, reduce_only=reduce_only,
+                order_link_id=client_order_id
             )
 
             if not order_id:
+                order_registry.discard(client_order_id)
                 log_error(self.user_id, f"Не удалось разместить ордер для {self.symbol} (API не вернул ID).", module_name=__name__)
                 return None
+            registered_order = order_registry.bind(client_order_id, order_id)
 
             # ШАГ 2: СОХРАНЯЕМ В БД ОДИН РАЗ с правильным order_id от биржи
             try:
@@ -1128,14 +1176,26 @@ class BaseStrategy(ABC):
                     trade_id=trade_id,
                     client_order_id=client_order_id,
                     bot_priority=getattr(self, 'account_priority', 1),
-                    metadata={
-                        "stop_loss": str(stop_loss) if stop_loss else None,
-                        "take_profit": str(take_profit) if take_profit else None,
-                        "reduce_only": reduce_only,
-                        "created_by": "base_strategy_place_order"
-                    }
+                    metadata=metadata
                 )
+                order_registry.mark_persisted(order_id, db_id)
                 log_info(self.user_id, f"✅ Ордер сохранён в БД: order_id={order_id} (DB_ID={db_id})", module_name=__name__)
+
+                # Событие WebSocket пришло раньше сохранения - его запись в БД не нашла строки, повторяем
+                if registered_order and registered_order["status"] == "FILLED":
+                    await db_manager.update_order_on_fill(
+                        order_id=order_id,
+                        filled_quantity=registered_order["filled_quantity"],
+                        average_price=registered_order["average_price"] or Decimal('0'),
+                        commission=registered_order["commission"]
+                    )
+                elif registered_order and registered_order["status"] in ("CANCELLED", "REJECTED"):
+                    await db_manager.update_order_status(
+                        order_id=order_id,
+                        status=registered_order["status"],
+                        filled_quantity=registered_order["filled_quantity"],
+                        average_price=registered_order["average_price"]
+                    )
             except Exception as db_error:
                 log_error(self.user_id, f"❌ Ошибка сохранения ордера {order_id} в БД: {db_error}", module_name=__name__)
                 # Ордер уже создан на бирже, продолжаем работу даже если БД упала
@@ -1175,6 +1235,8 @@ class BaseStrategy(ABC):
             result = await self.api.cancel_order(self.symbol, order_id)
             
             if result:
+                get_order_registry(self.user_id).update_status(order_id, "CANCELLED")
+
                 # КРИТИЧЕСКИ ВАЖНО: Обновляем статус ордера в БД
                 try:
                     from database.db_trades import db_manager
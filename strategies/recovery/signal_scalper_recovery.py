@@ -11,6 +11,7 @@ from decimal import Decimal
 from strategies.recovery.base_recovery_handler import BaseRecoveryHandler
 from core.logger import log_info, log_error, log_warning, log_debug
 from core.events import EventType
+from core.market_state import market_state
 
 if TYPE_CHECKING:
     from strategies.signal_scalper_strategy import SignalScalperStrategy
@@ -203,11 +204,7 @@ class SignalScalperRecoveryHandler(BaseRecoveryHandler):
         """Восстанавливает подписки на события цен и свечей."""
         try:
             # КРИТИЧНО: Восстанавливаем подписку на PRICE_UPDATE (мониторинг позиции)
-            await self.event_bus.subscribe(
-                EventType.PRICE_UPDATE,
-                self.strategy.handle_price_update,
-                user_id=self.user_id
-            )
+            await self.strategy.subscribe_price_ticks()
             log_info(
                 self.user_id,
                 f"✅ Восстановлена подписка на PRICE_UPDATE для {self.symbol} (метод: {self.strategy.handle_price_update.__name__}, is_running={self.strategy.is_running})",
@@ -557,8 +554,11 @@ class SignalScalperRecoveryHandler(BaseRecoveryHandler):
         return None
 
     async def _get_current_market_price(self) -> Optional[Decimal]:
-        """Получает текущую рыночную цену символа."""
+        """Получает текущую рыночную цену символа (доска рынка, при устаревании - REST)."""
         try:
+            price = market_state.get_price(self.symbol)
+            if price is not None:
+                return price
             ticker = await self.api.get_ticker(self.symbol)
             if ticker and 'lastPrice' in ticker:
                 return Decimal(str(ticker['lastPrice']))
@@ -677,7 +677,7 @@ class SignalScalperRecoveryHandler(BaseRecoveryHandler):
             self.strategy.stop_loss_price = None
 
             # Отписываемся от событий цены
-            await self.event_bus.unsubscribe(self.strategy.handle_price_update)
+            await self.strategy.unsubscribe_price_ticks()
             # Отписываемся от событий свечей и ручного закрытия
             await self.event_bus.unsubscribe(self.strategy.handle_new_candle)
             await self.event_bus.unsubscribe(self.strategy.handle_manual_close)
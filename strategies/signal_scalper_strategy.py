@@ -13,6 +13,7 @@ from core.events import EventBus, NewCandleEvent, PriceUpdateEvent, OrderFilledE
 from analysis.signal_analyzer import SignalAnalyzer
 from analysis.spike_detector import SpikeDetector
 from core.concurrency_manager import strategy_locked
+from core.order_registry import get_order_registry
 
 getcontext().prec = 28
 
@@ -177,7 +178,7 @@ class SignalScalperStrategy(BaseStrategy):
                                 self.position_size = pos_size
                                 self.active_direction = direction
 
-                                await self.event_bus.subscribe(EventType.PRICE_UPDATE, self.handle_price_update, user_id=self.user_id)
+                                await self.subscribe_price_ticks()
 
                                 from database.db_trades import db_manager, TradeRecord
                                 from datetime import timezone as tz
@@ -396,7 +397,7 @@ class SignalScalperStrategy(BaseStrategy):
 
                 self._reset_position_state_after_close(final_pnl)
 
-                await self.event_bus.unsubscribe(self.handle_price_update)
+                await self.unsubscribe_price_ticks()
 
                 await self._send_trade_close_notification(
                     pnl=final_pnl,
@@ -784,10 +785,12 @@ class SignalScalperStrategy(BaseStrategy):
                          "SignalScalper")
                 return
 
-        # КРИТИЧЕСКИ ВАЖНО: Проверяем что ордер принадлежит БОТУ (есть в БД)
+        # КРИТИЧЕСКИ ВАЖНО: Проверяем что ордер принадлежит БОТУ (реестр ордеров в памяти, затем БД)
         from database.db_trades import db_manager
         try:
-            order_in_db = await db_manager.get_order_by_id(event.order_id, self.user_id)
+            order_in_db = get_order_registry(self.user_id).get(event.order_id)
+            if order_in_db is None:
+                order_in_db = await db_manager.get_order_by_id(event.order_id, self.user_id)
 
             if not order_in_db:
                 log_warning(self.user_id,
@@ -931,7 +934,7 @@ class SignalScalperStrategy(BaseStrategy):
                                     self.hold_signal_counter = 0
 
                                     # Подписываемся на события цены
-                                    await self.event_bus.subscribe(EventType.PRICE_UPDATE, self.handle_price_update, user_id=self.user_id)
+                                    await self.subscribe_price_ticks()
 
                                     # ПРАВИЛЬНЫЙ расчет начальной маржи из фактических данных позиции
                                     # Формула: margin = (entry_price * position_size) / leverage
@@ -998,7 +1001,7 @@ class SignalScalperStrategy(BaseStrategy):
             self.entry_price = real_entry_price
 
             # КРИТИЧЕСКИ ВАЖНО: Подписываемся на события цены для усреднения и трейлинга
-            await self.event_bus.subscribe(EventType.PRICE_UPDATE, self.handle_price_update, user_id=self.user_id)
+            await self.subscribe_price_ticks()
 
             # КРИТИЧНО: Создаём trade в БД СРАЗУ после исполнения OPEN ордера (НЕ в уведомлении!)
             from database.db_trades import db_manager, TradeRecord
@@ -1271,7 +1274,7 @@ class SignalScalperStrategy(BaseStrategy):
             self._reset_position_state_after_close(pnl_net)
 
             # Отписываемся от price updates
-            await self.event_bus.unsubscribe(self.handle_price_update)
+            await self.unsubscribe_price_ticks()
             # МГНОВЕННО отправляем уведомление (используем сохраненные значения)
             # ИСПОЛЬЗУЕМ final_commission вместо self.total_fees_paid для правильного отображения комиссии!
             await self._send_trade_close_notification(pnl_net, final_commission, exit_price=event.price, entry_price=saved_entry_price, entry_time=saved_entry_time)
@@ -2228,7 +2231,7 @@ class SignalScalperStrategy(BaseStrategy):
 
             # Отписываемся от обновлений цены
             try:
-                await self.event_bus.unsubscribe(self.handle_price_update)
+                await self.unsubscribe_price_ticks()
             except Exception as unsub_error:
                 log_debug(self.user_id, f"Не удалось отписаться от price_update: {unsub_error}", "SignalScalper")
 
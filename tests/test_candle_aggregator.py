@@ -0,0 +1,73 @@
+# tests/test_candle_aggregator.py
+import time
+from decimal import Decimal
+
+from websocket.candle_aggregator import CandleAggregator, MINUTE_MS
+
+# Минута N - начало текущего окна 3m: окно еще не закрыто, минута N+1 в нем же
+_NOW_MS = int(time.time() * 1000)
+MINUTE_N = _NOW_MS - _NOW_MS % (3 * MINUTE_MS)
+
+
+def _trade(ts: int, price: str, volume: str = "1") -> dict:
+    return {"T": ts, "p": price, "v": volume}
+
+
+def _candle(start: int, open_: str, high: str, low: str, close: str, volume: str = "3") -> dict:
+    return {"timestamp": start, "open": Decimal(open_), "high": Decimal(high), "low": Decimal(low),
+            "close": Decimal(close), "volume": Decimal(volume)}
+
+
+def _aggregator() -> CandleAggregator:
+    aggregator = CandleAggregator(timeframes=("1m", "3m"), native_timeframes=("1m",))
+    aggregator.track("BTCUSDT")
+    return aggregator
+
+
+def test_confirm_after_next_minute_trades_is_reconciled():
+    aggregator = _aggregator()
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + 1_000, "100"), _trade(MINUTE_N + 2_000, "105"),
+                                      _trade(MINUTE_N + 3_000, "99")])
+    # Сделки минуты N+1 приходят раньше подтверждения минуты N
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + MINUTE_MS + 500, "101")])
+
+    aggregator.add_closed("BTCUSDT", "1m", _candle(MINUTE_N, "100", "105", "99", "99"))
+
+    assert aggregator.reconciled == 1
+    assert aggregator.mismatches == 0
+    assert aggregator.unconfirmed == 0
+    # Формирующаяся минута N+1 не тронута сверкой
+    assert aggregator.get_forming("BTCUSDT", "1m")["timestamp"] == MINUTE_N + MINUTE_MS
+
+
+def test_confirm_mismatch_is_counted():
+    aggregator = _aggregator()
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + 1_000, "100")])
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + MINUTE_MS + 500, "101")])
+
+    aggregator.add_closed("BTCUSDT", "1m", _candle(MINUTE_N, "100", "102", "98", "101"))
+
+    assert aggregator.reconciled == 1
+    assert aggregator.mismatches == 1
+
+
+def test_unconfirmed_minute_expires_on_next_rollover():
+    aggregator = _aggregator()
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + 1_000, "100")])
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + MINUTE_MS + 500, "101")])
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + 2 * MINUTE_MS + 500, "102")])
+
+    assert aggregator.unconfirmed == 1
+    assert aggregator.reconciled == 0
+
+
+def test_pending_minute_is_folded_into_derived_forming():
+    aggregator = _aggregator()
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + 1_000, "100"), _trade(MINUTE_N + 2_000, "110")])
+    aggregator.add_trades("BTCUSDT", [_trade(MINUTE_N + MINUTE_MS + 500, "104")])
+
+    forming = aggregator.get_forming("BTCUSDT", "3m")
+    assert forming["timestamp"] == MINUTE_N
+    assert forming["open"] == Decimal("100")
+    assert forming["high"] == Decimal("110")
+    assert forming["close"] == Decimal("104")
@@ -0,0 +1,48 @@
+# tests/test_order_registry.py
+from decimal import Decimal
+
+from core import order_registry
+from core.order_registry import OrderRegistry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _register(registry: OrderRegistry, client_order_id: str):
+    registry.register(client_order_id, "BTCUSDT", "Buy", "Limit", Decimal("1"), Decimal("100"),
+                      "signal_scalper", "OPEN")
+    registry.bind(client_order_id, f"ex-{client_order_id}")
+
+
+def test_stale_non_terminal_order_is_evicted(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(order_registry.time, "monotonic", clock)
+    registry = OrderRegistry(1)
+    _register(registry, "stale")
+
+    clock.now += order_registry.MAX_AGE_SECONDS + 1
+    _register(registry, "fresh")
+
+    assert registry.get(client_order_id="stale") is None
+    assert registry.get(client_order_id="fresh") is not None
+
+
+def test_terminal_order_is_evicted_from_update_status(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(order_registry.time, "monotonic", clock)
+    registry = OrderRegistry(1)
+    _register(registry, "filled")
+    _register(registry, "open")
+    registry.update_status("ex-filled", "FILLED")
+
+    clock.now += order_registry.TERMINAL_TTL_SECONDS + 1
+    registry.update_status("ex-open", "PARTIALLY_FILLED")
+
+    assert registry.get(order_id="ex-filled") is None
+    assert registry.get(order_id="ex-open")["status"] == "PARTIALLY_FILLED"
+    assert registry.get_stats()["orders"] == 1
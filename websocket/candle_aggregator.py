@@ -0,0 +1,323 @@
+# websocket/candle_aggregator.py
+"""
+Потоковый агрегатор OHLCV по символам публичного WebSocket.
+
+- Текущая (формирующаяся) минутная свеча строится из publicTrade.
+- Закрытые свечи биржи (kline.1 / kline.5, в т.ч. догруженные через REST) - источник истины:
+  минутная свеча из сделок сверяется с подтвержденной kline.1 и заменяется ею. Подтверждение
+  приходит уже после смены минуты, поэтому закрытая сделками минута ждет его в pending_close;
+  не дождавшаяся до закрытия следующей минуты считается неподтвержденной и отбрасывается.
+- Производные таймфреймы (3m, 15m, 1h, ...) собираются из подтвержденных минутных свечей
+  и закрываются вместе с последней минутой окна. Неполные окна (старт посреди окна,
+  непокрытый пропуск) не публикуются.
+- История хранится кольцевыми буферами по (symbol, timeframe) в формате свечей WebSocket:
+  {"timestamp", "open", "high", "low", "close", "volume"}.
+
+Анализаторы читают историю синхронно через get_candles(); если символ не слушается
+или история неполная/устарела, возвращается пустой список и нужен REST.
+"""
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from core.logger import log_debug
+from websocket.public_decoder import to_decimal_fast
+
+MINUTE_MS = 60_000
+BASE_TIMEFRAME = "1m"
+
+# Поддерживаемые таймфреймы (кратны минуте)
+TIMEFRAME_MS = {
+    "1m": MINUTE_MS, "3m": 3 * MINUTE_MS, "5m": 5 * MINUTE_MS, "15m": 15 * MINUTE_MS,
+    "30m": 30 * MINUTE_MS, "1h": 60 * MINUTE_MS, "2h": 120 * MINUTE_MS, "4h": 240 * MINUTE_MS,
+}
+
+# Задержка закрытия свечи биржей, в пределах которой история считается актуальной
+CLOSE_GRACE_MS = 15_000
+
+Candle = Dict[str, Any]
+
+
+def _fold(target: Candle, candle: Candle):
+    """Добавляет свечу в агрегат окна"""
+    if candle["high"] > target["high"]:
+        target["high"] = candle["high"]
+    if candle["low"] < target["low"]:
+        target["low"] = candle["low"]
+    target["close"] = candle["close"]
+    target["volume"] += candle["volume"]
+
+
+class CandleAggregator:
+    """Агрегатор свечей и кольцевые буферы истории для всех слушаемых символов"""
+
+    def __init__(self, timeframes: Iterable[str] = ("1m", "3m", "5m", "15m", "1h"),
+                 native_timeframes: Iterable[str] = ("1m", "5m"), history_size: int = 200):
+        self.configure(timeframes, native_timeframes, history_size)
+
+        self._symbols: Set[str] = set()
+        self._history: Dict[Tuple[str, str], Deque[Candle]] = {}
+        # Формирующаяся минутная свеча из сделок: symbol -> свеча
+        self._forming: Dict[str, Candle] = {}
+        # Минута из сделок, закрытая сменой минуты и ждущая подтвержденную kline.1: symbol -> свеча
+        self._pending_close: Dict[str, Candle] = {}
+        # Собираемые окна производных таймфреймов: (symbol, tf) -> [свеча, число минут]
+        self._building: Dict[Tuple[str, str], list] = {}
+
+        # Метрики
+        self.trades = 0
+        self.late_trades = 0
+        self.reconciled = 0
+        self.mismatches = 0
+        self.unconfirmed = 0
+        self.derived_closed = 0
+        self.incomplete_windows = 0
+
+    def configure(self, timeframes: Iterable[str], native_timeframes: Iterable[str], history_size: int):
+        """
+        timeframes - все таймфреймы с историей; native_timeframes - приходящие от биржи готовыми
+        (закрытые kline), остальные собираются из минутных свечей.
+        """
+        unknown = [tf for tf in timeframes if tf not in TIMEFRAME_MS]
+        if unknown:
+            raise ValueError(f"Неподдерживаемые таймфреймы агрегатора: {unknown}")
+        self.timeframes = tuple(timeframes)
+        self.native_timeframes = frozenset(native_timeframes)
+        self.derived_timeframes = tuple(tf for tf in self.timeframes
+                                        if tf not in self.native_timeframes and tf != BASE_TIMEFRAME)
+        self.history_size = max(1, history_size)
+
+    # --- Жизненный цикл символа ---
+
+    def track(self, symbol: str):
+        self._symbols.add(symbol)
+
+    def forget(self, symbol: str):
+        """Символ больше не слушается: история удаляется, иначе она молча устареет"""
+        self._symbols.discard(symbol)
+        self._forming.pop(symbol, None)
+        self._pending_close.pop(symbol, None)
+        for key in [key for key in self._history if key[0] == symbol]:
+            del self._history[key]
+        for key in [key for key in self._building if key[0] == symbol]:
+            del self._building[key]
+
+    # --- Поток ---
+
+    def add_trades(self, symbol: str, trades: List[Dict[str, Any]]):
+        """Сделки publicTrade (T - время в мс, p - цена, v - объем) в формирующуюся минутную свечу"""
+        forming = self._forming.get(symbol)
+        for trade in trades:
+            trade_ts = int(trade["T"])
+            start = trade_ts - trade_ts % MINUTE_MS
+            if forming is not None and start == forming["timestamp"]:
+                price = to_decimal_fast(trade["p"])
+                if price > forming["high"]:
+                    forming["high"] = price
+                elif price < forming["low"]:
+                    forming["low"] = price
+                forming["close"] = price
+                forming["volume"] += to_decimal_fast(trade["v"])
+            elif forming is None or start > forming["timestamp"]:
+                if forming is not None:
+                    self._close_forming(symbol, forming)
+                price = to_decimal_fast(trade["p"])
+                forming = {"timestamp": start, "open": price, "high": price, "low": price, "close": price,
+                           "volume": to_decimal_fast(trade["v"])}
+                self._forming[symbol] = forming
+            else:
+                self.late_trades += 1
+        self.trades += len(trades)
+
+    def add_closed(self, symbol: str, timeframe: str, candle: Candle) -> List[Tuple[str, Candle]]:
+        """
+        Подтвержденная биржей свеча нативного таймфрейма (в порядке времени).
+        Возвращает закрывшиеся свечи производных таймфреймов [(tf, свеча)] для публикации.
+        """
+        if symbol not in self._symbols or timeframe not in TIMEFRAME_MS:
+            return []
+        self._append(symbol, timeframe, candle)
+        if timeframe != BASE_TIMEFRAME:
+            return []
+
+        self._reconcile(symbol, candle)
+        closed = []
+        for tf in self.derived_timeframes:
+            result = self._fold_minute(symbol, tf, candle)
+            if result is not None:
+                closed.append((tf, result))
+        return closed
+
+    def seed(self, symbol: str, timeframe: str, candles: List[Dict[str, Any]]):
+        """
+        Заполняет историю закрытыми свечами из REST (get_klines: start_time или timestamp).
+        Формирующаяся свеча отбрасывается; уже накопленные свечи из потока не перезаписываются.
+        """
+        if symbol not in self._symbols or timeframe not in TIMEFRAME_MS:
+            return
+        tf_ms = TIMEFRAME_MS[timeframe]
+        now_ms = int(time.time() * 1000)
+        merged = {
+            start: {"timestamp": start, "open": c["open"], "high": c["high"], "low": c["low"],
+                    "close": c["close"], "volume": c["volume"]}
+            for c in candles
+            for start in (int(c.get("timestamp", c.get("start_time", 0))),)
+            if start + tf_ms <= now_ms
+        }
+        history = self._history.get((symbol, timeframe))
+        if history:
+            merged.update((c["timestamp"], c) for c in history)
+        self._history[(symbol, timeframe)] = deque(
+            (merged[start] for start in sorted(merged)), maxlen=self.history_size
+        )
+
+    # --- Чтение ---
+
+    def get_candles(self, symbol: str, timeframe: str, limit: int, include_forming: bool = False) -> List[Candle]:
+        """
+        Последние limit свечей (старые -> новые). include_forming добавляет текущую
+        формирующуюся свечу последней, как ее отдает REST get_klines.
+        Пустой список - истории недостаточно или она устарела.
+        """
+        if symbol not in self._symbols or timeframe not in TIMEFRAME_MS:
+            return []
+        history = self._history.get((symbol, timeframe))
+        if not history:
+            return []
+        tf_ms = TIMEFRAME_MS[timeframe]
+        if int(time.time() * 1000) - (history[-1]["timestamp"] + tf_ms) > tf_ms + CLOSE_GRACE_MS:
+            return []
+
+        forming = self.get_forming(symbol, timeframe) if include_forming else None
+        closed_needed = limit - 1 if forming else limit
+        if len(history) < closed_needed:
+            return []
+        candles = list(history)[len(history) - closed_needed:] if closed_needed > 0 else []
+        if forming:
+            candles.append(forming)
+        return candles
+
+    def get_forming(self, symbol: str, timeframe: str) -> Optional[Candle]:
+        """Формирующаяся свеча таймфрейма: закрытые минуты текущего окна + минута из сделок"""
+        forming = self._forming.get(symbol)
+        if forming is None or timeframe not in TIMEFRAME_MS:
+            return None
+        tf_ms = TIMEFRAME_MS[timeframe]
+        window = forming["timestamp"] - forming["timestamp"] % tf_ms
+        if window + tf_ms <= int(time.time() * 1000):
+            return None  # Сделок в текущем окне еще не было
+        if timeframe == BASE_TIMEFRAME:
+            return dict(forming)
+
+        minutes = list(self._history.get((symbol, BASE_TIMEFRAME), ()))
+        # Закрытая минута без подтверждения биржи еще не в истории - берем ее из сделок
+        pending = self._pending_close.get(symbol)
+        if pending is not None and (not minutes or pending["timestamp"] > minutes[-1]["timestamp"]):
+            minutes.append(pending)
+        result: Optional[Candle] = None
+        for minute in minutes:
+            if window <= minute["timestamp"] < forming["timestamp"]:
+                if result is None:
+                    result = dict(minute, timestamp=window)
+                else:
+                    _fold(result, minute)
+        if result is None:
+            return dict(forming, timestamp=window)
+        _fold(result, forming)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self._symbols),
+            "timeframes": list(self.timeframes),
+            "series": len(self._history),
+            "trades": self.trades,
+            "late_trades": self.late_trades,
+            "reconciled": self.reconciled,
+            "trade_mismatches": self.mismatches,
+            "unconfirmed_minutes": self.unconfirmed,
+            "derived_closed": self.derived_closed,
+            "incomplete_windows": self.incomplete_windows,
+        }
+
+    # --- Внутреннее ---
+
+    def _append(self, symbol: str, timeframe: str, candle: Candle):
+        key = (symbol, timeframe)
+        history = self._history.get(key)
+        if history is None:
+            history = self._history[key] = deque(maxlen=self.history_size)
+        if not history or candle["timestamp"] > history[-1]["timestamp"]:
+            history.append(candle)
+
+    def _close_forming(self, symbol: str, forming: Candle):
+        """Минута из сделок закрыта сменой минуты: ждет подтверждения биржи в pending_close"""
+        pending = self._pending_close.get(symbol)
+        if pending is not None:
+            # Подтверждение предыдущей минуты не пришло за целую минуту
+            self._expire_pending(symbol, pending)
+        self._pending_close[symbol] = forming
+
+    def _expire_pending(self, symbol: str, pending: Candle):
+        self.unconfirmed += 1
+        log_debug(0, f"Свеча {symbol} 1m {pending['timestamp']} из сделок не подтверждена биржей",
+                  module_name=__name__)
+
+    def _reconcile(self, symbol: str, candle: Candle):
+        """Сверка минутной свечи из сделок с подтвержденной биржей; биржевая заменяет нашу"""
+        start = candle["timestamp"]
+        traded = None
+        pending = self._pending_close.get(symbol)
+        if pending is not None and pending["timestamp"] <= start:
+            del self._pending_close[symbol]
+            if pending["timestamp"] == start:
+                traded = pending
+            else:
+                self._expire_pending(symbol, pending)
+        forming = self._forming.get(symbol)
+        if forming is not None and forming["timestamp"] <= start:
+            # Подтверждение пришло раньше первой сделки следующей минуты
+            del self._forming[symbol]
+            if forming["timestamp"] == start:
+                traded = forming
+        if traded is None:
+            return
+        self.reconciled += 1
+        if (traded["high"], traded["low"], traded["close"]) != (candle["high"], candle["low"], candle["close"]):
+            self.mismatches += 1
+            log_debug(0, f"Свеча {symbol} 1m {start} из сделок расходится с биржевой: "
+                         f"H/L/C {traded['high']}/{traded['low']}/{traded['close']} vs "
+                         f"{candle['high']}/{candle['low']}/{candle['close']}", module_name=__name__)
+
+    def _fold_minute(self, symbol: str, timeframe: str, minute: Candle) -> Optional[Candle]:
+        """Добавляет минуту в окно производного таймфрейма; возвращает свечу, если окно закрылось"""
+        tf_ms = TIMEFRAME_MS[timeframe]
+        window = minute["timestamp"] - minute["timestamp"] % tf_ms
+        key = (symbol, timeframe)
+        building = self._building.get(key)
+
+        if building is not None and building[0]["timestamp"] != window:
+            # Окно не закрылось последней минутой (пропуск) - неполное
+            self.incomplete_windows += 1
+            building = None
+        if building is None:
+            building = self._building[key] = [dict(minute, timestamp=window), 1]
+        else:
+            _fold(building[0], minute)
+            building[1] += 1
+
+        if minute["timestamp"] + MINUTE_MS != window + tf_ms:
+            return None
+
+        del self._building[key]
+        if building[1] != tf_ms // MINUTE_MS:
+            self.incomplete_windows += 1
+            return None
+        candle = building[0]
+        self._append(symbol, timeframe, candle)
+        self.derived_closed += 1
+        return candle
+
+
+# Глобальный экземпляр (настраивается GlobalWebSocketManager, читается анализаторами)
+candle_aggregator = CandleAggregator()
@@ -0,0 +1,122 @@
+# websocket/capture.py
+"""
+Запись сырого трафика WebSocket для офлайн-воспроизведения и бенчмарков.
+
+Формат файла - gzip, по строке на кадр: "<время приема, unix сек>\t<источник>\t<кадр>".
+Источник - имя соединения: public-N (шарды GlobalWebSocketManager) или
+private-<user_id>-bot<account_priority> (DataFeedHandler). Кадры Bybit - компактный JSON без
+табуляций и переводов строк, поэтому экранирование не нужно.
+
+Запись в горячем пути - только добавление строки в буфер; сжатие и запись на диск
+идут в отдельном потоке раз в flush_interval. Включается WS_CAPTURE_DIR.
+Приватные кадры содержат ордера и позиции пользователей - файлы не публикуются.
+"""
+import asyncio
+import gzip
+import os
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from core.logger import log_info, log_error
+
+# Уровень 1: сжатие в разы быстрее потока кадров, степень сжатия JSON все равно высокая
+CAPTURE_COMPRESSLEVEL = 1
+TOPIC_PREFIX = '{"topic":"'
+
+
+class FrameCapture:
+    """Буферизованная запись кадров всех соединений процесса в один файл"""
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = ""
+        self.flush_interval = 1.0
+        self.path: Optional[str] = None
+        self._buffer: List[str] = []
+        self._file = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+        # Метрики
+        self.frames = 0
+        self.write_errors = 0
+
+    def configure(self, directory: str, flush_interval: float = 1.0):
+        """Пустой directory - запись выключена"""
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.enabled = bool(directory)
+
+    async def start(self):
+        if not self.enabled or self._task:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"ws-{datetime.now():%Y%m%d-%H%M%S}.tsv.gz")
+        self._file = gzip.open(self.path, "at", encoding="utf-8", compresslevel=CAPTURE_COMPRESSLEVEL)
+        self._stop_event = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+        log_info(0, f"Запись WebSocket трафика: {self.path}", module_name=__name__)
+
+    async def stop(self):
+        if not self._task:
+            return
+        # Без cancel(): цикл сам дописывает буфер и закрывает файл
+        self._stop_event.set()
+        await self._task
+        self._task = None
+        log_info(0, f"Запись WebSocket трафика остановлена: {self.frames} кадров в {self.path}",
+                 module_name=__name__)
+
+    def record(self, source: str, frame: str, received_at: float):
+        """Вызывается из цикла чтения соединения для каждого кадра"""
+        if self._task is None:
+            return
+        self._buffer.append(f"{received_at:.6f}\t{source}\t{frame}\n")
+        self.frames += 1
+
+    def get_stats(self):
+        return {"enabled": self.enabled, "path": self.path, "frames": self.frames,
+                "buffered": len(self._buffer), "write_errors": self.write_errors}
+
+    async def _flush_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+        await asyncio.to_thread(self._file.close)
+        self._file = None
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._file.writelines, lines)
+        except Exception as e:
+            self.write_errors += 1
+            log_error(0, f"Ошибка записи WebSocket трафика ({len(lines)} кадров потеряно): {e}",
+                      module_name=__name__)
+
+
+def read_capture(path: str, source_prefix: Optional[str] = None) -> Iterator[Tuple[float, str, str]]:
+    """Кадры записи: (время приема, источник, кадр); source_prefix - фильтр, например "public" """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            received_at, source, frame = line.rstrip("\n").split("\t", 2)
+            if source_prefix and not source.startswith(source_prefix):
+                continue
+            yield float(received_at), source, frame
+
+
+def frame_topic(frame: str) -> Optional[str]:
+    """Топик кадра без разбора JSON (кадры данных публичного потока начинаются с topic)"""
+    if frame.startswith(TOPIC_PREFIX):
+        return frame[len(TOPIC_PREFIX):frame.index('"', len(TOPIC_PREFIX))]
+    return None
+
+
+# Глобальная запись (настраивается GlobalWebSocketManager)
+frame_capture = FrameCapture()
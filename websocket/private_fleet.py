@@ -0,0 +1,320 @@
+# websocket/private_fleet.py
+"""
+Супервизор приватных WebSocket соединений (DataFeedHandler всех пользователей и аккаунтов).
+
+- Допуск: подключения и аутентификации проходят через token bucket (connect_rate / auth_rate
+  в секунду), синхронизация ордеров после переподключения - через семафор. После перезапуска
+  100+ аккаунтов поднимаются ровным потоком, а не одним залпом в Bybit и Postgres.
+- Здоровье: каждое соединение ведет ConnectionHealth (RTT ping/pong, паузы между сообщениями,
+  пропущенные pong, аутентификация, задержки биржа -> прием по creationTime и прием -> обработка). Фоновая проверка пересоздает деградировавшие соединения.
+- Метрики флота: get_fleet_health() - состояние соединений и время старта флота.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Set
+
+from core.logger import log_info, log_warning, log_error
+from core.metrics import LatencyHistogram, RollingLatencyHistogram
+
+
+class RateGate:
+    """Token bucket для допуска операций: не больше rate в секунду, всплеск до burst"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = max(rate, 0.001)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+
+    async def acquire(self):
+        # asyncio.Lock выдает доступ в порядке очереди - соединения допускаются по порядку
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+
+class ConnectionHealth:
+    """Показатели одного приватного соединения"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connected_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.authenticated = False
+        # Ожидание слота и синхронизация ордеров после подключения: поток не читается
+        self.syncing = False
+        self.last_message_at: Optional[float] = None
+        self.messages = 0
+        self.connects = 0
+        self.recycles = 0
+        self.max_gap_sec = 0.0
+        self.rtt = LatencyHistogram()
+        self.last_rtt_ms: Optional[float] = None
+        self.pings_sent = 0
+        self.pongs = 0
+        self._ping_sent_at: Dict[str, float] = {}
+        self.exchange_latency = RollingLatencyHistogram()
+        self.dispatch_latency = RollingLatencyHistogram()
+
+    def on_connected(self):
+        now = time.monotonic()
+        self.connected_at = now
+        self.last_message_at = now
+        self.ready_at = None
+        self.authenticated = False
+        self.connects += 1
+        self.pings_sent = self.pongs = 0
+        self._ping_sent_at.clear()
+
+    def on_disconnected(self):
+        self.connected_at = None
+        self.authenticated = False
+        self.syncing = False
+
+    def on_sync_started(self):
+        self.syncing = True
+
+    def on_sync_finished(self):
+        """Чтение потока возобновляется: пауза на время синхронизации не считается тишиной"""
+        self.syncing = False
+        self.last_message_at = time.monotonic()
+
+    def on_authenticated(self):
+        self.authenticated = True
+        self.ready_at = time.monotonic()
+
+    def on_message(self):
+        now = time.monotonic()
+        if self.last_message_at is not None:
+            gap = now - self.last_message_at
+            if gap > self.max_gap_sec:
+                self.max_gap_sec = gap
+        self.last_message_at = now
+        self.messages += 1
+
+    def on_exchange_time(self, creation_ms: Optional[int]):
+        """Время создания события на бирже (creationTime, мс) -> прием"""
+        if creation_ms:
+            self.exchange_latency.observe(max(time.time() * 1000 - creation_ms, 0.0) / 1000)
+
+    def on_ping_sent(self, req_id: str):
+        self._ping_sent_at[req_id] = time.monotonic()
+        self.pings_sent += 1
+
+    def on_pong(self, req_id: Optional[str]):
+        sent_at = self._ping_sent_at.pop(req_id, None) if req_id else None
+        self.pongs += 1
+        if sent_at is not None:
+            rtt = time.monotonic() - sent_at
+            self.rtt.observe(rtt)
+            self.last_rtt_ms = rtt * 1000
+
+    def score(self, now: float, ping_interval: float, rtt_budget_ms: float, auth_timeout: float) -> int:
+        """
+        Оценка 0..100: 100 - здоровое соединение. Не подключенное и синхронизирующееся соединение
+        не оценивается: пока поток не читается, ответы (auth, pong) ждут в буфере.
+        """
+        if self.connected_at is None or self.syncing:
+            return 100
+        score = 100
+        if not self.authenticated and now - self.connected_at > auth_timeout:
+            score -= 60
+        if self.pings_sent - self.pongs >= 2:
+            score -= 50  # Два ping подряд без ответа
+        if self.last_message_at is not None and now - self.last_message_at > 3 * ping_interval:
+            score -= 50  # Даже pong не приходит
+        if self.last_rtt_ms is not None and self.last_rtt_ms > rtt_budget_ms:
+            score -= 30
+        return max(score, 0)
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "connected": self.connected_at is not None,
+            "authenticated": self.authenticated,
+            "syncing": self.syncing,
+            "connects": self.connects,
+            "recycles": self.recycles,
+            "messages": self.messages,
+            "idle_sec": round(now - self.last_message_at, 1) if self.last_message_at else None,
+            "max_gap_sec": round(self.max_gap_sec, 1),
+            "last_rtt_ms": round(self.last_rtt_ms, 1) if self.last_rtt_ms is not None else None,
+            "rtt": self.rtt.to_dict(),
+            "exchange_to_receive": self.exchange_latency.to_dict(),
+            "receive_to_dispatch": self.dispatch_latency.to_dict(),
+        }
+
+
+class PrivateFleetSupervisor:
+    """Владеет допуском и здоровьем всех приватных соединений процесса"""
+
+    def __init__(self, connect_rate: float = 5.0, auth_rate: float = 5.0, burst: int = 5,
+                 sync_concurrency: int = 4, ping_interval: float = 20.0, rtt_budget_ms: float = 1000.0,
+                 degraded_score: int = 50, check_interval: float = 10.0, auth_timeout: float = 10.0,
+                 recycle_cooldown: float = 60.0):
+        self.configure(connect_rate, auth_rate, burst, sync_concurrency, ping_interval, rtt_budget_ms,
+                       degraded_score, check_interval, auth_timeout, recycle_cooldown)
+        self._handlers: Set[Any] = set()
+        self._task: Optional[asyncio.Task] = None
+        # Пересоздания соединений, запущенные проверкой здоровья
+        self._recycle_tasks: Set[asyncio.Task] = set()
+
+        # Время старта флота: от первого допуска до готовности всех соединений
+        self._startup_began: Optional[float] = None
+        self._startup_done: Optional[float] = None
+        self.connect_to_ready = LatencyHistogram(
+            buckets_ms=(100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000)
+        )
+        self.active_syncs = 0
+        self.peak_syncs = 0
+        self.recycles = 0
+
+    def configure(self, connect_rate: float, auth_rate: float, burst: int, sync_concurrency: int,
+                  ping_interval: float, rtt_budget_ms: float, degraded_score: int, check_interval: float,
+                  auth_timeout: float = 10.0, recycle_cooldown: float = 60.0):
+        self.connect_gate = RateGate(connect_rate, burst)
+        self.auth_gate = RateGate(auth_rate, burst)
+        self._sync_semaphore = asyncio.Semaphore(max(1, sync_concurrency))
+        self.ping_interval = ping_interval
+        self.rtt_budget_ms = rtt_budget_ms
+        self.degraded_score = degraded_score
+        self.check_interval = check_interval
+        self.auth_timeout = auth_timeout
+        self.recycle_cooldown = recycle_cooldown
+
+    async def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._monitor_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._recycle_tasks):
+            task.cancel()
+        await asyncio.gather(*self._recycle_tasks, return_exceptions=True)
+        self._recycle_tasks.clear()
+
+    # --- Соединения ---
+
+    def register(self, handler):
+        """handler: объект с .health (ConnectionHealth) и async recycle()"""
+        self._handlers.add(handler)
+        if self._startup_began is None or self._startup_done is not None:
+            # Новая волна подключений: первый старт или новые соединения после готовности флота
+            self._startup_began = time.monotonic()
+            self._startup_done = None
+
+    def unregister(self, handler):
+        self._handlers.discard(handler)
+
+    async def admit_connect(self):
+        await self.connect_gate.acquire()
+
+    async def admit_auth(self):
+        await self.auth_gate.acquire()
+
+    def on_ready(self, health: ConnectionHealth):
+        """Соединение аутентифицировано"""
+        health.on_authenticated()
+        if health.connected_at is not None:
+            self.connect_to_ready.observe(health.ready_at - health.connected_at)
+        if self._startup_done is None and self._all_ready():
+            self._startup_done = time.monotonic()
+            log_info(0, f"Приватные WebSocket: все {len(self._handlers)} соединений готовы за "
+                        f"{self._startup_done - self._startup_began:.1f}с", module_name=__name__)
+
+    @asynccontextmanager
+    async def sync_slot(self):
+        """Ограничение параллельных синхронизаций ордеров после переподключения"""
+        async with self._sync_semaphore:
+            self.active_syncs += 1
+            self.peak_syncs = max(self.peak_syncs, self.active_syncs)
+            try:
+                yield
+            finally:
+                self.active_syncs -= 1
+
+    # --- Здоровье ---
+
+    def get_fleet_health(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        healths = [handler.health for handler in self._handlers]
+        scores = [self._score(health, now) for health in healths]
+        startup_sec = None
+        if self._startup_began is not None:
+            startup_sec = round((self._startup_done or now) - self._startup_began, 2)
+        return {
+            "connections": len(healths),
+            "connected": sum(1 for health in healths if health.connected_at is not None),
+            "authenticated": sum(1 for health in healths if health.authenticated),
+            "syncing": sum(1 for health in healths if health.syncing),
+            "degraded": sum(1 for score in scores if score < self.degraded_score),
+            "recycles": self.recycles,
+            "startup": {
+                "complete": self._startup_done is not None,
+                "elapsed_sec": startup_sec,
+                "connect_to_ready": self.connect_to_ready.to_dict(),
+            },
+            "admission": {
+                "connect_waiting": self.connect_gate.waiting,
+                "auth_waiting": self.auth_gate.waiting,
+                "active_syncs": self.active_syncs,
+                "peak_syncs": self.peak_syncs,
+            },
+            "worst": sorted(
+                ({**health.to_dict(now), "score": score} for health, score in zip(healths, scores)),
+                key=lambda item: item["score"]
+            )[:5],
+        }
+
+    def _score(self, health: ConnectionHealth, now: float) -> int:
+        return health.score(now, self.ping_interval, self.rtt_budget_ms, self.auth_timeout)
+
+    def _all_ready(self) -> bool:
+        return all(handler.health.authenticated for handler in self._handlers)
+
+    async def _monitor_loop(self):
+        last_recycle: Dict[str, float] = {}
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                now = time.monotonic()
+                for handler in list(self._handlers):
+                    health = handler.health
+                    score = self._score(health, now)
+                    if score >= self.degraded_score:
+                        continue
+                    if now - last_recycle.get(health.name, 0.0) < self.recycle_cooldown:
+                        continue
+                    last_recycle[health.name] = now
+                    self.recycles += 1
+                    health.recycles += 1
+                    log_warning(0, f"{health.name}: соединение деградировало (score={score}), пересоздаю",
+                                module_name=__name__)
+                    task = asyncio.create_task(handler.recycle())
+                    self._recycle_tasks.add(task)
+                    task.add_done_callback(self._recycle_tasks.discard)
+            except Exception as e:
+                log_error(0, f"Ошибка проверки приватных соединений: {e}", module_name=__name__)
+
+
+# Глобальный супервизор (настраивается и запускается BotApplication)
+private_fleet = PrivateFleetSupervisor()
@@ -0,0 +1,111 @@
+# websocket/public_decoder.py
+"""
+Быстрый декодер сообщений публичного WebSocket Bybit.
+
+- JSON: orjson, если установлен, иначе stdlib json (результат одинаковый: dict/list/str).
+- Топики: таблица topic -> TopicRoute(обработчик, аргументы). В таблице только подписанные топики:
+  маршруты строятся при подписке и удаляются при отписке. Кадры других топиков (например,
+  опоздавшие после отписки) разбираются на лету и не кэшируются.
+- Decimal: декодер данные не конвертирует - цены остаются строками биржи, обработчики
+  переводят в Decimal только читаемые поля (to_decimal_fast() - без лишнего str()).
+"""
+import json
+import sys
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # Опциональная зависимость
+    orjson = None
+
+# Каналы публичного потока, на которые подписывается GlobalWebSocketManager
+TRADE_CHANNEL = "publicTrade"
+TICKER_CHANNEL = "tickers"
+KLINE_CHANNEL = "kline"
+ORDERBOOK_CHANNEL = "orderbook"
+
+# Каналы с параметром в топике (<канал>.<параметр>.<символ>)
+PARAMETRIZED_CHANNELS = frozenset({KLINE_CHANNEL, ORDERBOOK_CHANNEL})
+
+RouteHandler = Callable[..., Awaitable[None]]
+
+
+def json_backend_name() -> str:
+    return "orjson" if orjson is not None else "json"
+
+
+def loads(message: Any) -> Any:
+    """Разбор JSON выбранным бэкендом (str или bytes)"""
+    if orjson is not None:
+        return orjson.loads(message)
+    return json.loads(message)
+
+
+def to_decimal_fast(value: Any) -> Decimal:
+    """Decimal из значения биржи: строки передаются напрямую, без повторного str()"""
+    if type(value) is str:
+        return Decimal(value)
+    return Decimal(str(value))
+
+
+class TopicRoute:
+    """Готовый маршрут топика: handler(*args, data)"""
+
+    __slots__ = ("handler", "args")
+
+    def __init__(self, handler: RouteHandler, args: Tuple[str, ...]):
+        self.handler = handler
+        self.args = args
+
+
+class PublicMessageDecoder:
+    """
+    Таблица маршрутизации публичных топиков.
+    handlers: канал (publicTrade/tickers/kline/orderbook) -> обработчик.
+    Обработчики trade/tickers вызываются как handler(symbol, data),
+    kline/orderbook - как handler(symbol, interval_или_глубина, data).
+    """
+
+    def __init__(self, handlers: Dict[str, RouteHandler]):
+        self._handlers = handlers
+        self._routes: Dict[str, Optional[TopicRoute]] = {}
+
+    def topics_for_symbol(self, symbol: str, kline_intervals: Tuple[str, ...],
+                          ticker: bool = False, orderbook_depth: Optional[int] = None) -> Tuple[str, ...]:
+        """Топики символа: сделки + свечи указанных интервалов, опционально тикер и стакан"""
+        topics = (f"{TRADE_CHANNEL}.{symbol}",) + tuple(f"{KLINE_CHANNEL}.{interval}.{symbol}" for interval in kline_intervals)
+        if ticker:
+            topics += (f"{TICKER_CHANNEL}.{symbol}",)
+        if orderbook_depth:
+            topics += (f"{ORDERBOOK_CHANNEL}.{orderbook_depth}.{symbol}",)
+        return topics
+
+    def register_topics(self, topics):
+        """Заранее строит маршруты для топиков (вызывается при подписке)"""
+        for topic in topics:
+            self._routes[topic] = self._build_route(topic)
+
+    def forget_topics(self, topics):
+        for topic in topics:
+            self._routes.pop(topic, None)
+
+    def route(self, topic: str) -> Optional[TopicRoute]:
+        """Маршрут топика: O(1) для зарегистрированных топиков, остальные разбираются без кэша"""
+        try:
+            return self._routes[topic]
+        except KeyError:
+            return self._build_route(topic)
+
+    def _build_route(self, topic: str) -> Optional[TopicRoute]:
+        parts = topic.split(".")
+        handler = self._handlers.get(parts[0])
+        if handler is None:
+            return None
+        if parts[0] in PARAMETRIZED_CHANNELS:
+            if len(parts) != 3:
+                return None
+            return TopicRoute(handler, (sys.intern(parts[2]), sys.intern(parts[1])))
+        if len(parts) != 2:
+            return None
+        return TopicRoute(handler, (sys.intern(parts[1]),))
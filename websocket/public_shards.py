@@ -0,0 +1,396 @@
+# websocket/public_shards.py
+"""
+Шарды публичного WebSocket: каждый шард - отдельное соединение со своим набором топиков.
+
+- Подписки отправляются пакетами: до batch_size топиков в args одного кадра.
+  Изменения набора топиков копятся коротким окном и уходят одним диффом.
+- Прогрев: новое соединение сначала подписывается на все свои топики и ждет подтверждений
+  (или warmup_timeout), и только потом его данные идут в обработку. recycle() поднимает
+  замену рядом с рабочим соединением и переключает трафик после прогрева; recycle() и stop()
+  сериализованы, фоновые задачи шарда отменяются при остановке.
+- Переподключение: экспоненциальная задержка с джиттером (reconnect_delay).
+- Heartbeat: прикладной ping Bybit ({"op": "ping"}) раз в ping_interval, RTT по pong.
+  Нет ни одного кадра (даже pong) дольше stale_timeout - соединение закрывается и
+  переподключается; отставание потока от биржи выше max_lag_ms - recycle().
+- Задержки по кадрам (скользящие перцентили): биржа -> прием по полю ts конверта
+  (зависит от синхронизации часов хоста, NTP обязателен) и прием -> диспетчеризация
+  (разбор, маршрутизация и публикация в EventBus).
+"""
+import asyncio
+import json
+import random
+import time
+from itertools import count
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import websockets
+
+from core.logger import log_info, log_error, log_warning, log_debug, is_debug_enabled
+from core.metrics import RollingLatencyHistogram
+from websocket.capture import frame_capture
+from websocket.public_decoder import loads
+
+# Окно накопления изменений подписок перед отправкой
+SUBSCRIBE_COALESCE_SECONDS = 0.05
+
+# Переподключение: base * 2^attempt, не больше cap, половина задержки - случайный джиттер
+RECONNECT_BASE_SECONDS = 1.0
+RECONNECT_MAX_SECONDS = 60.0
+
+# Сглаживание отставания потока (EWMA по кадрам) и пауза между recycle() из-за отставания
+LAG_EWMA_ALPHA = 0.05
+LAG_RECYCLE_COOLDOWN_SECONDS = 300.0
+# Кадры данных начинаются с topic; остальные (ответы на ping/subscribe) проверяем на pong
+DATA_FRAME_PREFIX = '{"topic"'
+
+# Обработчик кадра возвращает биржевое время кадра (ts конверта, мс) или None
+MessageHandler = Callable[[str], Awaitable[Optional[int]]]
+LiveHandler = Callable[["PublicConnectionShard", bool], Awaitable[None]]
+
+
+def connection_closed(connection) -> bool:
+    """
+    Закрыто ли соединение. Совместимо с версиями websockets: у нового клиента (asyncio.client)
+    нет свойства closed, у обоих есть state (перечисление с состоянием CLOSED).
+    """
+    state = getattr(connection, "state", None)
+    if state is not None:
+        return getattr(state, "name", None) == "CLOSED"
+    return bool(getattr(connection, "closed", False))
+
+
+async def _cancel_task(task: Optional[asyncio.Task]):
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def reconnect_delay(attempt: int, base: float = RECONNECT_BASE_SECONDS, cap: float = RECONNECT_MAX_SECONDS) -> float:
+    """Экспоненциальная задержка с джиттером: соединения не переподключаются синхронно"""
+    delay = min(cap, base * (2 ** min(attempt, 16)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class PublicConnectionShard:
+    """Одно публичное соединение и закрепленные за ним топики"""
+
+    def __init__(self, index: int, url: str, on_message: MessageHandler,
+                 batch_size: int = 10, warmup_timeout: float = 10.0, on_live: Optional[LiveHandler] = None,
+                 ping_interval: float = 20.0, stale_timeout: float = 60.0, max_lag_ms: float = 5000.0,
+                 latency_window: float = 60.0):
+        self.index = index
+        self.url = url
+        self.on_message = on_message
+        # Вызывается (отдельной задачей) при переводе соединения в работу; второй аргумент -
+        # True, если это повторное подключение (данные за время разрыва могли быть пропущены)
+        self.on_live = on_live
+        self.batch_size = max(1, batch_size)
+        self.warmup_timeout = warmup_timeout
+        self.ping_interval = ping_interval
+        self.stale_timeout = stale_timeout
+        self.max_lag_ms = max_lag_ms  # 0 - recycle по отставанию отключен
+
+        # Желаемый набор топиков и то, что реально подписано на текущем соединении
+        self.topics: Set[str] = set()
+        self._subscribed: Set[str] = set()
+
+        self.connection: Optional[websockets.WebSocketClientProtocol] = None
+        self.live = False
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # Фоновые задачи шарда (on_live, recycle по отставанию) - отменяются в stop()
+        self._tasks: Set[asyncio.Task] = set()
+        # recycle() и stop() не выполняются одновременно: замена не переживает остановку
+        self._lock = asyncio.Lock()
+        self._req_ids = count(1)
+
+        # Метрики
+        self.connects = 0
+        self.reconnect_attempt = 0
+        self.messages = 0
+        self.warmup_dropped = 0
+        self.last_warmup_ms = 0.0
+        self.last_message_at: Optional[float] = None
+        self.pings_sent = 0
+        self.pongs = 0
+        self.stale_reconnects = 0
+        self.lag_recycles = 0
+        self.lag_ms = 0.0
+        self._last_lag_recycle = 0.0
+        self._ping_sent_at: Dict[str, float] = {}
+        self.rtt = RollingLatencyHistogram(latency_window)
+        self.exchange_latency = RollingLatencyHistogram(latency_window)
+        self.dispatch_latency = RollingLatencyHistogram(latency_window)
+
+    @property
+    def name(self) -> str:
+        return f"public-{self.index}"
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._running = False
+        # Сначала фоновые задачи: отмененный recycle() отменяет свою замену и отпускает блокировку
+        for task in list(self._tasks):
+            await _cancel_task(task)
+        async with self._lock:
+            for task in (self._flush_task, self._task):
+                await _cancel_task(task)
+            self._flush_task = None
+            self._task = None
+            if self.connection:
+                await self.connection.close()
+                self.connection = None
+            self.live = False
+
+    def add_topics(self, topics):
+        self.topics.update(topics)
+        self._schedule_flush()
+
+    def remove_topics(self, topics):
+        self.topics.difference_update(topics)
+        self._schedule_flush()
+
+    async def recycle(self):
+        """
+        Замена соединения без потери потока: новое соединение прогревается рядом со старым,
+        затем трафик переключается на него, старое закрывается.
+        """
+        async with self._lock:
+            if not self._running or not self.live:
+                return
+            old_task, old_connection = self._task, self.connection
+            new_task = asyncio.create_task(self._run())
+            try:
+                # Старое соединение обслуживает трафик, пока новое не станет live
+                deadline = time.monotonic() + self.warmup_timeout + 5
+                while self._running and self.connection is old_connection and time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                await _cancel_task(new_task)
+                raise
+
+            if not self._running:
+                retired_task = new_task
+            elif self.connection is old_connection:
+                log_warning(0, f"{self.name}: замена соединения не прогрелась, остаемся на старом",
+                            module_name=__name__)
+                retired_task = new_task
+            else:
+                self._task, retired_task = new_task, old_task
+            await _cancel_task(retired_task)
+            if old_connection and old_connection is not self.connection:
+                await old_connection.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "live": self.live,
+            "topics": len(self.topics),
+            "connects": self.connects,
+            "messages": self.messages,
+            "warmup_ms": round(self.last_warmup_ms, 1),
+            "warmup_dropped": self.warmup_dropped,
+            "idle_sec": round(time.monotonic() - self.last_message_at, 1) if self.last_message_at else None,
+            "lag_ms": round(self.lag_ms, 1),
+            "pings_sent": self.pings_sent,
+            "pongs": self.pongs,
+            "stale_reconnects": self.stale_reconnects,
+            "lag_recycles": self.lag_recycles,
+            "rtt": self.rtt.to_dict(),
+            "exchange_to_receive": self.exchange_latency.to_dict(),
+            "receive_to_dispatch": self.dispatch_latency.to_dict(),
+        }
+
+    def _frames(self, op: str, topics) -> List[Dict]:
+        """Пакетные кадры subscribe/unsubscribe с req_id для сопоставления подтверждений"""
+        topics = sorted(topics)
+        return [
+            {"req_id": f"{self.name}-{next(self._req_ids)}", "op": op, "args": topics[i:i + self.batch_size]}
+            for i in range(0, len(topics), self.batch_size)
+        ]
+
+    async def _run(self):
+        while self._running:
+            try:
+                async with websockets.connect(self.url) as websocket:
+                    self.connects += 1
+                    await self._warm_up(websocket)
+
+                    # Переключаем трафик на прогретое соединение
+                    self.connection = websocket
+                    self.live = True
+                    self.reconnect_attempt = 0
+                    self.last_message_at = time.monotonic()
+                    self.lag_ms = 0.0
+                    self._schedule_flush()  # Топики, измененные во время прогрева
+                    if self.on_live:
+                        self._spawn(self.on_live(self, self.connects > 1))
+
+                    heartbeat_task = asyncio.create_task(self._heartbeat(websocket))
+                    try:
+                        async for message in websocket:
+                            # Соединение заменено через recycle() - трафик уже идет через новое
+                            if not self._running or self.connection is not websocket:
+                                break
+                            await self._on_frame(message, time.time(), time.perf_counter())
+                    finally:
+                        heartbeat_task.cancel()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Фильтруем обычные сетевые ошибки WebSocket
+                error_str = str(e)
+                if "no close frame" in error_str or "connection closed" in error_str:
+                    log_info(0, f"Публичный WebSocket {self.name} переподключение: {e}", module_name=__name__)
+                else:
+                    log_error(0, f"Ошибка публичного WebSocket {self.name}: {e}", module_name=__name__)
+            finally:
+                if self.connection is not None and connection_closed(self.connection):
+                    self.connection = None
+                    self.live = False
+
+            if self._running:
+                delay = reconnect_delay(self.reconnect_attempt)
+                self.reconnect_attempt += 1
+                log_info(0, f"{self.name}: переподключение через {delay:.1f}с (попытка {self.reconnect_attempt})",
+                         module_name=__name__)
+                await asyncio.sleep(delay)
+
+    async def _on_frame(self, message: str, received_at: float, received_perf: float):
+        """Кадр рабочего соединения: pong, данные в обработку, задержки кадра"""
+        self.messages += 1
+        self.last_message_at = time.monotonic()
+        if frame_capture.enabled:
+            frame_capture.record(self.name, message, received_at)
+        # Проверка уровня до форматирования: срез и f-строка на каждый кадр не нужны
+        if is_debug_enabled():
+            log_debug(0, f"📨 PUBLIC WebSocket {self.name}: {message[:200]}", module_name=__name__)
+        if not message.startswith(DATA_FRAME_PREFIX) and self._handle_pong(message):
+            return
+        try:
+            exchange_ts = await self.on_message(message)
+        except Exception as e:
+            log_error(0, f"Ошибка обработки публичного сообщения ({self.name}): {e}", module_name=__name__)
+            return
+        self.dispatch_latency.observe(time.perf_counter() - received_perf)
+        if exchange_ts:
+            # Отрицательное значение - расхождение часов с биржей, считаем нулем
+            lag_ms = max(received_at * 1000 - exchange_ts, 0.0)
+            self.exchange_latency.observe(lag_ms / 1000)
+            self.lag_ms += (lag_ms - self.lag_ms) * LAG_EWMA_ALPHA
+
+    def _handle_pong(self, message: str) -> bool:
+        """Ответ на наш ping ({"op": "ping", "ret_msg": "pong"}); True - кадр обработан"""
+        try:
+            data = loads(message)
+        except Exception:
+            return False
+        if data.get("op") != "ping" and data.get("ret_msg") != "pong":
+            return False
+        sent_at = self._ping_sent_at.pop(data.get("req_id"), None)
+        self.pongs += 1
+        if sent_at is not None:
+            self.rtt.observe(time.monotonic() - sent_at)
+        return True
+
+    async def _heartbeat(self, websocket):
+        """Прикладной ping и контроль свежести потока рабочего соединения"""
+        self._ping_sent_at.clear()
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            if self.connection is not websocket:
+                return
+            now = time.monotonic()
+            idle = now - self.last_message_at
+            if idle > self.stale_timeout:
+                self.stale_reconnects += 1
+                log_warning(0, f"{self.name}: нет кадров {idle:.0f}с (бюджет {self.stale_timeout:.0f}с), "
+                               f"переподключение", module_name=__name__)
+                await websocket.close()
+                return
+            if (self.max_lag_ms and self.lag_ms > self.max_lag_ms
+                    and now - self._last_lag_recycle >= LAG_RECYCLE_COOLDOWN_SECONDS):
+                self._last_lag_recycle = now
+                self.lag_recycles += 1
+                log_warning(0, f"{self.name}: отставание потока {self.lag_ms:.0f} мс "
+                               f"(бюджет {self.max_lag_ms:.0f} мс), замена соединения", module_name=__name__)
+                self._spawn(self.recycle())
+
+            req_id = f"{self.name}-ping-{next(self._req_ids)}"
+            if len(self._ping_sent_at) > 10:
+                self._ping_sent_at.clear()  # Ответы на старые ping уже не придут
+            self._ping_sent_at[req_id] = now
+            self.pings_sent += 1
+            await websocket.send(json.dumps({"req_id": req_id, "op": "ping"}))
+
+    async def _warm_up(self, websocket):
+        """Подписка на все топики шарда и ожидание подтверждений до переключения трафика"""
+        started = time.monotonic()
+        topics = set(self.topics)
+        frames = self._frames("subscribe", topics)
+        waiting = {frame["req_id"] for frame in frames}
+        for frame in frames:
+            await websocket.send(json.dumps(frame))
+        self._subscribed = topics
+
+        deadline = started + self.warmup_timeout
+        while waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                log_warning(0, f"{self.name}: не получено {len(waiting)} подтверждений подписки за "
+                               f"{self.warmup_timeout}с, соединение переводится в работу", module_name=__name__)
+                break
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=remaining)
+            except asyncio.TimeoutError:
+                continue
+            data = loads(message)
+            req_id = data.get("req_id")
+            if req_id in waiting:
+                waiting.discard(req_id)
+                if not data.get("success", False):
+                    log_error(0, f"{self.name}: подписка отклонена: {data.get('ret_msg')}", module_name=__name__)
+            elif "topic" in data:
+                # Данные до завершения прогрева не обрабатываем
+                self.warmup_dropped += 1
+
+        self.last_warmup_ms = (time.monotonic() - started) * 1000
+        log_info(0, f"⚡ {self.name}: подключен и прогрет за {self.last_warmup_ms:.0f} мс "
+                    f"({len(topics)} топиков, {len(frames)} кадров подписки)", module_name=__name__)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _schedule_flush(self):
+        if self.live and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_subscriptions())
+
+    async def _flush_subscriptions(self):
+        """Отправляет дифф подписок текущего соединения пакетными кадрами"""
+        await asyncio.sleep(SUBSCRIBE_COALESCE_SECONDS)
+        connection = self.connection
+        if not self.live or connection is None:
+            return
+        to_unsubscribe = self._subscribed - self.topics
+        to_subscribe = self.topics - self._subscribed
+        try:
+            for frame in self._frames("unsubscribe", to_unsubscribe) + self._frames("subscribe", to_subscribe):
+                await connection.send(json.dumps(frame))
+            self._subscribed = (self._subscribed - to_unsubscribe) | to_subscribe
+            if to_subscribe or to_unsubscribe:
+                log_info(0, f"{self.name}: подписка +{len(to_subscribe)} / -{len(to_unsubscribe)} топиков",
+                         module_name=__name__)
+        except Exception as e:
+            log_error(0, f"{self.name}: ошибка отправки подписок: {e}", module_name=__name__)
@@ -5,45 +5,72 @@
 """
 import asyncio
 import json
+import sys
 import websockets
 from decimal import Decimal, getcontext
-from typing import Dict, Optional, Set, List, Any
+from typing import Dict, Optional, Set, List, Any, FrozenSet, Tuple
 from datetime import datetime
 import hmac
 import hashlib
 import time
+from itertools import count
 from core.functions import to_decimal
 from core.logger import log_info, log_error, log_warning, log_debug
 from core.events import (
-    EventType, NewCandleEvent, PriceUpdateEvent, OrderUpdateEvent,
-    OrderFilledEvent, PositionUpdateEvent, PositionClosedEvent, EventBus
+    EventType, OrderUpdateEvent, OrderFilledEvent, PositionUpdateEvent, PositionClosedEvent, EventBus,
+    SymbolPriceBroadcastEvent, SymbolCandleBroadcastEvent
 )
 from cache.redis_manager import redis_manager, ConfigType
 from database.db_trades import db_manager
 from core.settings_config import system_config
+from core.metrics import LatencyHistogram, RollingLatencyHistogram
+from core.market_state import market_state
+from core.order_registry import get_order_registry
 from api.bybit_api import BybitAPI
+from websocket.public_shards import PublicConnectionShard, reconnect_delay
+from websocket.private_fleet import private_fleet, ConnectionHealth
+from websocket.candle_aggregator import candle_aggregator
+from core.kline_store import kline_store
+from websocket.capture import frame_capture
+from websocket.public_decoder import (
+    PublicMessageDecoder, TRADE_CHANNEL, TICKER_CHANNEL, KLINE_CHANNEL, ORDERBOOK_CHANNEL,
+    loads, json_backend_name, to_decimal_fast
+)
 
 # Настройка точности для Decimal
 getcontext().prec = 28
 
 
+# Интервалы свечей публичного потока: 5m для стратегий, 1m для spike detector
+PUBLIC_KLINE_INTERVALS = ("5", "1")
+# Глубина стакана для доски рынка (лучшие bid/ask)
+PUBLIC_ORDERBOOK_DEPTH = 1
+
+# Параллельность REST-догрузки свечей после переподключения
+BACKFILL_CONCURRENCY = 5
+# Bybit отдает не более 1000 свечей за запрос
+BACKFILL_MAX_CANDLES = 1000
+
+
 class GlobalWebSocketManager:
     """
     Глобальный менеджер WebSocket соединений
-    Управляет одним публичным соединением для всех пользователей
+    Управляет публичными соединениями для всех пользователей: топики распределяются
+    по шардам (до public_max_connections соединений, не более public_topics_per_connection
+    топиков на соединение), все топики одного символа живут в одном шарде.
     """
 
     def __init__(self, event_bus: EventBus, demo: bool = False):
-        self.public_connection: Optional[websockets.WebSocketClientProtocol] = None
         self.event_bus = event_bus
         self.running = False
 
         # Публичный URL всегда один - боевой, т.к. он для всех пользователей
-        self.public_url = "wss://stream.bybit.com/v5/public/linear"
+        # (PUBLIC_WS_URL/PRIVATE_WS_URL переопределяют адреса, например на локальный replay-сервер)
+        self.public_url = system_config.websocket.public_url or "wss://stream.bybit.com/v5/public/linear"
 
         # Приватный URL зависит от режима demo, он будет использоваться в DataFeedHandler
         private_domain = "stream-demo.bybit.com" if demo else "stream.bybit.com"
-        self.private_url_template = f"wss://{private_domain}/v5/private"
+        self.private_url_template = system_config.websocket.private_url or f"wss://{private_domain}/v5/private"
 
         log_info(0, f"WebSocket Manager использует Public URL: {self.public_url}", module_name=__name__)
         log_info(0, f"WebSocket Manager использует Private URL Template: {self.private_url_template}",
@@ -52,9 +79,47 @@ class GlobalWebSocketManager:
         # Отслеживание подписок
         self.symbol_subscribers: Dict[str, Set[int]] = {}  # symbol -> set of user_ids
         self.subscribed_symbols: Set[str] = set()
-
-        # Задача только для публичного соединения
-        self._public_task: Optional[asyncio.Task] = None
+        # Неизменяемый снимок подписчиков символа для broadcast-событий (пересобирается при (от)подписке)
+        self._symbol_recipients: Dict[str, FrozenSet[int]] = {}
+
+        # Шарды публичных соединений
+        ws_config = system_config.websocket
+        self._max_public_connections = max(1, ws_config.public_max_connections)
+        self._topics_per_connection = max(1, ws_config.public_topics_per_connection)
+        self._subscribe_batch_size = ws_config.subscribe_batch_size
+        self._warmup_timeout = ws_config.warmup_timeout
+        self._ws_config = ws_config
+        self._shards: List[PublicConnectionShard] = []
+        self._symbol_shards: Dict[str, PublicConnectionShard] = {}
+        market_state.max_age = ws_config.market_state_max_age
+        frame_capture.configure(ws_config.capture_dir)
+        # Агрегатор свечей: 1m/5m приходят от биржи, остальные таймфреймы собираются из 1m
+        candle_aggregator.configure(
+            ws_config.candle_timeframes,
+            native_timeframes=[f"{interval}m" for interval in PUBLIC_KLINE_INTERVALS],
+            history_size=ws_config.candle_history_size
+        )
+
+        # Непрерывность свечей: (symbol, interval) -> start последней опубликованной закрытой свечи (мс)
+        self._last_confirmed_candle: Dict[Tuple[str, str], int] = {}
+        # Пока по ключу идет догрузка, живые свечи копятся здесь и публикуются после нее
+        self._backfill_buffers: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        # Активные догрузки по ключу: отменяются при отписке от символа и при остановке
+        self._backfill_tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._public_api: Optional[BybitAPI] = None
+        self._backfill_latency = LatencyHistogram()
+        self._candle_gap_stats = {"gaps": 0, "missed_candles": 0, "backfilled": 0, "backfill_errors": 0}
+        # Время сделки (T) -> прием: насколько свежи цены, которые получают стратегии
+        self._trade_latency = RollingLatencyHistogram(ws_config.latency_window)
+
+        # Декодер публичных сообщений: topic -> обработчик
+        self._decoder = PublicMessageDecoder({
+            TRADE_CHANNEL: self._handle_public_trade,
+            TICKER_CHANNEL: self._handle_ticker_update,
+            KLINE_CHANNEL: self._handle_candle_update,
+            ORDERBOOK_CHANNEL: self._handle_orderbook_update,
+        })
+        log_info(0, f"JSON бэкенд публичного WebSocket: {json_backend_name()}", module_name=__name__)
 
     async def start(self):
         """Запуск глобального WebSocket менеджера"""
@@ -63,7 +128,10 @@ class GlobalWebSocketManager:
 
         log_info(0, "Запуск GlobalWebSocketManager...", module_name=__name__)
         self.running = True
-        self._public_task = asyncio.create_task(self._public_websocket_loop())
+        await frame_capture.start()
+        # Шарды создаются по мере подписки на символы; уже созданные (подписки до start) запускаем
+        for shard in self._shards:
+            shard.start()
         log_info(0, "GlobalWebSocketManager запущен", module_name=__name__)
 
     async def stop(self):
@@ -75,15 +143,15 @@ class GlobalWebSocketManager:
 
         self.running = False
 
-        if self._public_task:
-            self._public_task.cancel()
-            try:
-                await self._public_task
-            except asyncio.CancelledError:
-                pass
+        for shard in self._shards:
+            await shard.stop()
+        await self._cancel_backfills()
+
+        if self._public_api:
+            await self._public_api.close()
+            self._public_api = None
 
-        if self.public_connection:
-            await self.public_connection.close()
+        await frame_capture.stop()
 
         log_info(0, "GlobalWebSocketManager остановлен", module_name=__name__)
 
@@ -93,6 +161,7 @@ class GlobalWebSocketManager:
             self.symbol_subscribers[symbol] = set()
 
         self.symbol_subscribers[symbol].add(user_id)
+        self._symbol_recipients[symbol] = frozenset(self.symbol_subscribers[symbol])
 
         # Если это первая подписка на символ, подписываемся в WebSocket
         if symbol not in self.subscribed_symbols:
@@ -105,12 +174,14 @@ class GlobalWebSocketManager:
         """Отписка пользователя от символа"""
         if symbol in self.symbol_subscribers:
             self.symbol_subscribers[symbol].discard(user_id)
+            self._symbol_recipients[symbol] = frozenset(self.symbol_subscribers[symbol])
 
             # Если больше нет подписчиков, отписываемся от WebSocket
             if not self.symbol_subscribers[symbol]:
                 await self._unsubscribe_from_symbol(symbol)
                 self.subscribed_symbols.discard(symbol)
                 del self.symbol_subscribers[symbol]
+                self._symbol_recipients.pop(symbol, None)
 
         log_info(user_id, f"Отписка от {symbol}", module_name=__name__)
 
@@ -121,6 +192,7 @@ class GlobalWebSocketManager:
         for symbol, subscribers in self.symbol_subscribers.items():
             if user_id in subscribers:
                 subscribers.discard(user_id)
+                self._symbol_recipients[symbol] = frozenset(subscribers)
                 if not subscribers:
                     symbols_to_remove.append(symbol)
 
@@ -128,143 +200,125 @@ class GlobalWebSocketManager:
             await self._unsubscribe_from_symbol(symbol)
             self.subscribed_symbols.discard(symbol)
             del self.symbol_subscribers[symbol]
+            self._symbol_recipients.pop(symbol, None)
 
         log_info(user_id, "Отписка от всех символов", module_name=__name__)
 
-    async def _public_websocket_loop(self):
-        """Основной цикл публичного WebSocket"""
-        while self.running:
-            try:
-                log_info(0, f"Подключение к публичному WebSocket: {self.public_url}", module_name=__name__)
-
-                async with websockets.connect(self.public_url) as websocket:
-
-                    self.public_connection = websocket
-                    log_info(0, "Подключен к публичному WebSocket", module_name=__name__)
-
-                    # Переподписка на все символы
-                    log_info(0, f"📋 Состояние подписок: subscribed_symbols={list(self.subscribed_symbols)}, symbol_subscribers={dict(self.symbol_subscribers)}", module_name=__name__)
-                    for symbol in list(self.subscribed_symbols):
-                        await self._subscribe_to_symbol(symbol)
-
-                    # Обработка сообщений
-                    log_info(0, "🔄 Начинаю чтение сообщений из публичного WebSocket...", module_name=__name__)
-                    async for message in websocket:
-                        log_debug(0, f"📨 PUBLIC WebSocket: {message[:200]}", module_name=__name__)
-                        if not self.running:
-                            break
-
-                        try:
-                            await self._handle_public_message(message)
-                        except Exception as e:
-                            log_error(0, f"Ошибка обработки публичного сообщения: {e}", module_name=__name__)
+    def get_public_stats(self) -> Dict[str, Any]:
+        """Состояние публичных шардов"""
+        return {
+            "symbols": len(self.subscribed_symbols),
+            "connections": [shard.get_stats() for shard in self._shards],
+            "candle_gaps": {
+                **self._candle_gap_stats,
+                "backfill_latency": self._backfill_latency.to_dict(),
+            },
+            "market_state": market_state.get_stats(),
+            "candles": candle_aggregator.get_stats(),
+            "trade_to_receive": self._trade_latency.to_dict(),
+            "capture": frame_capture.get_stats(),
+        }
+
+    def export_prometheus(self) -> str:
+        """Задержки публичного потока в текстовом формате Prometheus"""
+        lines = ["# TYPE public_ws_trade_to_receive_seconds histogram",
+                 *self._trade_latency.to_prometheus("public_ws_trade_to_receive_seconds", {})]
+        for name, attribute in (("public_ws_ping_rtt_seconds", "rtt"),
+                                ("public_ws_exchange_to_receive_seconds", "exchange_latency"),
+                                ("public_ws_receive_to_dispatch_seconds", "dispatch_latency")):
+            lines.append(f"# TYPE {name} histogram")
+            for shard in self._shards:
+                lines.extend(getattr(shard, attribute).to_prometheus(name, {"connection": shard.name}))
+        return "\n".join(lines) + "\n"
+
+    def _shard_for_topics(self, topic_count: int) -> PublicConnectionShard:
+        """
+        Выбирает шард для новых топиков: наименее загруженный с запасом по лимиту,
+        иначе новое соединение, а при исчерпании лимита соединений - наименее загруженный.
+        """
+        fitting = [shard for shard in self._shards
+                   if len(shard.topics) + topic_count <= self._topics_per_connection]
+        if fitting:
+            return min(fitting, key=lambda shard: len(shard.topics))
+
+        if len(self._shards) < self._max_public_connections:
+            index = max((shard.index for shard in self._shards), default=-1) + 1
+            shard = PublicConnectionShard(
+                index, self.public_url, self._handle_public_message,
+                batch_size=self._subscribe_batch_size, warmup_timeout=self._warmup_timeout,
+                on_live=self._on_public_shard_live,
+                ping_interval=self._ws_config.ping_interval, stale_timeout=self._ws_config.stale_timeout,
+                max_lag_ms=self._ws_config.max_lag_ms, latency_window=self._ws_config.latency_window
+            )
+            self._shards.append(shard)
+            log_info(0, f"Новое публичное соединение {shard.name} (всего {len(self._shards)})", module_name=__name__)
+            return shard
 
-            except Exception as e:
-                # Фильтруем обычные сетевые ошибки WebSocket
-                error_str = str(e)
-                if "no close frame" in error_str or "connection closed" in error_str:
-                    log_info(0, f"Публичный WebSocket переподключение: {e}", module_name=__name__)
-                else:
-                    log_error(0, f"Ошибка публичного WebSocket: {e}", module_name=__name__)
+        shard = min(self._shards, key=lambda shard: len(shard.topics))
+        log_warning(0, f"Достигнут лимит публичных соединений ({self._max_public_connections}), "
+                       f"{shard.name} превышает лимит топиков", module_name=__name__)
+        return shard
 
-                if self.running:
-                    await asyncio.sleep(5)  # Пауза перед переподключением
+    def _symbol_topics(self, symbol: str):
+        """
+        Топики символа: publicTrade (МГНОВЕННЫЕ сделки) + kline.5 + kline.1,
+        tickers (статистика 24ч) и orderbook.1 (лучшие bid/ask) для доски рынка
+        """
+        return self._decoder.topics_for_symbol(
+            symbol, PUBLIC_KLINE_INTERVALS, ticker=True, orderbook_depth=PUBLIC_ORDERBOOK_DEPTH
+        )
 
     async def _subscribe_to_symbol(self, symbol: str):
-        """Подписка на символ в WebSocket"""
-        if not self.public_connection:
-            return
-
-        try:
-            # МГНОВЕННАЯ ПОДПИСКА: publicTrade - реальные сделки в режиме реального времени
-            # Обновления приходят при КАЖДОЙ сделке на бирже (самый быстрый поток!)
-            trade_msg = {
-                "op": "subscribe",
-                "args": [f"publicTrade.{symbol}"]
-            }
-            await self.public_connection.send(json.dumps(trade_msg))
-
-            # Подписка на свечи 5m (для стратегий на 5-минутном таймфрейме)
-            candle_5m_msg = {
-                "op": "subscribe",
-                "args": [f"kline.5.{symbol}"]  # 5-минутные свечи
-            }
-            await self.public_connection.send(json.dumps(candle_5m_msg))
-
-            # Подписка на свечи 1m (для spike detector)
-            candle_1m_msg = {
-                "op": "subscribe",
-                "args": [f"kline.1.{symbol}"]  # 1-минутные свечи
-            }
-            await self.public_connection.send(json.dumps(candle_1m_msg))
-
-            log_info(0, f"⚡ МГНОВЕННАЯ подписка на {symbol} (publicTrade + kline.5 + kline.1) отправлена", module_name=__name__)
-
-        except Exception as e:
-            log_error(0, f"Ошибка подписки на {symbol}: {e}", module_name=__name__)
+        """Подписка на символ: все топики символа живут в одном шарде"""
+        topics = self._symbol_topics(symbol)
+        self._decoder.register_topics(topics)
+        candle_aggregator.track(symbol)
+
+        shard = self._shard_for_topics(len(topics))
+        self._symbol_shards[symbol] = shard
+        # Шард сам отправит подписку пакетным кадром (или при подключении - в рамках прогрева)
+        shard.add_topics(topics)
+        if self.running:
+            shard.start()
 
     async def _unsubscribe_from_symbol(self, symbol: str):
-        """Отписка от символа в WebSocket"""
-        if not self.public_connection:
+        """Отписка от символа; опустевший шард закрывает соединение"""
+        topics = self._symbol_topics(symbol)
+        self._decoder.forget_topics(topics)
+        market_state.forget(symbol)
+        candle_aggregator.forget(symbol)
+        # Непрерывность свечей символа больше не отслеживается
+        await self._cancel_backfills(symbol)
+        for interval in PUBLIC_KLINE_INTERVALS:
+            self._last_confirmed_candle.pop((symbol, interval), None)
+            self._backfill_buffers.pop((symbol, interval), None)
+
+        shard = self._symbol_shards.pop(symbol, None)
+        if not shard:
             return
-
-        try:
-            # Отписка от мгновенных обновлений
-            trade_msg = {
-                "op": "unsubscribe",
-                "args": [f"publicTrade.{symbol}"]
-            }
-            await self.public_connection.send(json.dumps(trade_msg))
-
-            # Отписка от свечей 5m
-            candle_5m_msg = {
-                "op": "unsubscribe",
-                "args": [f"kline.5.{symbol}"]  # 5-минутные свечи
-            }
-            await self.public_connection.send(json.dumps(candle_5m_msg))
-
-            # Отписка от свечей 1m
-            candle_1m_msg = {
-                "op": "unsubscribe",
-                "args": [f"kline.1.{symbol}"]  # 1-минутные свечи
-            }
-            await self.public_connection.send(json.dumps(candle_1m_msg))
-
-            log_info(0, f"Отписка от {symbol} (kline.5 + kline.1) отправлена", module_name=__name__)
-
-        except Exception as e:
-            log_error(0, f"Ошибка отписки от {symbol}: {e}", module_name=__name__)
-
-    async def _handle_public_message(self, message: str):
-        """Обработка публичных сообщений"""
+        shard.remove_topics(topics)
+        if not shard.topics:
+            await shard.stop()
+            self._shards.remove(shard)
+            log_info(0, f"Публичное соединение {shard.name} закрыто: нет топиков", module_name=__name__)
+
+    async def _handle_public_message(self, message: str) -> Optional[int]:
+        """Обработка публичных сообщений; возвращает биржевое время кадра (ts, мс) для метрик шарда"""
         try:
-            data = json.loads(message)
+            data = loads(message)
 
-            # Логируем системные сообщения (subscribe/pong/etc)
-            if "op" in data:
-                log_info(0, f"🔔 PUBLIC WebSocket системное сообщение: op={data.get('op')}, success={data.get('success')}, ret_msg={data.get('ret_msg', '')}", module_name=__name__)
-
-            if "topic" not in data:
+            topic = data.get("topic")
+            if topic is None:
+                # Логируем системные сообщения (subscribe/pong/etc)
+                if "op" in data:
+                    log_info(0, f"🔔 PUBLIC WebSocket системное сообщение: op={data.get('op')}, success={data.get('success')}, ret_msg={data.get('ret_msg', '')}", module_name=__name__)
                 return
 
-            topic = data["topic"]
-
-            # Обработка публичных сделок (МГНОВЕННЫЕ обновления цен!)
-            if topic.startswith("publicTrade."):
-                symbol = topic.split(".")[1]
-                await self._handle_public_trade(symbol, data["data"])
-
-            # Обработка тикеров (медленные обновления - deprecated)
-            elif topic.startswith("tickers."):
-                symbol = topic.split(".")[1]
-                await self._handle_ticker_update(symbol, data["data"])
-
-            # Обработка свечей
-            elif topic.startswith("kline."):
-                parts = topic.split(".")
-                interval = parts[1]
-                symbol = parts[2]
-                await self._handle_candle_update(symbol, interval, data["data"])
+            # Маршрут из таблицы топиков: publicTrade (МГНОВЕННЫЕ обновления цен!), tickers, kline
+            route = self._decoder.route(topic)
+            if route is not None:
+                await route.handler(*route.args, data["data"])
+            return data.get("ts")
 
         except Exception as e:
             log_error(0, f"Ошибка парсинга публичного сообщения: {e}", module_name=__name__)
@@ -280,52 +334,52 @@ class GlobalWebSocketManager:
 
             # Берем последнюю сделку из массива (самая свежая цена)
             latest_trade = trade_data[-1]
-            price = Decimal(str(latest_trade.get("p", "0")))
+            price = to_decimal_fast(latest_trade.get("p", "0"))
 
             if price <= 0:
                 return
 
-            # Проверяем наличие подписчиков
-            if symbol not in self.symbol_subscribers or not self.symbol_subscribers[symbol]:
+            trade_time = latest_trade.get("T")
+            if trade_time:
+                self._trade_latency.observe(max(time.time() * 1000 - trade_time, 0.0) / 1000)
+
+            market_state.update_trade(symbol, price)
+            candle_aggregator.add_trades(symbol, trade_data)
+
+            recipients = self._symbol_recipients.get(symbol)
+            if not recipients:
                 return
 
-            # Отправка события всем подписчикам символа
-            for user_id in self.symbol_subscribers[symbol]:
-                price_event = PriceUpdateEvent(
-                    user_id=user_id,
-                    symbol=symbol,
-                    price=price
-                )
-                await self.event_bus.publish(price_event)
+            # Одно broadcast-событие на символ: EventBus сам раздаст его подписчикам
+            await self.event_bus.publish(SymbolPriceBroadcastEvent(
+                user_id=0,
+                symbol=symbol,
+                user_ids=recipients,
+                price=price
+            ))
 
         except Exception as e:
             log_error(0, f"Ошибка обработки публичной сделки {symbol}: {e}", module_name=__name__)
 
     async def _handle_ticker_update(self, symbol: str, ticker_data: Dict[str, Any]):
-        """Обработка обновления тикера (медленный fallback)"""
+        """
+        Обработка тикера: статистика 24ч в доску рынка.
+        PRICE_UPDATE не публикуется - источник цены для стратегий publicTrade.
+        """
         try:
-            # Данные тикера приходят как объект, а не список
-            if not ticker_data:
-                return
-
-            price = Decimal(str(ticker_data.get("lastPrice", "0")))
-
-            if price <= 0:
-                return
-
-            # Отправка события всем подписчикам символа
-            if symbol in self.symbol_subscribers:
-                for user_id in self.symbol_subscribers[symbol]:
-                    price_event = PriceUpdateEvent(
-                        user_id=user_id,
-                        symbol=symbol,
-                        price=price
-                    )
-                    await self.event_bus.publish(price_event)
-
+            # Данные тикера приходят как объект (снапшот или дельта), а не список
+            if ticker_data:
+                market_state.update_ticker(symbol, ticker_data)
         except Exception as e:
             log_error(0, f"Ошибка обработки тикера {symbol}: {e}", module_name=__name__)
 
+    async def _handle_orderbook_update(self, symbol: str, depth: str, book_data: Dict[str, Any]):
+        """Обработка orderbook.1: лучшие bid/ask в доску рынка (строки конвертируются при чтении)"""
+        try:
+            market_state.update_book(symbol, book_data.get("b"), book_data.get("a"))
+        except Exception as e:
+            log_error(0, f"Ошибка обработки стакана {symbol}: {e}", module_name=__name__)
+
     async def _handle_candle_update(self, symbol: str, interval: str, candle_data: List[Dict]):
         """Обработка обновления свечи"""
         try:
@@ -338,35 +392,198 @@ class GlobalWebSocketManager:
             if not candle.get("confirm", False):
                 return
 
+            # Проверяем наличие подписчиков до конвертации
+            if not self._symbol_recipients.get(symbol):
+                return
+
+            key = (symbol, interval)
+            start = int(candle["start"])
+            buffer = self._backfill_buffers.get(key)
+            last_start = self._last_confirmed_candle.get(key)
+            if buffer is None and last_start is not None and start <= last_start:
+                # Повтор уже опубликованной свечи (переподключение) - без конвертации
+                return
+
             # Конвертация данных свечи в Decimal
             candle_decimal = {
-                "timestamp": int(candle["start"]),
-                "open": Decimal(str(candle["open"])),
-                "high": Decimal(str(candle["high"])),
-                "low": Decimal(str(candle["low"])),
-                "close": Decimal(str(candle["close"])),
-                "volume": Decimal(str(candle["volume"]))
+                "timestamp": start,
+                "open": to_decimal_fast(candle["open"]),
+                "high": to_decimal_fast(candle["high"]),
+                "low": to_decimal_fast(candle["low"]),
+                "close": to_decimal_fast(candle["close"]),
+                "volume": to_decimal_fast(candle["volume"])
             }
 
-            # Проверяем наличие подписчиков
-            if symbol not in self.symbol_subscribers or not self.symbol_subscribers[symbol]:
+            if buffer is not None:
+                # Идет догрузка пропуска - свеча будет опубликована после нее, по порядку
+                buffer.append(candle_decimal)
                 return
 
-            # Отправка события всем подписчикам символа
-            for user_id in self.symbol_subscribers[symbol]:
-                # Bybit присылает интервал как "5", нужно конвертировать в "5m"
-                interval_formatted = f"{interval}m"
-                candle_event = NewCandleEvent(
-                    user_id=user_id,
-                    symbol=symbol,
-                    interval=interval_formatted,
-                    candle_data=candle_decimal
-                )
-                await self.event_bus.publish(candle_event)
+            if last_start is not None and candle_decimal["timestamp"] > last_start + self._interval_ms(interval):
+                # Пропуск в потоке без переподключения: догружаем недостающие свечи через REST
+                self._backfill_buffers[key] = [candle_decimal]
+                self._start_backfill(key, self._backfill_candles(symbol, interval, until_start=candle_decimal["timestamp"]))
+                return
+
+            await self._publish_candle(symbol, interval, candle_decimal)
 
         except Exception as e:
             log_error(0, f"Ошибка обработки свечи {symbol}: {e}", module_name=__name__)
 
+    async def _publish_candle(self, symbol: str, interval: str, candle_decimal: Dict[str, Any]):
+        """Публикует закрытую свечу, если она новее последней опубликованной по (symbol, interval)"""
+        key = (symbol, interval)
+        last_start = self._last_confirmed_candle.get(key)
+        if last_start is not None and candle_decimal["timestamp"] <= last_start:
+            return
+        self._last_confirmed_candle[key] = candle_decimal["timestamp"]
+
+        # Bybit присылает интервал как "5", нужно конвертировать в "5m"
+        timeframe = sys.intern(f"{interval}m")
+        # Свечи производных таймфреймов, закрывшиеся этой минутой (3m/15m/1h...)
+        derived = candle_aggregator.add_closed(symbol, timeframe, candle_decimal)
+        # Хранилище свечей REST дописывает закрытые свечи без запроса к бирже
+        kline_store.add_closed(symbol, timeframe, candle_decimal)
+        for derived_timeframe, derived_candle in derived:
+            kline_store.add_closed(symbol, derived_timeframe, derived_candle)
+
+        recipients = self._symbol_recipients.get(symbol)
+        if not recipients:
+            return
+
+        # Одно broadcast-событие на символ для всех подписчиков
+        await self.event_bus.publish(SymbolCandleBroadcastEvent(
+            user_id=0,
+            symbol=symbol,
+            user_ids=recipients,
+            interval=timeframe,
+            candle_data=candle_decimal
+        ))
+        for derived_timeframe, derived_candle in derived:
+            await self.event_bus.publish(SymbolCandleBroadcastEvent(
+                user_id=0,
+                symbol=symbol,
+                user_ids=recipients,
+                interval=derived_timeframe,
+                candle_data=derived_candle
+            ))
+
+    @staticmethod
+    def _interval_ms(interval: str) -> int:
+        return int(interval) * 60_000
+
+    def _get_public_api(self) -> BybitAPI:
+        """REST клиент без ключей для публичных данных (боевой домен, как и публичный поток)"""
+        if self._public_api is None:
+            self._public_api = BybitAPI(api_key="", api_secret="", user_id=0)
+        return self._public_api
+
+    async def _on_public_shard_live(self, shard: PublicConnectionShard, reconnected: bool):
+        """После переподключения шарда догружает свечи, закрывшиеся за время разрыва"""
+        if not reconnected:
+            return
+        keys = [
+            (symbol, interval)
+            for symbol, symbol_shard in list(self._symbol_shards.items()) if symbol_shard is shard
+            for interval in PUBLIC_KLINE_INTERVALS
+            if (symbol, interval) in self._last_confirmed_candle and (symbol, interval) not in self._backfill_buffers
+        ]
+        if not keys:
+            return
+        # Сразу включаем буферизацию, чтобы живые свечи не обогнали догружаемые
+        for key in keys:
+            self._backfill_buffers[key] = []
+
+        semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+        async def backfill(symbol: str, interval: str):
+            try:
+                async with semaphore:
+                    await self._backfill_candles(symbol, interval)
+            except asyncio.CancelledError:
+                # Отменена в очереди семафора: буферизация ключа включена выше и должна быть снята
+                self._backfill_buffers.pop((symbol, interval), None)
+                raise
+
+        await asyncio.gather(*(self._start_backfill(key, backfill(*key)) for key in keys))
+
+    def _start_backfill(self, key: Tuple[str, str], coro) -> asyncio.Task:
+        """Запускает догрузку ключа (symbol, interval) отдельной задачей и запоминает ее до завершения"""
+        task = asyncio.create_task(coro)
+        self._backfill_tasks[key] = task
+
+        def forget(done: asyncio.Task):
+            if self._backfill_tasks.get(key) is done:
+                del self._backfill_tasks[key]
+
+        task.add_done_callback(forget)
+        return task
+
+    async def _cancel_backfills(self, symbol: Optional[str] = None):
+        """Отменяет догрузки свечей символа (None - все)"""
+        tasks = [task for key, task in self._backfill_tasks.items() if symbol is None or key[0] == symbol]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _backfill_candles(self, symbol: str, interval: str, until_start: Optional[int] = None):
+        """
+        Догружает через REST закрытые свечи между последней опубликованной и until_start
+        (по умолчанию - текущей формирующейся свечой), публикует их по порядку,
+        затем - свечи, накопленные в буфере за время догрузки.
+        """
+        key = (symbol, interval)
+        self._backfill_buffers.setdefault(key, [])
+        started = time.monotonic()
+        try:
+            last_start = self._last_confirmed_candle.get(key)
+            if last_start is None:
+                return
+            interval_ms = self._interval_ms(interval)
+            if until_start is None:
+                until_start = int(time.time() * 1000) // interval_ms * interval_ms
+            missing = (until_start - last_start) // interval_ms - 1
+            if missing <= 0:
+                return
+
+            self._candle_gap_stats["gaps"] += 1
+            self._candle_gap_stats["missed_candles"] += missing
+            log_warning(0, f"Пропуск свечей {symbol} {interval}m: {missing} шт., догрузка через REST",
+                        module_name=__name__)
+
+            candles = await self._get_public_api().get_klines(
+                symbol, interval, limit=min(BACKFILL_MAX_CANDLES, missing),
+                start_time=last_start + interval_ms, end_time=until_start - 1
+            )
+            if candles is None:
+                self._candle_gap_stats["backfill_errors"] += 1
+                log_error(0, f"Не удалось догрузить свечи {symbol} {interval}m", module_name=__name__)
+                return
+
+            for candle in candles:
+                if last_start < candle["start_time"] < until_start:
+                    await self._publish_candle(symbol, interval, {
+                        "timestamp": candle["start_time"],
+                        "open": candle["open"],
+                        "high": candle["high"],
+                        "low": candle["low"],
+                        "close": candle["close"],
+                        "volume": candle["volume"]
+                    })
+                    self._candle_gap_stats["backfilled"] += 1
+            self._backfill_latency.observe(time.monotonic() - started)
+
+        except asyncio.CancelledError:
+            # Отписка или остановка: накопленные свечи не публикуются
+            self._backfill_buffers.pop(key, None)
+            raise
+        except Exception as e:
+            self._candle_gap_stats["backfill_errors"] += 1
+            log_error(0, f"Ошибка догрузки свечей {symbol} {interval}m: {e}", module_name=__name__)
+        finally:
+            for candle_decimal in sorted(self._backfill_buffers.pop(key, []), key=lambda c: c["timestamp"]):
+                await self._publish_candle(symbol, interval, candle_decimal)
+
 
 class DataFeedHandler:
     """
@@ -388,6 +605,11 @@ class DataFeedHandler:
         # Приватное WebSocket соединение
         self.private_connection: Optional[websockets.WebSocketClientProtocol] = None
         self._private_task: Optional[asyncio.Task] = None
+        # Здоровье соединения для супервизора приватных WebSocket
+        self.health = ConnectionHealth(f"private-{user_id}-bot{account_priority}")
+        self._ping_ids = count(1)
+        # Биржа ответила на auth текущего соединения (успешно или нет)
+        self._auth_replied = False
 
         # API ключи пользователя (для конкретного account_priority)
         self.api_key: Optional[str] = None
@@ -417,6 +639,7 @@ class DataFeedHandler:
             # КРИТИЧНО: Проверяем загрузились ли API ключи
             if self.api_key and self.api_secret:
                 log_info(self.user_id, f"✅ API ключи найдены! Запускаю приватный WebSocket (Bot_{self.account_priority})...", module_name=__name__)
+                private_fleet.register(self)
                 self._private_task = asyncio.create_task(self._private_websocket_loop())
             else:
                 log_error(self.user_id, f"❌ КРИТИЧНО: API ключи НЕ загружены для account_priority={self.account_priority}! Приватный WebSocket НЕ будет запущен! Ордера НЕ будут отслеживаться!", module_name=__name__)
@@ -520,6 +743,7 @@ class DataFeedHandler:
         await global_ws_manager.unsubscribe_user(self.user_id)
 
         # Остановка приватного WebSocket
+        private_fleet.unregister(self)
         if self._private_task:
             self._private_task.cancel()
             try:
@@ -568,16 +792,25 @@ class DataFeedHandler:
             log_error(self.user_id, f"Ошибка подписки на watchlist: {e}", module_name=__name__)
 
     async def _private_websocket_loop(self):
-        """Основной цикл приватного WebSocket"""
+        """
+        Основной цикл приватного WebSocket.
+        Подключение и аутентификация допускаются супервизором флота (private_fleet) с ограничением
+        частоты, переподключение - с экспоненциальной задержкой и джиттером.
+        """
+        reconnect_attempt = 0
         while self.running:
             try:
+                await private_fleet.admit_connect()
                 private_url = self.global_ws_manager.private_url_template
                 log_info(self.user_id, f"Подключение к приватному WebSocket: {private_url}", module_name=__name__)
 
                 async with websockets.connect(private_url) as websocket:
                     self.private_connection = websocket
+                    self.health.on_connected()
 
                     # Аутентификация
+                    self._auth_replied = False
+                    await private_fleet.admit_auth()
                     await self._authenticate_private_websocket()
 
                     # Подписка на приватные каналы
@@ -585,19 +818,34 @@ class DataFeedHandler:
 
                     log_info(self.user_id, "Подключен к приватному WebSocket", module_name=__name__)
 
-                    # КРИТИЧНО: Синхронизация состояния после переподключения
-                    # Проверяем пропущенные события исполнения ордеров
-                    await self._sync_orders_after_reconnect()
-
-                    # Обработка сообщений
-                    async for message in websocket:
-                        if not self.running:
-                            break
+                    # Ping сразу: ожидание слота синхронизации не должно ронять соединение по таймауту
+                    ping_task = asyncio.create_task(self._ping_loop(websocket))
+                    reconnect_attempt = 0
 
+                    try:
+                        # Ответ на auth читается до синхронизации: готовность соединения
+                        # фиксируется сразу, а не после ожидания слота
+                        await self._await_auth_reply(websocket)
+
+                        # КРИТИЧНО: Синхронизация состояния после переподключения
+                        # Проверяем пропущенные события исполнения ордеров до чтения потока
+                        # (не больше sync_concurrency одновременно на процесс): одно и то же исполнение
+                        # не обрабатывается синхронизацией и потоком одновременно. Кадры, пришедшие
+                        # за время синхронизации, ждут в буфере соединения; супервизор не оценивает
+                        # соединение, пока оно ждет слот и синхронизируется
+                        self.health.on_sync_started()
                         try:
-                            await self._handle_private_message(message)
-                        except Exception as e:
-                            log_error(self.user_id, f"Ошибка обработки приватного сообщения: {e}", module_name=__name__)
+                            await self._sync_orders_in_slot()
+                        finally:
+                            self.health.on_sync_finished()
+
+                        # Обработка сообщений
+                        async for message in websocket:
+                            if not self.running:
+                                break
+                            await self._on_private_frame(message)
+                    finally:
+                        ping_task.cancel()
 
             except Exception as e:
                 # Фильтруем обычные сетевые ошибки WebSocket
@@ -606,9 +854,60 @@ class DataFeedHandler:
                     log_info(self.user_id, f"WebSocket переподключение: {e}", module_name=__name__)
                 else:
                     log_error(self.user_id, f"Ошибка приватного WebSocket: {e}", module_name=__name__)
+            finally:
+                self.health.on_disconnected()
 
-                if self.running:
-                    await asyncio.sleep(5)  # Пауза перед переподключением
+            if self.running:
+                # Пауза перед переподключением
+                await asyncio.sleep(reconnect_delay(reconnect_attempt))
+                reconnect_attempt += 1
+
+    async def _on_private_frame(self, message: str):
+        """Кадр приватного соединения: метрики здоровья, запись кадра и обработка"""
+        received = time.perf_counter()
+        self.health.on_message()
+        if frame_capture.enabled:
+            frame_capture.record(self.health.name, message, time.time())
+
+        try:
+            await self._handle_private_message(message)
+            self.health.dispatch_latency.observe(time.perf_counter() - received)
+        except Exception as e:
+            log_error(self.user_id, f"Ошибка обработки приватного сообщения: {e}", module_name=__name__)
+
+    async def _await_auth_reply(self, websocket):
+        """Читает кадры до ответа на auth, не дольше auth_timeout супервизора"""
+        if not self.api_key or not self.api_secret:
+            return
+        deadline = time.monotonic() + private_fleet.auth_timeout
+        while not self._auth_replied:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                log_warning(self.user_id, f"Нет ответа на аутентификацию за {private_fleet.auth_timeout:.0f}с",
+                            module_name=__name__)
+                return
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=remaining)
+            except asyncio.TimeoutError:
+                continue
+            await self._on_private_frame(message)
+
+    async def _sync_orders_in_slot(self):
+        async with private_fleet.sync_slot():
+            await self._sync_orders_after_reconnect()
+
+    async def _ping_loop(self, websocket):
+        """Прикладной ping Bybit ({"op": "ping"}): держит соединение и измеряет RTT"""
+        while True:
+            await asyncio.sleep(private_fleet.ping_interval)
+            req_id = f"ping-{next(self._ping_ids)}"
+            self.health.on_ping_sent(req_id)
+            await websocket.send(json.dumps({"req_id": req_id, "op": "ping"}))
+
+    async def recycle(self):
+        """Пересоздание соединения по решению супервизора: цикл переподключится сам"""
+        if self.private_connection:
+            await self.private_connection.close()
 
     async def _authenticate_private_websocket(self):
         """Аутентификация в приватном WebSocket"""
@@ -666,8 +965,13 @@ class DataFeedHandler:
                 op_type = data.get("op")
                 success = data.get("success", False)
 
-                if op_type == "auth":
+                if op_type == "pong":
+                    self.health.on_pong(data.get("req_id"))
+
+                elif op_type == "auth":
+                    self._auth_replied = True
                     if success:
+                        private_fleet.on_ready(self.health)
                         log_info(self.user_id, f"✅ Аутентификация в приватном WebSocket УСПЕШНА (Bot_{self.account_priority})", module_name=__name__)
                     else:
                         log_error(self.user_id, f"❌ КРИТИЧНО: Аутентификация ПРОВАЛИЛАСЬ! Приватные события НЕ будут приходить! Ответ: {data}", module_name=__name__)
@@ -685,6 +989,7 @@ class DataFeedHandler:
                 return
 
             topic = data["topic"]
+            self.health.on_exchange_time(data.get("creationTime"))
 
             # Обработка ордеров
             if topic == "order":
@@ -828,17 +1133,23 @@ class DataFeedHandler:
         РОЛЬ ЭТОГО МЕТОДА:
         - Обрабатывает исполнение ордеров (Filled) → генерирует OrderFilledEvent
         - Отслеживает ручную отмену/отклонение (Cancelled/Rejected)
-        - Обновляет статус в БД
+        - Обновляет статус в реестре ордеров и в БД
         - Публикует события для стратегий
+
+        Ордер ищется сначала в реестре ордеров в памяти (по orderId или orderLinkId),
+        БД читается только для ордеров, которых в реестре нет (созданы до перезапуска).
         """
         try:
+            order_registry = get_order_registry(self.user_id)
             for order_data in data:
                 order_id = order_data.get("orderId")
                 status = order_data.get("orderStatus")
                 symbol = order_data.get("symbol")
 
-                # ШАГ 1: Проверяем что это ордер БОТА (есть в БД)
-                db_order = await db_manager.get_order_by_exchange_id(order_id, self.user_id)
+                # ШАГ 1: Проверяем что это ордер БОТА (реестр в памяти, затем БД)
+                db_order = order_registry.get(order_id, order_data.get("orderLinkId"))
+                if db_order is None:
+                    db_order = await db_manager.get_order_by_exchange_id(order_id, self.user_id)
 
                 if not db_order:
                     # Это НЕ ордер бота - игнорируем (пользователь создал вручную)
@@ -853,6 +1164,13 @@ class DataFeedHandler:
                              f"✅ [WebSocket] Ордер {order_id} исполнен! Генерирую OrderFilledEvent...",
                              "DataFeedHandler")
 
+                    order_registry.update_status(
+                        order_id, "FILLED",
+                        filled_quantity=to_decimal(order_data.get("cumExecQty", "0")),
+                        average_price=to_decimal(order_data.get("avgPrice", "0")),
+                        commission=to_decimal(order_data.get("cumExecFee", "0"))
+                    )
+
                     # Обновляем статус в БД
                     try:
                         await db_manager.update_order_on_fill(
@@ -896,9 +1214,15 @@ class DataFeedHandler:
                              f"⚠️ [WebSocket] Ордер {order_id} {status} ВРУЧНУЮ пользователем на бирже!",
                              "DataFeedHandler")
 
+                    status_map = {"Cancelled": "CANCELLED", "Rejected": "REJECTED"}
+                    order_registry.update_status(
+                        order_id, status_map[status],
+                        filled_quantity=to_decimal(order_data.get("cumExecQty", "0")),
+                        average_price=to_decimal(order_data.get("avgPrice", "0")) if order_data.get("avgPrice") else None
+                    )
+
                     # Обновляем статус в БД
                     try:
-                        status_map = {"Cancelled": "CANCELLED", "Rejected": "REJECTED"}
                         await db_manager.update_order_status(
                             order_id=order_id,
                             status=status_map[status],